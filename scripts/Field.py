@@ -1,6 +1,5 @@
 
 import numpy as np
-import matplotlib.pyplot as plt
 from shapely.geometry import Polygon
 from shapely.geometry import Point
 from Task import Task
@@ -132,6 +131,8 @@ class DataField:
 
 
 if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
     n = 3
     square = [[0, 0], [1, 0], [1, 1], [0, 1]]
     clusters = Field(square, [0.5, 0.5], n)
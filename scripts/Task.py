@@ -10,30 +10,214 @@ class ServiceState(Enum):
     SERVICED = 3
 
 
+_SERVICE_STATES = tuple(ServiceState)
+_WAITING = ServiceState.WAITING.value
+_ASSIGNED = ServiceState.ASSIGNED.value
+_SERVICED = ServiceState.SERVICED.value
+
+
+class TaskStore:
+    """
+    Struct-of-arrays storage for a set of tasks.  Each Task is a view onto one row of the store, so the
+    simulation and policies can keep working with Task objects while whole-set queries (e.g., pending in
+    cluster k before time t) are a boolean mask over contiguous arrays.
+
+    Optional values (cluster_id, index) are stored as NO_VALUE when absent.
+    """
+    NO_VALUE = -1
+    FIELDS = ('id', 'x', 'y', 'time', 'initial_wait', 'service_time', 'cluster_id', 'index', 'state', 'time_serviced')
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.id = np.zeros(capacity, dtype=np.int64)
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.time = np.zeros(capacity, dtype=np.float64)
+        self.initial_wait = np.zeros(capacity, dtype=np.float64)
+        self.service_time = np.zeros(capacity, dtype=np.float64)
+        self.cluster_id = np.zeros(capacity, dtype=np.int64)
+        self.index = np.zeros(capacity, dtype=np.int64)
+        self.state = np.zeros(capacity, dtype=np.int8)
+        self.time_serviced = np.zeros(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = max(1, len(self.id)) * 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, id, location, time, initial_wait=0, cluster_id=0, index=None, service_time=SERVICE_TIME):
+        """
+        Append a task to the store and return its row
+        """
+        if self.size == len(self.id):
+            self._grow()
+
+        row = self.size
+        self.id[row] = id
+        self.x[row] = location[0]
+        self.y[row] = location[1]
+        self.time[row] = time
+        self.initial_wait[row] = initial_wait
+        self.service_time[row] = service_time
+        self.cluster_id[row] = self.NO_VALUE if cluster_id is None else cluster_id
+        self.index[row] = self.NO_VALUE if index is None else index
+        self.state[row] = _WAITING
+        self.time_serviced[row] = -1
+        self.size += 1
+
+        return row
+
+    def task(self, row):
+        return Task.view(self, row)
+
+    def subset(self, rows):
+        """
+        A new store holding copies of the given rows, in order
+        """
+        store = TaskStore(capacity=max(1, len(rows)))
+        for name in self.FIELDS:
+            getattr(store, name)[:len(rows)] = getattr(self, name)[rows]
+        store.size = len(rows)
+        return store
+
+    def tasks(self, mask=None):
+        """
+        Task views for all the rows in the store, or only those selected by the mask
+        """
+        rows = range(self.size) if mask is None else np.flatnonzero(mask)
+        return [Task.view(self, int(row)) for row in rows]
+
+    def _mask(self, states, cluster_id=None, before=None):
+        mask = np.isin(self.state[:self.size], states)
+        if cluster_id is not None:
+            mask &= self.cluster_id[:self.size] == cluster_id
+        if before is not None:
+            mask &= self.time[:self.size] <= before
+        return mask
+
+    def pending_mask(self, cluster_id=None, before=None):
+        """
+        Tasks that are waiting or assigned, optionally limited to a cluster and/or those that arrived by a given time
+        """
+        return self._mask([_WAITING, _ASSIGNED], cluster_id=cluster_id, before=before)
+
+    def waiting_mask(self, cluster_id=None, before=None):
+        return self._mask([_WAITING], cluster_id=cluster_id, before=before)
+
+    def serviced_mask(self, cluster_id=None):
+        return self._mask([_SERVICED], cluster_id=cluster_id)
+
+    def wait_times(self, mask=None):
+        """
+        Total wait time of each task -- only meaningful for serviced tasks
+        """
+        wait = self.time_serviced[:self.size] - self.time[:self.size] + self.initial_wait[:self.size]
+        return wait if mask is None else wait[mask]
+
+
 class Task:
-    def __init__(self, id, location, time, initial_wait=0, cluster_id=0, index=None, service_time=SERVICE_TIME):
-        self.id = id
-        self.location = location
-        self.cluster_id = cluster_id
-        self.time = time
-        self.initial_wait = initial_wait
-        self.index = index
-        self.service_state = ServiceState.WAITING
-        self.time_serviced = -1
-        self.service_time = service_time
+    """
+    A single task -- a lightweight view onto a row of a TaskStore.  Tasks created without a store (e.g., the
+    depot markers in an actor's path) get a private one.
+    """
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, id, location, time, initial_wait=0, cluster_id=0, index=None, service_time=SERVICE_TIME, store=None):
+        if store is None:
+            store = TaskStore(capacity=1)
+        self._store = store
+        self._row = store.add(id=id, location=location, time=time, initial_wait=initial_wait,
+                              cluster_id=cluster_id, index=index, service_time=service_time)
+
+    @classmethod
+    def view(cls, store, row):
+        task = cls.__new__(cls)
+        task._store = store
+        task._row = row
+        return task
+
+    def __getstate__(self):
+        return (self._store, self._row)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # task pickled before the store existed (older pickles may also be missing some of the fields)
+            self.__init__(id=state['id'], location=state['location'], time=state['time'], initial_wait=state.get('initial_wait', 0),
+                          cluster_id=state.get('cluster_id', 0), index=state.get('index'), service_time=state.get('service_time', SERVICE_TIME))
+            self.service_state = state.get('service_state', ServiceState.WAITING)
+            self.time_serviced = state.get('time_serviced', -1)
+        else:
+            self._store, self._row = state
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def row(self):
+        return self._row
+
+    @property
+    def id(self):
+        return int(self._store.id[self._row])
+
+    @property
+    def location(self):
+        return (float(self._store.x[self._row]), float(self._store.y[self._row]))
+
+    @property
+    def time(self):
+        return float(self._store.time[self._row])
+
+    @property
+    def initial_wait(self):
+        return float(self._store.initial_wait[self._row])
+
+    @property
+    def service_time(self):
+        return float(self._store.service_time[self._row])
+
+    @property
+    def cluster_id(self):
+        cluster_id = int(self._store.cluster_id[self._row])
+        return None if cluster_id == TaskStore.NO_VALUE else cluster_id
+
+    @property
+    def index(self):
+        index = int(self._store.index[self._row])
+        return None if index == TaskStore.NO_VALUE else index
+
+    @property
+    def service_state(self):
+        return _SERVICE_STATES[self._store.state[self._row]]
+
+    @service_state.setter
+    def service_state(self, state):
+        self._store.state[self._row] = state.value
+
+    @property
+    def time_serviced(self):
+        return float(self._store.time_serviced[self._row])
+
+    @time_serviced.setter
+    def time_serviced(self, time):
+        self._store.time_serviced[self._row] = time
 
     def is_pending(self):
-        if self.service_state == ServiceState.WAITING or self.service_state == ServiceState.ASSIGNED:
-            return True
-        return False
+        return self._store.state[self._row] <= _ASSIGNED
 
     def is_waiting(self):
-        if self.service_state == ServiceState.WAITING:
-            return True
-        return False
+        return self._store.state[self._row] == _WAITING
 
     def to_string(self):
-        return f'{self.id},{self.location[0]},{self.location[1]},{self.time},{self.time_serviced},{self.initial_wait}'
+        location = self.location
+        return f'{self.id},{location[0]},{location[1]},{self.time},{self.time_serviced},{self.initial_wait}'
 
     def wait_time(self):
         if self.time_serviced == -1:
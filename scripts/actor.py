@@ -1,43 +1,227 @@
-from math import sqrt, atan2
+from math import sqrt, atan2, ceil
 from config import DISTANCE_TOLERANCE
-import pygame
 from Task import Task, ServiceState
+from event_trace import ACTOR_ARRIVED
 import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Fleet:
+    """
+    Struct-of-arrays kinematic state (position, distance travelled, orientation, speed and current goal) for a
+    set of actors, so that every moving actor can be advanced in one vectorized step.  Each Actor reads and
+    writes its own slot; an actor created without a fleet gets a private one.
+    """
+
+    def __init__(self, capacity=1):
+        self.size = 0
+        self.pos = np.zeros([capacity, 2], dtype=np.float64)
+        self.goal = np.zeros([capacity, 2], dtype=np.float64)
+        self.travel_dist = np.zeros(capacity, dtype=np.float64)
+        self.orientation = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = max(1, len(self.speed)) * 2
+        for name in ('pos', 'goal', 'travel_dist', 'orientation', 'speed'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, pos, speed):
+        """
+        Add an actor to the fleet and return its slot
+        """
+        if self.size == len(self.speed):
+            self._grow()
+
+        slot = self.size
+        self.pos[slot] = pos
+        self.speed[slot] = speed
+        self.size += 1
+
+        return slot
+
+    def step(self, moving, tick_time):
+        """
+        Move every actor flagged in moving one tick towards its goal -- the vectorized equivalent of
+        the motion in Actor._move().
+
+        Args:
+            moving (np.array): boolean mask over the fleet's slots
+            tick_time (float): length of a simulation step
+
+        Returns:
+            np.array: the slots of the actors that reached their goal this step
+        """
+        slots = np.flatnonzero(moving)
+        if not len(slots):
+            return slots
+
+        dir = self.goal[slots] - self.pos[slots]
+        dist = np.sqrt(dir[:, 0]*dir[:, 0] + dir[:, 1]*dir[:, 1])
+        speed = self.speed[slots]
+
+        en_route = dist > speed*tick_time
+        moved = slots[en_route]
+        self.pos[moved] = np.round(
+            self.pos[moved] + dir[en_route]*speed[en_route, np.newaxis]*1.0/dist[en_route, np.newaxis]*tick_time, 5)
+        self.travel_dist[moved] += speed[en_route] * tick_time
+        self.orientation[moved] = np.arctan2(dir[en_route, 1], dir[en_route, 0])
+
+        arrived = slots[~en_route]
+        self.pos[arrived] = np.round(self.goal[arrived], 5)
+        self.travel_dist[arrived] += dist[~en_route]
+
+        return arrived
+
+
+def tick_fleet(fleet, actors, sim_time, tick_time):
+    """
+    Vectorized tick() for a set of euclidean actors sharing a fleet.
+
+    Positions are rounded with numpy rather than the builtin round(), which can differ in the last bit, so
+    results may drift from stepping each actor separately by a few ulps.
+
+    Returns:
+        list: the task finished by each actor this tick (or None), in actor order
+    """
+    moving = np.zeros(len(fleet), dtype=bool)
+    by_slot = {}
+    for actor in actors:
+        if actor.servicing is None and actor._update_goal(sim_time):
+            moving[actor.slot] = True
+            fleet.goal[actor.slot] = actor.current_goal.location
+            by_slot[actor.slot] = actor
+
+    for slot in fleet.step(moving, tick_time):
+        by_slot[slot]._reach_goal(sim_time)
+
+    return [actor._check_service(sim_time) for actor in actors]
+
+
+class PathProfile:
+    """
+    Cumulative distance along the waypoints of a detailed path, so that the point a given distance along the
+    path can be found with a binary search.  Profiles are immutable and shared by every actor travelling the leg.
+    """
+
+    def __init__(self, points):
+        self.points = np.array(points, dtype=np.float64)
+        delta = self.points[1:] - self.points[:-1]
+        self.segments = np.sqrt(delta[:, 0]*delta[:, 0] + delta[:, 1]*delta[:, 1])
+        # distance to each waypoint
+        self.cumulative = np.concatenate(([0.], np.cumsum(self.segments)))
+        self.total_distance = float(self.cumulative[-1])
+
+    def locate(self, distance):
+        """
+        Find the point a distance along the path
+
+        Returns:
+            tuple: the position and heading at that point, or None if the distance is beyond the end of the path
+        """
+        # the first segment that ends beyond the distance
+        index = int(np.searchsorted(self.cumulative[1:], distance, side='right'))
+        if index >= len(self.segments):
+            return None
+
+        start = self.points[index]
+        dir = self.points[index+1] - start
+        segment_ratio = (distance - self.cumulative[index]) / self.segments[index]
+
+        pos = [
+            round(float(start[0] + dir[0]*segment_ratio), 5),
+            round(float(start[1] + dir[1]*segment_ratio), 5)
+        ]
+        return pos, atan2(dir[1], dir[0])
 
 
 class Actor:
-    def __init__(self, id=0, pos=[0, 0], cluster_id=None, depot=[0.5, 0.5], speed=1.0, service_time=1, path_fn=None, location_fn=None, euclidean=True, screen=None):
+    def __init__(self, id=0, pos=[0, 0], cluster_id=None, depot=[0.5, 0.5], speed=1.0, service_time=1, path_fn=None, location_fn=None, euclidean=True, screen=None,
+                 fleet=None, event_trace=None):
+        if fleet is None:
+            fleet = Fleet()
+        self._fleet = fleet
+        self.slot = fleet.add(pos, speed)
+        self._stale_position = False
+
         self.id = id
-        self.pos = pos
         self.depot = depot
         self.cluster_id = cluster_id
         self.path = []
         self.complete_path = []
-        self.speed = speed
         self.reached_goal = False
         self.servicing = None
         self.is_free = True
         self.time_of_service = 0
         self.service_time = service_time
         self.screen = screen
+        self.event_trace = event_trace
         self.radius = -1
-        self.travel_dist = 0
         self.current_goal = None
         self.changes_since_last_completion = 0
         self.max_changes_before_completion = 0
         self.history = []
         self.history.append((0, self.changes_since_last_completion, self.max_changes_before_completion, len(self.path)))
-        self.orientation = 0
         self.last_task = None
         self.euclidean = euclidean
         self.path_start_index = None
         self.current_sector = 0
 
         # variables/state to track position on the current detailed path (in map space)
-        self.detailed_path = None
+        self.path_profile = None
         self.path_fn = path_fn
         self.location_fn = location_fn
 
+    @property
+    def pos(self):
+        """
+        The actor's position, as an (x, y) tuple -- a copy of its slot in the fleet, so it can't be changed in place.
+        Assign a new position to move the actor.
+        """
+        if self._stale_position:
+            self._update_position()
+        return tuple(self._fleet.pos[self.slot].tolist())
+
+    @pos.setter
+    def pos(self, pos):
+        self._stale_position = False
+        self._fleet.pos[self.slot] = pos
+
+    @property
+    def orientation(self):
+        if self._stale_position:
+            self._update_position()
+        return float(self._fleet.orientation[self.slot])
+
+    @property
+    def travel_dist(self):
+        return float(self._fleet.travel_dist[self.slot])
+
+    @travel_dist.setter
+    def travel_dist(self, travel_dist):
+        self._fleet.travel_dist[self.slot] = travel_dist
+
+    @orientation.setter
+    def orientation(self, orientation):
+        self._fleet.orientation[self.slot] = orientation
+
+    @property
+    def speed(self):
+        # kept in the fleet only, where the vectorized step reads it
+        return float(self._fleet.speed[self.slot])
+
+    @speed.setter
+    def speed(self, speed):
+        self._fleet.speed[self.slot] = speed
+
     def assign(self, cluster, depot=None):
         self.cluster_id = cluster.id
         if depot is None:
@@ -54,12 +238,14 @@ class Actor:
     def near(self, pos, tolerance=DISTANCE_TOLERANCE):
         return self.distance_to(self.pos, pos) <= tolerance
 
-    def _move(self, sim_time, tick_time):
-        """move towards the goal
-        """
+    def _update_goal(self, sim_time):
+        """pick up the goal at the head of the path, tracking any change of goal for statistics
 
+        Returns:
+            bool: False if there is nowhere to go
+        """
         if len(self.path) == 0:
-            return
+            return False
 
         if self.current_goal is None:
             # reset the change count
@@ -75,9 +261,36 @@ class Actor:
                     self.max_changes_before_completion = self.changes_since_last_completion
                 self.history.append((sim_time, self.changes_since_last_completion, self.max_changes_before_completion, len(self.path)))
 
+        return True
+
+    def _reach_goal(self, sim_time):
+        """arrived at the goal -- start servicing it
+        """
+        self.current_goal = None
+
+        if (len(self.path) >= 1):
+            self.servicing, _ = self.path.pop(0)
+            self.servicing.service_state = ServiceState.IN_SERVICE
+            self.time_arrived = sim_time
+            self._log_arrival(sim_time)
+
+    def _log_arrival(self, sim_time):
+        if self.event_trace is not None:
+            self.event_trace.write(ACTOR_ARRIVED, sim_time, actor_id=self.id, task_id=self.servicing.id, location=self.servicing.location)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[%.2f]: Arrived at service location at %s", sim_time, self.servicing.location)
+
+    def _move(self, sim_time, tick_time):
+        """move towards the goal
+        """
+
+        if not self._update_goal(sim_time):
+            return
+
+        pos = self.pos
         dir = [
-            self.current_goal.location[0] - self.pos[0],
-            self.current_goal.location[1] - self.pos[1]
+            self.current_goal.location[0] - pos[0],
+            self.current_goal.location[1] - pos[1]
         ]
 
         dist = sqrt(
@@ -86,8 +299,8 @@ class Actor:
 
         if (dist > self.speed*tick_time):
             self.pos = [
-                round(self.pos[0] + dir[0]*self.speed*1.0/dist*tick_time, 5),
-                round(self.pos[1] + dir[1]*self.speed*1.0/dist*tick_time, 5)
+                round(pos[0] + dir[0]*self.speed*1.0/dist*tick_time, 5),
+                round(pos[1] + dir[1]*self.speed*1.0/dist*tick_time, 5)
             ]
             self.travel_dist += self.speed * tick_time
 
@@ -102,13 +315,7 @@ class Actor:
             ]
             self.travel_dist += dist
 
-            self.current_goal = None
-
-            if (len(self.path) >= 1):
-                print("[{:.2f}]: Arrived at service location at {}".format(sim_time, self.path[0][0].location))
-                self.servicing, _ = self.path.pop(0)
-                self.servicing.service_state = ServiceState.IN_SERVICE
-                self.time_arrived = sim_time
+            self._reach_goal(sim_time)
 
         return
 
@@ -127,14 +334,7 @@ class Actor:
                     src_idx = self.cluster_id
                 else:
                     src_idx = self.last_task.index
-                self.detailed_path = self.path_fn(src_idx, self.current_goal.index)
-                if self.detailed_path is not None:
-                    self.path_distances = []
-                    last_pt = self.detailed_path[0]
-                    for pt in self.detailed_path[1:]:
-                        self.path_distances.append(self.distance_to(pt, last_pt))
-                        last_pt = pt
-                    self.path_total_distance = sum(self.path_distances)
+                self.path_profile = self.path_fn(src_idx, self.current_goal.index)
 
             self.start_time = sim_time
             self.ratio_complete = 0
@@ -153,10 +353,10 @@ class Actor:
                 self.last_task = None
 
             if (len(self.path)):
-                print("[{:.2f}]: Arrived at service location at {}".format(sim_time, self.path[0][0].location))
                 self.servicing = self.last_task
                 self.servicing.service_state = ServiceState.IN_SERVICE
                 self.time_arrived = sim_time
+                self._log_arrival(sim_time)
 
             self.current_goal = None
             self.ratio_complete = 0
@@ -165,27 +365,84 @@ class Actor:
             # still travelling, extrapolate
             self.ratio_complete = (sim_time - self.start_time) / self.travel_time
 
-            if self.detailed_path is not None:
-                distance_complete = self.path_total_distance * self.ratio_complete
-                distance = 0
-                for index, segment_distance in enumerate(self.path_distances):
-                    if distance + segment_distance > distance_complete:
-                        dir = [
-                            self.detailed_path[index+1][0] - self.detailed_path[index][0],
-                            self.detailed_path[index+1][1] - self.detailed_path[index][1],
-                        ]
+            if self.path_profile is not None:
+                if self.screen is None:
+                    # nothing to draw -- only work out where we are if somebody asks (see pos)
+                    self._stale_position = True
+                else:
+                    self._update_position()
+
+    def _update_position(self):
+        """place the actor along the detailed path of the current leg
+        """
+        self._stale_position = False
+        location = self.path_profile.locate(self.path_profile.total_distance * self.ratio_complete)
+        if location is not None:
+            self.pos, self.orientation = location
+
+    def quiet_ticks(self, sim_time, tick_time):
+        """Number of upcoming ticks in which this actor is guaranteed not to arrive anywhere or complete a
+        service -- i.e., the ticks can be skipped by advance().  A margin of a tick is kept on each bound so that
+        the event itself is always processed by a regular call to tick().
+
+        Args:
+            sim_time (float): the current (rounded) simulation time
+            tick_time (float): length of a simulation step
+
+        Returns:
+            int or None: the number of quiet ticks, or None if the actor is idle and will stay that way
+        """
+        if self.servicing is not None:
+            return self._ticks_before(self.time_arrived + self.servicing.service_time, sim_time, tick_time)
+
+        if len(self.path) == 0:
+            return None
 
-                        segment_ratio = (distance_complete - distance) / segment_distance
+        if self.current_goal is None or self.path[0][0] is not self.current_goal:
+            # a new goal gets picked up on the next tick
+            return 0
 
-                        self.pos = [
-                            round(self.detailed_path[index][0] + dir[0]*segment_ratio, 5),
-                            round(self.detailed_path[index][1] + dir[1]*segment_ratio, 5)
-                        ]
+        if self.euclidean:
+            step = self.speed * tick_time
+            dist = self.distance_to(self.pos, self.current_goal.location)
+            # moving ticks remaining before the arrival tick, less a margin for the per-tick rounding of the position
+            return max(0, ceil(dist / step - 1) - 2)
 
-                        # moving -- update the orientation
-                        self.orientation = atan2(dir[1], dir[0])
-                        break
-                    distance += segment_distance
+        return self._ticks_before(self.start_time + self.travel_time, sim_time, tick_time)
+
+    @staticmethod
+    def _ticks_before(deadline, sim_time, tick_time):
+        # the simulation hands the actors a clock rounded to 2 places, so stay clear of the deadline by that much too
+        return max(0, int((deadline - sim_time - 0.005) / tick_time) - 1)
+
+    def advance(self, sim_time, tick_time, ticks):
+        """Skip forward over a number of quiet ticks (see quiet_ticks()) in one step.
+
+        Args:
+            sim_time (float): the (rounded) simulation time at the end of the skipped ticks
+            tick_time (float): length of a simulation step
+            ticks (int): the number of ticks to skip
+        """
+        if self.servicing is not None or len(self.path) == 0:
+            return
+
+        if self.euclidean:
+            dir = [
+                self.current_goal.location[0] - self.pos[0],
+                self.current_goal.location[1] - self.pos[1]
+            ]
+            dist = sqrt(dir[0]*dir[0] + dir[1]*dir[1])
+            step = self.speed * tick_time * ticks
+
+            self.pos = [
+                round(self.pos[0] + dir[0]*step/dist, 5),
+                round(self.pos[1] + dir[1]*step/dist, 5)
+            ]
+            self.travel_dist += step
+            self.orientation = atan2(dir[1], dir[0])
+        else:
+            # travel is time based -- just catch up the position along the leg
+            self._travel(sim_time)
 
     def tick(self, sim_time, tick_time):
         """a time step
@@ -197,6 +454,9 @@ class Actor:
             else:
                 self._travel(sim_time)
 
+        return self._check_service(sim_time)
+
+    def _check_service(self, sim_time):
         if self.servicing is not None:
             if (sim_time - self.time_arrived >= self.servicing.service_time):
                 finished_task = self.servicing
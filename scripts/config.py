@@ -8,6 +8,35 @@ ACTOR_SPEED = 1
 LAMBDA = 0.8
 SERVICE_TIME = 0
 TICK_TIME = 0.01
+BATCH_KINEMATICS_MIN_ACTORS = 16    # step euclidean actors as a single vectorized fleet from this many actors up
+SOLVER_WORKERS = 1                  # LKH runs the solver dispatcher starts at once
+PLANNING_WORKERS = 1                # worker threads for asynchronous planning
+SOLVER_SCRATCH_DIR = '/dev/shm'     # where the solver dispatch threads keep their files (falls back to the system temp dir)
+SOLVER_MIN_TRIALS = 500             # LKH trials for the smallest problems...
+SOLVER_TRIALS_PER_NODE = 100        # ...growing with the number of nodes, up to each solver's maximum
+SOLVER_NODES_PER_RUN = 20           # an LKH run for every this many nodes, up to each solver's maximum
+SOLVER_TIMEOUT_GRACE = 1.0          # seconds past its time limit before a solver is stopped
+TOUR_CACHE_SIZE = 4096              # solved tours kept in memory (least recently used are dropped first)
+WARM_START_RUNS = 1                 # LKH runs for a solve seeded with the previous tour
+WARM_START_MIN_TRIALS = 100         # LKH trials for a warm-started solve...
+WARM_START_TRIALS_PER_NODE = 200    # ...plus this many for each node that wasn't in the previous tour
+WARM_START_MAX_NEW_FRACTION = 0.5   # solve from scratch if more than this fraction of the nodes are new
+LOCAL_SEARCH_EXACT_NODES = 8        # the built-in solver enumerates every tour for problems up to this many nodes
+LOCAL_SEARCH_SEGMENT_LENGTH = 3     # longest run of stops that the built-in solver's Or-opt moves
+LOCAL_SEARCH_LATENCY_WINDOW = 40    # how far along the path the built-in TRP search moves a stop
+INCREMENTAL_REPLAN_THRESHOLD = 0.02  # incremental replanning falls back to a full solve when that looks to gain more than this...
+INCREMENTAL_REPLAN_REFRESH = 10     # ...and after this many incremental replans in a row
+ALNS_REMOVALS = 2                   # stops taken out and put back by each ALNS iteration
+ALNS_MAX_REMOVALS = 10              # ...or, for the adaptive search, between ALNS_REMOVALS and this many
+ALNS_MAX_STALL = 1000               # ALNS stops after this many iterations in a row without an improvement
+ALNS_SEGMENT_LENGTH = 100           # ALNS iterations between updates of the operator weights...
+ALNS_REACTION = 0.1                 # ...each moving the weights this far towards the operators' recent scores
+ALNS_SCORES = (33, 9, 13)           # operator scores for a new best, an improvement and an accepted candidate
+ALNS_RELATED_RANDOMNESS = 6         # related (Shaw) removal favours the most related stops more strongly the higher this is...
+ALNS_WORST_RANDOMNESS = 3           # ...and worst removal the costliest
+ALNS_ANNEALING_START = 0.05         # annealing starts out accepting a candidate this much (a fraction) costlier half the time...
+ALNS_ANNEALING_COOLING = 0.998      # ...cooling by this factor every iteration
+ALNS_RECORD_DEVIATION = 0.01        # record-to-record accepts candidates within this fraction of the best cost
 BETA = 0.712    # constant for TSP length
 
 DEFAULT_POLICY_NAME = "random_assgn"
@@ -28,6 +57,7 @@ SHOW_SIM = False
 DEFAULT_POLICY_COST_EXPONENT = 2
 DEFAULT_POLICY_ETA = 1            # proportion of the batch tsp path to execute (0,1]
 DEFAULT_POLICY_GAMMA = 0.9        # batch insertion threshold -- insertion after this point are rejected until next replan [0,1)
+DEFAULT_POLICY_MAX_SOLVER_TIME = 30  # wall clock limit (s) on each call to the solver
 
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 1000
@@ -58,4 +88,7 @@ STATUS_XMARGIN = 16
 RESULTS_DIR = 'results'
 TASKS_DIR = 'tasks'
 
+DELIVERY_LOG_BUFFER_ROWS = 4096    # serviced tasks held in memory before the delivery log is written out
+DEFAULT_SEEDS = [21, 6983, 42, 520, 97, 29348, 935567]    # seeds for multipass runs
+RESULTS_STORE_FILE = 'results_store.jsonl'     # completed runs, kept in the results directory
 TASK_LIST_FILE_PREFIX = "dvrp_tasks"
@@ -0,0 +1,189 @@
+from config import DELIVERY_LOG_BUFFER_ROWS
+from os import path
+import os
+import tempfile
+import numpy as np
+
+DELIVERY_LOG_COLUMNS = ['id', 'px', 'py', 't_arrive', 't_service', 't_initial']
+DELIVERY_LOG_FORMATS = {
+    'csv': '.csv',
+    'npz': '.npz',
+    'parquet': '.parquet',
+}
+
+
+class DeliveryLog:
+    """
+    Buffered record of every serviced task.  Rows are held in memory and written out in batches -- when the
+    buffer fills and at the end of each run -- rather than one line (and one flush) per task.
+
+    The csv format is the original one (no run parameters -- those are in the file name).  The columnar formats
+    (npz and parquet) also store the parameters of each run (seed, lambda, ...) as columns, so that many runs can
+    be loaded and filtered without parsing file names.
+
+    With append set, an existing log is extended rather than replaced.  Setting buffer_rows to None holds each
+    run until it ends, so that an interrupted run leaves nothing behind in the log.  The columnar formats can't be
+    extended in place, so an existing npz or parquet log is rewritten to a temporary file that replaces it on
+    close -- until then, the log holds the runs it had before.
+    """
+
+    def __init__(self, file_name, format='csv', buffer_rows=DELIVERY_LOG_BUFFER_ROWS, append=False):
+        if format not in DELIVERY_LOG_FORMATS:
+            raise ValueError(f"Unknown delivery log format: {format}")
+
+        self.file_name = file_name
+        self.format = format
+        self.buffer_rows = buffer_rows
+        self._rows = []
+        self._run_params = {}
+
+        self._fp = None
+        self._writer = None
+        self._columns = None
+        self._tmp_name = None
+        append = append and path.exists(file_name)
+        if format == 'csv':
+            self._fp = open(file_name, 'a' if append else 'w')
+            if not append:
+                self._fp.write(','.join(DELIVERY_LOG_COLUMNS) + '\n')
+                self._fp.flush()
+        elif format == 'npz':
+            # npz files can't be appended to -- keep everything until the log is closed
+            self._columns = {}
+            if append:
+                with np.load(file_name) as data:
+                    for key in data.files:
+                        self._columns[key] = [data[key]]
+        else:
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing the delivery log as parquet requires pyarrow")
+            if append:
+                # rewrite what is there as the first row group(s)
+                table = pq.read_table(file_name)
+                self._tmp_name = _temp_file(file_name)
+                self._writer = pq.ParquetWriter(self._tmp_name, table.schema)
+                self._writer.write_table(table)
+
+    def start_run(self, **params):
+        """
+        Begin a new run -- the parameters are attached to each of its rows in the columnar formats
+        """
+        self.flush()
+        self._run_params = params
+
+    def end_run(self):
+        self.flush()
+
+    def record(self, task):
+        """
+        Add a serviced task to the log
+        """
+        location = task.location
+        self._rows.append((task.id, location[0], location[1], task.time, task.time_serviced, task.initial_wait))
+        if self.buffer_rows is not None and len(self._rows) >= self.buffer_rows:
+            self.flush()
+
+    def _column_data(self):
+        data = {name: np.array(column) for name, column in zip(DELIVERY_LOG_COLUMNS, zip(*self._rows))}
+        data['id'] = data['id'].astype(np.int64)
+        for key, value in self._run_params.items():
+            data[key] = np.full(len(self._rows), value)
+        return data
+
+    def flush(self):
+        if not len(self._rows):
+            return
+
+        if self.format == 'csv':
+            self._fp.write(''.join(f'{id},{x},{y},{t_arrive},{t_service},{t_initial}\n'
+                                   for id, x, y, t_arrive, t_service, t_initial in self._rows))
+            self._fp.flush()
+        elif self.format == 'npz':
+            for key, values in self._column_data().items():
+                self._columns.setdefault(key, []).append(values)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table(self._column_data())
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.file_name, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        if self._fp is not None:
+            self._fp.close()
+        elif self._writer is not None:
+            self._writer.close()
+            if self._tmp_name is not None:
+                os.replace(self._tmp_name, self.file_name)
+        elif self._columns is not None:
+            _save_npz(self.file_name, {key: np.concatenate(values) for key, values in self._columns.items()})
+
+
+def _temp_file(file_name):
+    """
+    A new, empty file in the same directory as file_name, to be written in full and then moved over it with
+    os.replace -- so that a crash part way through leaves the original intact
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.dirname(path.abspath(file_name)), suffix='.tmp')
+    os.close(fd)
+    return tmp_name
+
+
+def _save_npz(file_name, columns):
+    tmp_name = _temp_file(file_name)
+    with open(tmp_name, 'wb') as fp:
+        np.savez(fp, **columns)
+    os.replace(tmp_name, file_name)
+
+
+def read_delivery_log(file_name):
+    """
+    Load a delivery log in any of the supported formats as a data frame
+    """
+    import pandas as pd
+
+    if file_name.endswith('.npz'):
+        with np.load(file_name) as data:
+            return pd.DataFrame({key: data[key] for key in data.files})
+    elif file_name.endswith('.parquet'):
+        return pd.read_parquet(file_name)
+    return pd.read_csv(file_name)
+
+
+def merge_delivery_logs(file_names, out_name, format='csv', append=False):
+    """
+    Concatenate delivery logs (all in the same format), in order, into a single log -- with append set, after the
+    runs already in it.  The columnar formats are written to a temporary file that then replaces the log.
+    """
+    append = append and path.exists(out_name)
+    if format == 'csv':
+        with open(out_name, 'a' if append else 'w') as out:
+            if not append:
+                out.write(','.join(DELIVERY_LOG_COLUMNS) + '\n')
+            for file_name in file_names:
+                with open(file_name) as fp:
+                    next(fp)    # header
+                    for line in fp:
+                        out.write(line)
+    elif format == 'npz':
+        columns = {}
+        for file_name in ([out_name, ] if append else []) + list(file_names):
+            with np.load(file_name) as data:
+                for key in data.files:
+                    columns.setdefault(key, []).append(data[key])
+        _save_npz(out_name, {key: np.concatenate(values) for key, values in columns.items()})
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tables = [pq.read_table(file_name) for file_name in ([out_name, ] if append else []) + list(file_names)]
+        tmp_name = _temp_file(out_name)
+        pq.write_table(pa.concat_tables(tables), tmp_name)
+        os.replace(tmp_name, out_name)
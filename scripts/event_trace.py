@@ -0,0 +1,58 @@
+import struct
+import numpy as np
+
+# event types
+RUN_STARTED = 0         # task field holds the seed of the run
+TASK_ARRIVED = 1
+ACTOR_ARRIVED = 2
+SERVICE_DONE = 3
+
+EVENT_NAMES = ['run-started', 'task-arrived', 'actor-arrived', 'service-done']
+
+# one fixed size, little-endian record per event: event, actor id, task id, sim time, x, y
+_RECORD = struct.Struct('<Biiddd')
+TRACE_DTYPE = np.dtype([
+    ('event', '<u1'),
+    ('actor', '<i4'),
+    ('task', '<i4'),
+    ('time', '<f8'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+])
+
+
+class EventTrace:
+    """
+    Compact binary trace of the simulation events for debugging -- packing a record is far cheaper than
+    formatting a log line.  Read the trace back with read_event_trace().
+    """
+
+    def __init__(self, file_name, buffer_size=1 << 16):
+        self._fp = open(file_name, 'wb', buffering=buffer_size)
+
+    def write(self, event, time, actor_id=-1, task_id=-1, location=(0, 0)):
+        self._fp.write(_RECORD.pack(event, actor_id, task_id, time, location[0], location[1]))
+
+    def flush(self):
+        self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+
+def read_event_trace(file_name):
+    """
+    Load an event trace as a numpy structured array (fields: event, actor, task, time, x, y)
+    """
+    return np.fromfile(file_name, dtype=TRACE_DTYPE)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(description='Dump a binary event trace as text')
+    argparser.add_argument('trace', help='Event trace file')
+    args = argparser.parse_args()
+
+    for record in read_event_trace(args.trace):
+        print(f"[{record['time']:.2f}]: {EVENT_NAMES[record['event']]:<14} actor {record['actor']:3d} task {record['task']:6d} ({record['x']:.5f}, {record['y']:.5f})")
@@ -1,7 +1,7 @@
 import numpy as np
 from generators.generator import Generator
 from generators.uniform import UniformGen
-from Task import Task
+from Task import Task, TaskStore
 
 
 class AllGen(UniformGen):
@@ -13,11 +13,13 @@ class AllGen(UniformGen):
 
         first_time = 0
         tasks = []
+        store = TaskStore()
 
         assert(self.max_tasks > 0)
         for i in range(0, self.max_tasks):
             new_task = Task(
                 id=len(tasks),
+                store=store,
                 location=super().draw(),
                 time=0,
                 # TODO: Fixing service time variance proportional to specified time
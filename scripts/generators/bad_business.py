@@ -2,7 +2,7 @@
 
 import numpy as np
 import random
-from Task import Task
+from Task import Task, TaskStore
 from generators.generator import Generator
 
 
@@ -28,6 +28,7 @@ class BadBusGen(Generator):
         first_time = True
 
         tasks = []
+        store = TaskStore()
 
         sim_time = 1
         next_time = self.service_time + 0.001
@@ -37,6 +38,7 @@ class BadBusGen(Generator):
             # create one task right beside the current one
             tasks.append(Task(
                 id=len(tasks),
+                store=store,
                 location=self.draw(pos=0.75, stdev=0.01),
                 time=sim_time,
                 service_time=self.service_time
@@ -46,6 +48,7 @@ class BadBusGen(Generator):
             # TODO: Fixed service time
             tasks.append(Task(
                 id=len(tasks),
+                store=store,
                 location=self.draw(pos=0.15, stdev=0.05),
                 time=sim_time,
                 service_time=self.service_time
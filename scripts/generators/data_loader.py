@@ -2,7 +2,7 @@
 
 import numpy as np
 import random
-from Task import Task
+from Task import Task, TaskStore
 import pandas as pd
 
 from Field import DataField
@@ -46,6 +46,10 @@ class DataLoader():
             self.centralized = kwargs['centralized']
         except KeyError:
             self.centralized = False
+        try:
+            self.headless = kwargs['headless']
+        except KeyError:
+            self.headless = False
 
         self.reset()
 
@@ -111,6 +115,12 @@ class DataLoader():
         self.distances = pivot_df.reindex(labels=full_index, axis=0).reindex(labels=full_index, axis=1).fillna(0.0).to_numpy()
         self.mean_distance = self.distance_df['TRAVEL_TIME'].mean()
 
+        self.field = DataField(self.tasks, self.distances, self.centralized)
+
+        if self.headless:
+            # no one to draw the streets for
+            return
+
         # get random set of streets for visual
         df_sampled = self.distance_df.sample(250)
         pivot_df = df_sampled.pivot(index='SRC_INDEX', columns='DST_INDEX', values='SCALED_WAYPOINTS')
@@ -125,8 +135,6 @@ class DataLoader():
                     locations = [loc for loc in self.paths[r, c].split(';')]
                     self.paths[r, c] = [[float(x), float(y)] for x, y in [loc.split(':') for loc in locations]]
 
-        self.field = DataField(self.tasks, self.distances, self.centralized)
-
     def draw(self):
         v = []
         row_index = self.gen.integers(self.field.count, len(self.tasks))
@@ -139,6 +147,7 @@ class DataLoader():
         #       the internal generator
         first_time = random.expovariate(lam)
         tasks = []
+        store = TaskStore()
 
         # insert the initial tasks, available at the start of the sim
         for _ in range(self.initial_tasks):
@@ -146,6 +155,7 @@ class DataLoader():
 
             new_task = Task(
                 id=len(tasks),
+                store=store,
                 location=location,
                 cluster_id=cluster_id,
                 time=0,
@@ -161,6 +171,7 @@ class DataLoader():
             task_index, location, cluster_id = self.draw()
             new_task = Task(
                 id=len(tasks),
+                store=store,
                 location=location,
                 cluster_id=cluster_id,
                 time=sim_time,
@@ -1,6 +1,6 @@
 import numpy as np
 import random
-from Task import Task
+from Task import Task, TaskStore
 
 
 class Generator:
@@ -62,6 +62,7 @@ class Generator:
         #       the internal generator
         first_time = random.expovariate(lam)
         tasks = []
+        store = TaskStore()
 
         # insert the initial tasks, available at the start of the sim
         for _ in range(self.initial_tasks):
@@ -69,6 +70,7 @@ class Generator:
 
             new_task = Task(
                 id=len(tasks),
+                store=store,
                 location=self.draw(),
                 cluster_id=None,
                 time=0,
@@ -83,6 +85,7 @@ class Generator:
             location = self.draw()
             new_task = Task(
                 id=len(tasks),
+                store=store,
                 location=location,
                 cluster_id=None,
                 time=sim_time,
@@ -3,7 +3,7 @@
 import numpy as np
 import random
 from generators.generator import Generator
-from Task import Task
+from Task import Task, TaskStore
 
 
 class PingPongGen(Generator):
@@ -36,6 +36,7 @@ class PingPongGen(Generator):
         #       the internal generator
         first_time = 0
         tasks = []
+        store = TaskStore()
 
         odd = True
 
@@ -44,6 +45,7 @@ class PingPongGen(Generator):
         while True:
             new_task = Task(
                 id=len(tasks),
+                store=store,
                 location=[1, 0] if odd else [0, 0],
                 time=sim_time,
                 service_time=0
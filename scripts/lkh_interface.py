@@ -1,4 +1,19 @@
-import lkh
+from config import SOLVER_MIN_TRIALS, SOLVER_TRIALS_PER_NODE, SOLVER_NODES_PER_RUN
+from config import WARM_START_RUNS, WARM_START_MIN_TRIALS, WARM_START_TRIALS_PER_NODE, WARM_START_MAX_NEW_FRACTION
+from solver_dispatch import get_solver_dispatcher, split_routes, SolverTimeout
+from tour_cache import get_tour_cache, problem_key
+from tsplib import int_rows, node_rows, problem_text
+from policies.util import task_locations
+from telemetry import get_telemetry
+import local_search
+from local_search import tour_length
+from math import ceil
+from time import perf_counter
+import numpy as np
+import logging
+import shutil
+
+logger = logging.getLogger(__name__)
 
 # Make sure LKH is downloaded and built first!
 #
@@ -6,145 +21,338 @@ import lkh
 #
 solver_path = '../thirdParty/lkh/LKH-3.0.7/LKH'
 
+# 'lkh', the built-in local search (see local_search.py), or 'auto' -- LKH if it is there, local search otherwise
+SOLVERS = ['auto', 'lkh', 'local']
+_solver = 'auto'
+_lkh_available = None
+
+
+def configure_solver(solver):
+    """
+    Choose the solver for all the problems in this process (one of SOLVERS)
+    """
+    global _solver
+    if solver not in SOLVERS:
+        raise ValueError(f'Unknown solver: {solver}')
+    _solver = solver
+
+
+def _use_local_search():
+    global _lkh_available
+    if _solver != 'auto':
+        return _solver == 'local'
+
+    if _lkh_available is None:
+        _lkh_available = shutil.which(solver_path) is not None
+        if not _lkh_available:
+            logger.warning("%s not found -- using the built-in local search instead", solver_path)
+    return not _lkh_available
+
+
+def insertion_tour(costs, tour=(0, )):
+    """
+    Complete a tour by cheapest insertion -- each node not yet on it goes where it adds the least cost
+
+    Args:
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        tour (tuple, optional): the partial tour to start from (node indices from 0). Defaults to (0, ).
+
+    Returns:
+        list: the complete tour (node indices from 0)
+    """
+    tour = list(tour)
+    on_tour = set(tour)
+    for node in range(costs.shape[0]):
+        if node in on_tour:
+            continue
+        t = np.array(tour)
+        t_next = np.roll(t, -1)
+        delta = costs[t, node] + costs[node, t_next] - costs[t, t_next]
+        tour.insert(int(np.argmin(delta)) + 1, node)
+    return tour
+
+
+def warm_start_tour(tasks, initial_tour, costs):
+    """
+    Seed tour for LKH from a previous tour -- the tasks still in the problem keep their order and the new ones are
+    added where they are cheapest to insert.  The actor (node 1) leads.
+
+    Args:
+        tasks (list): the tasks of the problem, in node order (task n is node n+2)
+        initial_tour (list): the tasks in the order of the previous tour (others, e.g. depots, are ignored)
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+
+    Returns:
+        tuple: the tour (node ids) and the number of nodes inserted
+    """
+    nodes = {task.id: n + 1 for n, task in enumerate(tasks)}
+
+    tour = [0, ]
+    for task in initial_tour:
+        node = nodes.pop(task.id, None)
+        if node is not None:
+            tour.append(node)
+
+    # whatever is left over is new
+    tour = insertion_tour(costs, tour)
+
+    return [node + 1 for node in tour], len(nodes)
+
+
+def _euc_costs(coords):
+    coords = np.array(coords, dtype=np.float64)
+    delta = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+    return np.sqrt((delta ** 2).sum(axis=2))
+
+
+def solver_effort(dimension, max_trials, runs, time_limit=None):
+    """
+    LKH search effort for a problem of the given size -- the trials and runs grow with the number of nodes, up to
+    the given maximums, so that small problems (the common case when replanning online) don't pay for the search
+    a large one needs.
+
+    Args:
+        dimension (int): the number of nodes in the problem
+        max_trials (int): the most trials to make in a run
+        runs (int): the most runs to make
+        time_limit (float, optional): wall clock limit (s) for the solve -- the best tour found by then is
+                                      returned. Defaults to None.
+
+    Returns:
+        dict: the LKH parameters
+    """
+    params = {
+        'max_trials': min(max_trials, max(SOLVER_MIN_TRIALS, SOLVER_TRIALS_PER_NODE * dimension)),
+        'runs': min(runs, ceil(dimension / SOLVER_NODES_PER_RUN)),
+    }
+    if time_limit is not None:
+        params['time_limit'] = time_limit
+    return params
+
+
+def _objective(routes, costs, latency):
+    # cost of a solution (routes of 1-based node ids) in the units of the problem -- None if it doesn't visit every node
+    if latency is None:
+        tour = [node - 1 for route in routes for node in route]
+        return tour_length(tour, costs) if sorted(tour) == list(range(len(costs))) else None
+    path = [0, ] + [node - 1 for route in routes for node in route if node != 1]
+    if sorted(path) != list(range(len(costs))):
+        return None
+    service_times, waits, cost_exponent = latency
+    return float(local_search.latency_costs(np.array(path), costs, service_times, waits, exponent=cost_exponent)[0])
+
+
+def _solve(problem, dimension, max_trials, runs, depots=(), tasks=None, initial_tour=None, coords=None, distances=None, time_limit=None,
+           latency=None, problem_type='TSP'):
+    """
+    Hand a problem to the solver dispatcher, warm-started from the previous tour if there is one.  A warm start needs
+    far less searching, so it gets fewer trials (scaled with the number of new nodes) and a single run.  Problems
+    that have been solved before are answered from the tour cache.
+
+    The travel costs (from the node coordinates or distances) are only needed to build a seed tour, a fallback
+    when the solver can't come up with a tour before the time limit, or to solve the problem with the built-in
+    local search -- which also needs the latency terms (service times, waits and cost exponent) of a TRP.
+
+    Each call is recorded in the solver telemetry, when it's enabled.
+    """
+    def costs():
+        return distances if distances is not None else _euc_costs(coords)
+
+    start_time = perf_counter()
+    telemetry = get_telemetry()
+
+    def done(routes, solver, limit_hit=False):
+        wall_time = perf_counter() - start_time
+        if telemetry.enabled:
+            before = _objective([seed_tour], costs(), latency) if seed_tour is not None else None
+            telemetry.record(solver, problem_type, dimension, wall_time, objective_before=before,
+                             objective_after=_objective(routes, costs(), latency),
+                             limit_hit=limit_hit or (time_limit is not None and wall_time >= time_limit))
+        return routes
+
+    params = solver_effort(dimension, max_trials, runs, time_limit=time_limit)
+
+    seed_tour = None
+    if initial_tour is not None and tasks is not None:
+        seed_tour, inserted = warm_start_tour(tasks, initial_tour, costs())
+        if inserted <= WARM_START_MAX_NEW_FRACTION * dimension:
+            params['max_trials'] = min(params['max_trials'], WARM_START_MIN_TRIALS + WARM_START_TRIALS_PER_NODE * inserted)
+            params['runs'] = WARM_START_RUNS
+        else:
+            seed_tour = None
+
+    if _use_local_search():
+        start = [node - 1 for node in seed_tour] if seed_tour is not None else None
+        if latency is None:
+            tour = local_search.solve_tsp(costs(), tour=start, time_limit=time_limit)
+        else:
+            service_times, waits, cost_exponent = latency
+            tour = local_search.solve_trp(costs(), service_times, waits, exponent=cost_exponent, tour=start, time_limit=time_limit)
+        return done(split_routes([node + 1 for node in tour], dimension, depots), 'local')
+
+    cache = get_tour_cache()
+    key = problem_key(problem, depots=list(depots), initial_tour=seed_tour, **params)
+    routes = cache.get(key)
+    if routes is not None:
+        return done(routes, 'lkh-cache')
+
+    try:
+        routes = get_solver_dispatcher(solver_path).solve(problem, dimension, depots=depots, initial_tour=seed_tour, **params)
+    except SolverTimeout:
+        logger.warning("No tour from LKH within %ss -- falling back to cheapest insertion", time_limit)
+        fallback = seed_tour if seed_tour is not None else [node + 1 for node in insertion_tour(costs())]
+        return done(split_routes(fallback, dimension, depots), 'lkh-fallback', limit_hit=True)
+
+    cache.put(key, routes)
+    return done(routes, 'lkh')
+
+
+def _node_coords(start_pos, tasks, scale_factor):
+    # integer coordinates of the start (node 1) and the tasks
+    start = np.array([[int(start_pos[0] * scale_factor), int(start_pos[1] * scale_factor)]], dtype=np.int64)
+    return np.vstack((start, (task_locations(tasks) * scale_factor).astype(np.int64)))
+
+
+def _service_times(N, mean_service_time, scale_factor):
+    # no service time at the depot
+    return np.array([0, ] + [mean_service_time * scale_factor, ] * (N - 1), dtype=np.float64)
+
+
+def _service_time_rows(service_times):
+    return '1 0\n' + ''.join(f'{n} {service_time}\n' for n, service_time in enumerate(service_times[1:].tolist(), start=2))
+
+
+def _waits(tasks, simulation_time, scale_factor):
+    # repurposing demand to account for built-up wait -- none at the depot
+    return np.array([0, ] + [int((simulation_time - task.time + task.initial_wait) * scale_factor) for task in tasks], dtype=np.int64)
+
+
+def solve_tsp(name, comment, start_pos, tasks, scale_factor=1.0, initial_tour=None, time_limit=None):
 
-def solve_tsp(name, comment, start_pos, tasks, scale_factor=1.0):
-
-    N = 1
-    node_coord_str = str(N) + ' ' + str(int(start_pos[0] * scale_factor)) + ' ' + str(int(start_pos[1] * scale_factor)) + '\n'
-
-    for task in tasks:
-        if task.is_pending():
-            N += 1
-            node_coord_str += str(N) + ' ' + str(int(task.location[0] * scale_factor)) + ' ' + str(int(task.location[1] * scale_factor)) + '\n'
-
+    pending_tasks = [task for task in tasks if task.is_pending()]
+    N = len(pending_tasks) + 1
     if N < 3:
         return ([[1, 2], ])
 
-    tsp_str = ""
-    tsp_str += 'NAME: ' + name + '\n'
-    tsp_str += 'TYPE: TSP\n'
-    tsp_str += 'COMMENT: ' + comment + '\n'
-    tsp_str += 'DIMENSION: ' + str(N) + '\n'
-    tsp_str += 'EDGE_WEIGHT_TYPE: EUC_2D\n'
-    tsp_str += 'NODE_COORD_SECTION:\n'
-    tsp_str += node_coord_str
-    tsp_str += 'EOF\n'
+    coords = _node_coords(start_pos, pending_tasks, scale_factor)
+
+    tsp_str = problem_text(
+        headers=[
+            ('NAME', name),
+            ('TYPE', 'TSP'),
+            ('COMMENT', comment),
+            ('DIMENSION', N),
+            ('EDGE_WEIGHT_TYPE', 'EUC_2D'),
+        ],
+        sections=[
+            ('NODE_COORD_SECTION', node_rows(coords)),
+        ]
+    )
 
-    problem = lkh.LKHProblem.parse(tsp_str)
-    path = lkh.solve(solver=solver_path, problem=problem, max_trials=10000, runs=5)
+    path = _solve(tsp_str, N, max_trials=10000, runs=5, tasks=pending_tasks, initial_tour=initial_tour,
+                  coords=coords, time_limit=time_limit, problem_type='TSP')
 
     return path
 
 
-def solve_time_tsp(name, comment, distances, scale_factor=1.0):
+def solve_time_tsp(name, comment, distances, scale_factor=1.0, tasks=None, initial_tour=None, time_limit=None):
 
     N = distances.shape[0]
     if N < 3:
         return ([[1, 2], ])
 
     distances = (distances * scale_factor).astype(int)
-    row_strs = [" ".join([str(e) for e in row]) for row in distances]
-    distance_str = "\n".join([row for row in row_strs])
-
-    tsp_str = ""
-    tsp_str += 'NAME: ' + name + '\n'
-    tsp_str += 'TYPE: ATSP\n'
-    tsp_str += 'COMMENT: ' + comment + '\n'
-    tsp_str += 'DIMENSION: ' + str(N) + '\n'
-    tsp_str += 'EDGE_WEIGHT_TYPE: EXPLICIT\n'
-    tsp_str += 'EDGE_WEIGHT_FORMAT: FULL_MATRIX\n'
-    tsp_str += 'EDGE_WEIGHT_SECTION: \n'
-    tsp_str += distance_str + '\n'
-    tsp_str += 'EOF\n'
-
-    problem = lkh.LKHProblem.parse(tsp_str)
-    path = lkh.solve(solver=solver_path, problem=problem, max_trials=10000, runs=5)
-
-    return path
 
+    tsp_str = problem_text(
+        headers=[
+            ('NAME', name),
+            ('TYPE', 'ATSP'),
+            ('COMMENT', comment),
+            ('DIMENSION', N),
+            ('EDGE_WEIGHT_TYPE', 'EXPLICIT'),
+            ('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX'),
+        ],
+        sections=[
+            ('EDGE_WEIGHT_SECTION', int_rows(distances)),
+        ]
+    )
+
+    path = _solve(tsp_str, N, max_trials=10000, runs=5, tasks=tasks, initial_tour=initial_tour, distances=distances,
+                  time_limit=time_limit, problem_type='ATSP')
 
-def solve_trp(name, comment, start_pos, tasks, simulation_time, mean_service_time=0, cost_exponent=1, scale_factor=1.0):
+    return path
 
-    N = 1
-    position_scale = scale_factor  # * 100
-    node_coord_str = 'NODE_COORD_SECTION:\n' + \
-        str(N) + ' ' + str(int(start_pos[0] * position_scale)) + ' ' + str(int(start_pos[1] * position_scale)) + '\n'
-    service_time_str = 'SERVICE_TIME_SECTION:\n' + str(N) + ' 0\n'
-    # repurposing demand to account for built-up wait
-    demand_str = 'DEMAND_SECTION: \n' + str(N) + ' 0\n'
 
-    for task in tasks:
-        if task.is_pending():
-            N += 1
-            node_coord_str += str(N) + ' ' + str(int(task.location[0] * position_scale)) + ' ' + str(int(task.location[1] * position_scale)) + '\n'
-            service_time_str += str(N) + ' ' + str(mean_service_time * scale_factor) + '\n'
-            demand_str += str(N) + ' ' + str(int((simulation_time - task.time + task.initial_wait) * scale_factor)) + '\n'
+def solve_trp(name, comment, start_pos, tasks, simulation_time, mean_service_time=0, cost_exponent=1, scale_factor=1.0, initial_tour=None,
+              time_limit=None):
 
+    pending_tasks = [task for task in tasks if task.is_pending()]
+    N = len(pending_tasks) + 1
     if N < 3:
         return ([[2], ])
 
-    tsp_str = ""
-    tsp_str += 'NAME: ' + name + '\n'
-    tsp_str += 'TYPE: TRP\n'
-    tsp_str += 'COMMENT: ' + comment + '\n'
-    tsp_str += 'DIMENSION: ' + str(N) + '\n'
-    tsp_str += 'RISK_THRESHOLD: ' + str(int(cost_exponent*10)) + '\n'
-    tsp_str += 'EDGE_WEIGHT_TYPE: EUC_2D\n'
-    # repurposing risk threshold for the cost exponent
-    tsp_str += node_coord_str
-    tsp_str += service_time_str
-    tsp_str += demand_str
-    tsp_str += 'DEPOT_SECTION:\n'
-    tsp_str += '1\n'
-    tsp_str += '-1\n'
-    tsp_str += 'EOF\n'
-
-    problem = lkh.LKHProblem.parse(tsp_str)
-    path = lkh.solve(solver=solver_path, problem=problem, max_trials=5000, runs=5)
+    coords = _node_coords(start_pos, pending_tasks, scale_factor)
+    service_times = _service_times(N, mean_service_time, scale_factor)
+    waits = _waits(pending_tasks, simulation_time, scale_factor)
+
+    tsp_str = problem_text(
+        headers=[
+            ('NAME', name),
+            ('TYPE', 'TRP'),
+            ('COMMENT', comment),
+            ('DIMENSION', N),
+            # repurposing risk threshold for the cost exponent, multiplied by 10 so it goes as an INT
+            ('RISK_THRESHOLD', int(cost_exponent*10)),
+            ('EDGE_WEIGHT_TYPE', 'EUC_2D'),
+        ],
+        sections=[
+            ('NODE_COORD_SECTION', node_rows(coords)),
+            ('SERVICE_TIME_SECTION', _service_time_rows(service_times)),
+            ('DEMAND_SECTION', node_rows(waits)),
+            ('DEPOT_SECTION', '1\n-1\n'),
+        ]
+    )
+
+    path = _solve(tsp_str, N, max_trials=5000, runs=5, depots=(1,), tasks=pending_tasks, initial_tour=initial_tour,
+                  coords=coords, time_limit=time_limit, latency=(service_times, waits, cost_exponent), problem_type='TRP')
 
     return path
 
 
-def solve_time_trp(name, comment, tasks, distances, simulation_time, mean_service_time=0, cost_exponent=1, scale_factor=1.0):
+def solve_time_trp(name, comment, tasks, distances, simulation_time, mean_service_time=0, cost_exponent=1, scale_factor=1.0, initial_tour=None,
+                   time_limit=None):
 
     N = distances.shape[0]
     if N < 3:
         return ([[2], ])
 
     distances = (distances * scale_factor).astype(int)
-    row_strs = [" ".join([str(e) for e in row]) for row in distances]
-    distance_str = "\n".join([row for row in row_strs])
-
-    service_time_str = 'SERVICE_TIME_SECTION:\n' + '1 0\n'  # no service time at the depot
-    service_time_str += '\n'.join([f'{n} {mean_service_time * scale_factor}' for n in range(2, N+1)]) + '\n'
-
-    # repurposing demand to account for built-up wait
-    demand_str = 'DEMAND_SECTION: \n' + '1 0\n'  # no waiting at the depot
-    for n, task in enumerate(tasks):
-        demand_str += f'{n+2} {int((simulation_time - task.time + task.initial_wait) * scale_factor)}\n'
-
-    tsp_str = ""
-    tsp_str += 'NAME: ' + name + '\n'
-    tsp_str += 'TYPE: TRP\n'
-    tsp_str += 'COMMENT: ' + comment + '\n'
-    tsp_str += 'DIMENSION: ' + str(N) + '\n'
-    tsp_str += 'RISK_THRESHOLD: ' + str(int(cost_exponent*10)) + '\n'
-    tsp_str += 'EDGE_WEIGHT_TYPE: EXPLICIT\n'
-    tsp_str += 'EDGE_WEIGHT_FORMAT: FULL_MATRIX\n'
-    tsp_str += 'EDGE_WEIGHT_SECTION: \n'
-    # repurpose RISK_THRESHOLD to pass in cost exponent, multiply by 10 so it goes as an INT
-    tsp_str += distance_str + '\n'
-    tsp_str += service_time_str + '\n'
-    tsp_str += demand_str + '\n'
-    tsp_str += 'DEPOT_SECTION:\n'
-    tsp_str += '1\n'
-    tsp_str += '-1\n'
-    tsp_str += 'EOF\n'
-
-    print(tsp_str)
-
-    problem = lkh.LKHProblem.parse(tsp_str)
-    path = lkh.solve(solver=solver_path, problem=problem, max_trials=10000, runs=5)
+    service_times = _service_times(N, mean_service_time, scale_factor)
+    waits = _waits(tasks, simulation_time, scale_factor)
+
+    tsp_str = problem_text(
+        headers=[
+            ('NAME', name),
+            ('TYPE', 'TRP'),
+            ('COMMENT', comment),
+            ('DIMENSION', N),
+            # repurposing risk threshold for the cost exponent, multiplied by 10 so it goes as an INT
+            ('RISK_THRESHOLD', int(cost_exponent*10)),
+            ('EDGE_WEIGHT_TYPE', 'EXPLICIT'),
+            ('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX'),
+        ],
+        sections=[
+            ('EDGE_WEIGHT_SECTION', int_rows(distances)),
+            ('SERVICE_TIME_SECTION', _service_time_rows(service_times)),
+            ('DEMAND_SECTION', node_rows(waits)),
+            ('DEPOT_SECTION', '1\n-1\n'),
+        ]
+    )
+
+    logger.debug("%s", tsp_str)
+
+    path = _solve(tsp_str, N, max_trials=10000, runs=5, depots=(1,), tasks=tasks, initial_tour=initial_tour, distances=distances,
+                  time_limit=time_limit, latency=(service_times, waits, cost_exponent), problem_type='TRP')
 
     return path
 
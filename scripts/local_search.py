@@ -0,0 +1,308 @@
+'''
+Built-in tour search, for when the LKH binary isn't available (or isn't worth starting for a tiny problem).  A
+nearest neighbour (or seed) tour is improved with 2-opt and Or-opt moves until no move helps, with all of the
+candidate moves of a kind evaluated at once with numpy.  Problems of only a few nodes are solved exactly, by
+enumerating the tours.
+
+Two objectives are supported: the length of a closed tour (TSP, or ATSP -- the costs needn't be symmetric), and
+the latency objective of the TRP policies, along an open path from the actor: the sum over the tasks of
+
+    (travel and service time until the task is served + the wait it has already had) ** exponent
+
+Every latency move changes the cost of all the stops after it, so for that objective only the moves within a
+window along the path are tried.
+'''
+from functools import partial
+from itertools import permutations
+from time import perf_counter
+import numpy as np
+
+from config import LOCAL_SEARCH_EXACT_NODES, LOCAL_SEARCH_SEGMENT_LENGTH, LOCAL_SEARCH_LATENCY_WINDOW
+
+# improvements smaller than this (relative to the cost) are rounding noise
+_TOLERANCE = 1e-9
+
+
+def nearest_neighbour_tour(costs, start=0):
+    """
+    Tour that always goes to the cheapest node not yet visited
+
+    Args:
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        start (int, optional): the first node. Defaults to 0.
+
+    Returns:
+        list: the tour (node indices from 0)
+    """
+    unvisited = np.ones(costs.shape[0], dtype=bool)
+    unvisited[start] = False
+    tour = [start, ]
+    for _ in range(costs.shape[0] - 1):
+        node = int(np.argmin(np.where(unvisited, costs[tour[-1]], np.inf)))
+        unvisited[node] = False
+        tour.append(node)
+    return tour
+
+
+def tour_length(tour, costs):
+    """
+    Length of a closed tour
+    """
+    tour = np.asarray(tour)
+    return float(costs[tour, np.roll(tour, -1)].sum())
+
+
+def latency_costs(paths, costs, service_times, waits, exponent=1):
+    """
+    Latency objective for a batch of open paths
+
+    Args:
+        paths (_type_): (k, N) array of paths (node indices from 0), each starting at the depot
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        service_times (_type_): (N, ) service time at each node
+        waits (_type_): (N, ) wait each node has already had
+        exponent (float, optional): the cost exponent. Defaults to 1.
+
+    Returns:
+        _type_: (k, ) the cost of each path
+    """
+    paths = np.atleast_2d(paths)
+    stops = paths[:, 1:]
+    served = np.cumsum(costs[paths[:, :-1], stops] + service_times[stops], axis=1)
+    return ((served + waits[stops]) ** exponent).sum(axis=1)
+
+
+def _improves(value, cost):
+    return value < cost - _TOLERANCE * max(1.0, abs(cost))
+
+
+def _all_tours(n):
+    # every ordering of nodes 1..n-1, after node 0
+    orders = np.array(list(permutations(range(1, n))), dtype=np.int64).reshape(-1, n - 1)
+    return np.column_stack((np.zeros(len(orders), dtype=np.int64), orders))
+
+
+def _two_opt_move(tour, costs):
+    # best reversal of tour[a..b] (1 <= a < b) -- the edges (a-1, a) and (b, b+1) are replaced by (a-1, b) and
+    # (a, b+1), and the edges in between are run backwards
+    t = np.asarray(tour)
+    following = np.roll(t, -1)
+    forward = costs[t, following]
+    backward = costs[following, t]
+    F = np.concatenate(([0], np.cumsum(forward)))
+    B = np.concatenate(([0], np.cumsum(backward)))
+
+    a = np.arange(1, len(t))[:, np.newaxis]
+    b = np.arange(1, len(t))[np.newaxis, :]
+    delta = costs[t[a - 1], t[b]] + costs[t[a], following[b]] - forward[a - 1] - forward[b] + (B[b] - B[a]) - (F[b] - F[a])
+    delta = np.where(b > a, delta, np.inf)
+
+    a, b = np.unravel_index(np.argmin(delta), delta.shape)
+    return delta[a, b], a + 1, b + 1
+
+
+def _or_opt_move(tour, costs, length):
+    # best move of the segment tour[i..i+length-1] (i >= 1) to between tour[j] and tour[j+1], keeping its direction
+    t = np.asarray(tour)
+    if len(t) < length + 2:
+        return np.inf, None, None
+    following = np.roll(t, -1)
+    forward = costs[t, following]
+
+    i = np.arange(1, len(t) - length + 1)[:, np.newaxis]
+    last = i + length - 1
+    removed = forward[i - 1] + forward[last] - costs[t[i - 1], following[last]]
+
+    j = np.arange(len(t))[np.newaxis, :]
+    delta = costs[t[j], t[i]] + costs[t[last], following[j]] - forward[j] - removed
+    delta = np.where((j < i - 1) | (j > last), delta, np.inf)
+
+    i, j = np.unravel_index(np.argmin(delta), delta.shape)
+    return delta[i, j], i + 1, j
+
+
+def _move_segment(tour, start, length, after):
+    # move tour[start:start+length] to follow the node at position after (in the original tour)
+    segment = tour[start:start + length]
+    rest = tour[:start] + tour[start + length:]
+    position = after if after < start else after - length
+    return rest[:position + 1] + segment + rest[position + 1:]
+
+
+def solve_tsp(costs, tour=None, time_limit=None):
+    """
+    Shortest closed tour through the nodes
+
+    Args:
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        tour (list, optional): tour to start from (node indices from 0, node 0 first) -- by default the nearest
+                               neighbour tour. Defaults to None.
+        time_limit (float, optional): wall clock limit (s) -- the best tour found by then is returned.
+                                      Defaults to None.
+
+    Returns:
+        list: the tour (node indices from 0), starting at node 0
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    n = costs.shape[0]
+    if n <= LOCAL_SEARCH_EXACT_NODES:
+        tours = _all_tours(n)
+        return tours[np.argmin(costs[tours, np.roll(tours, -1, axis=1)].sum(axis=1))].tolist()
+
+    deadline = perf_counter() + time_limit if time_limit is not None else np.inf
+    tour = list(tour) if tour is not None else nearest_neighbour_tour(costs)
+    cost = tour_length(tour, costs)
+
+    while perf_counter() < deadline:
+        delta, a, b = _two_opt_move(tour, costs)
+        if _improves(cost + delta, cost):
+            tour[a:b + 1] = tour[a:b + 1][::-1]
+            cost += delta
+            continue
+
+        for length in range(1, LOCAL_SEARCH_SEGMENT_LENGTH + 1):
+            delta, start, after = _or_opt_move(tour, costs, length)
+            if _improves(cost + delta, cost):
+                tour = _move_segment(tour, start, length, after)
+                cost += delta
+                break
+        else:
+            break
+
+    return tour
+
+
+def _latency_two_opt(path, cost, evaluate, window):
+    # for each start a, try every reversal of path[a..b] (up to the window long) at once and take the best
+    n = len(path)
+    columns = np.arange(n)[np.newaxis, :]
+    for a in range(1, n - 1):
+        b = np.arange(a + 1, min(n, a + window + 1))[:, np.newaxis]
+        candidates = path[np.where((columns >= a) & (columns <= b), a + b - columns, columns)]
+        values = evaluate(candidates)
+        best = np.argmin(values)
+        if _improves(values[best], cost):
+            path, cost = candidates[best], values[best]
+    return path, cost
+
+
+def _latency_or_opt(path, cost, evaluate, length, window):
+    # for each segment path[i..i+length-1], try every place (within the window) to move it to at once and take the best
+    n = len(path)
+    columns = np.arange(n)[np.newaxis, :]
+    for i in range(1, n - length + 1):
+        # the rest of the path, followed by the segment
+        nodes = np.concatenate((np.delete(path, range(i, i + length)), path[i:i + length]))
+        rest = n - length
+
+        # the segment goes after the q'th node of the rest -- other than where it came from
+        q = np.arange(max(0, i - 1 - window), min(rest, i + window))
+        q = q[q != i - 1][:, np.newaxis]
+        if not len(q):
+            continue
+        index = np.where(columns <= q, columns, np.where(columns <= q + length, rest + columns - q - 1, columns - length))
+        candidates = nodes[index]
+        values = evaluate(candidates)
+        best = np.argmin(values)
+        if _improves(values[best], cost):
+            path, cost = candidates[best], values[best]
+    return path, cost
+
+
+def _improve_latency(path, cost, evaluate, deadline=np.inf, passes=None):
+    # rounds of 2-opt and Or-opt moves until one doesn't help (or the deadline or the number of passes is reached)
+    while perf_counter() < deadline and (passes is None or passes > 0):
+        start_cost = cost
+        path, cost = _latency_two_opt(path, cost, evaluate, LOCAL_SEARCH_LATENCY_WINDOW)
+        for length in range(1, LOCAL_SEARCH_SEGMENT_LENGTH + 1):
+            path, cost = _latency_or_opt(path, cost, evaluate, length, LOCAL_SEARCH_LATENCY_WINDOW)
+        if not _improves(cost, start_cost):
+            break
+        if passes is not None:
+            passes -= 1
+    return path, cost
+
+
+def _latency_objective(costs, service_times, waits, exponent):
+    return partial(latency_costs, costs=np.asarray(costs, dtype=np.float64), service_times=np.asarray(service_times, dtype=np.float64),
+                   waits=np.asarray(waits, dtype=np.float64), exponent=exponent)
+
+
+def insert_latency(path, nodes, costs, service_times, waits, exponent=1):
+    """
+    Add nodes to an open path from the depot, one at a time, each where it adds the least latency cost
+
+    Args:
+        path (list): the path to add to (node indices from 0), starting at the depot
+        nodes (list): the nodes to add, in the order to add them
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        service_times (_type_): (N, ) service time at each node
+        waits (_type_): (N, ) wait each node has already had
+        exponent (float, optional): the cost exponent. Defaults to 1.
+
+    Returns:
+        tuple: the path and its cost
+    """
+    evaluate = _latency_objective(costs, service_times, waits, exponent)
+    path = np.asarray(path, dtype=np.int64)
+    for node in nodes:
+        # the node goes after each of the stops in turn
+        k = len(path)
+        columns = np.arange(k + 1)[np.newaxis, :]
+        position = np.arange(1, k + 1)[:, np.newaxis]
+        candidates = np.append(path, node)[np.where(columns < position, columns, np.where(columns == position, k, columns - 1))]
+        path = candidates[np.argmin(evaluate(candidates))]
+    return path.tolist(), evaluate(path)[0]
+
+
+def improve_latency(path, costs, service_times, waits, exponent=1, passes=None):
+    """
+    Improve an open path from the depot with 2-opt and Or-opt moves
+
+    Args:
+        path (list): the path (node indices from 0), starting at the depot
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        service_times (_type_): (N, ) service time at each node
+        waits (_type_): (N, ) wait each node has already had
+        exponent (float, optional): the cost exponent. Defaults to 1.
+        passes (int, optional): the most rounds of moves to make -- by default, until no move helps.
+                                Defaults to None.
+
+    Returns:
+        tuple: the path and its cost
+    """
+    evaluate = _latency_objective(costs, service_times, waits, exponent)
+    path = np.asarray(path, dtype=np.int64)
+    path, cost = _improve_latency(path, evaluate(path)[0], evaluate, passes=passes)
+    return path.tolist(), cost
+
+
+def solve_trp(costs, service_times, waits, exponent=1, tour=None, time_limit=None):
+    """
+    Open path from the depot (node 0) through the nodes with the least latency cost (see latency_costs())
+
+    Args:
+        costs (_type_): (N, N) matrix of the travel costs between the nodes
+        service_times (_type_): (N, ) service time at each node
+        waits (_type_): (N, ) wait each node has already had
+        exponent (float, optional): the cost exponent. Defaults to 1.
+        tour (list, optional): path to start from (node indices from 0, node 0 first) -- by default the nearest
+                               neighbour path. Defaults to None.
+        time_limit (float, optional): wall clock limit (s) -- the best path found by then is returned.
+                                      Defaults to None.
+
+    Returns:
+        list: the path (node indices from 0), starting at node 0
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    evaluate = _latency_objective(costs, service_times, waits, exponent)
+    n = costs.shape[0]
+    if n <= LOCAL_SEARCH_EXACT_NODES:
+        paths = _all_tours(n)
+        return paths[np.argmin(evaluate(paths))].tolist()
+
+    deadline = perf_counter() + time_limit if time_limit is not None else np.inf
+    path = np.array(tour if tour is not None else nearest_neighbour_tour(costs), dtype=np.int64)
+    path, _ = _improve_latency(path, evaluate(path)[0], evaluate, deadline=deadline)
+
+    return path.tolist()
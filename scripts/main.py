@@ -2,7 +2,15 @@ import argparse
 from random import seed
 from simulation import Simulation
 from config import *
-import pygame
+from event_trace import EventTrace, RUN_STARTED
+from delivery_log import DeliveryLog, DELIVERY_LOG_FORMATS
+from results_store import ResultsStore, run_key
+from tour_cache import configure_tour_cache
+from solver_dispatch import configure_solver_dispatch
+from lkh_interface import configure_solver, SOLVERS
+from policies.alns import configure_search, SEARCHES, ACCEPTANCES
+from telemetry import get_telemetry, telemetry_rows, summary_rows, TELEMETRY_HEADER, TELEMETRY_SUMMARY_HEADER
+import logging
 
 from importlib import import_module
 from os import path, mkdir
@@ -11,9 +19,31 @@ from pickle import load, dump
 from math import floor
 
 
-def simulate(args, delivery_log=None):
+def normalize_args(args):
+    """resolve the task counts that depend on other arguments
+    """
+    if args.total_tasks < args.max_tasks:
+        args.total_tasks = args.max_tasks
+
+    # override initial tasks
+    if args.initial_tasks < 0:
+        # estimate the pending queue based on lambda
+        if args.service_time:
+            args.initial_tasks = floor(args.lambd * BETA**2 / ((1-args.lambd*args.service_time)**2))
+        else:
+            args.initial_tasks = floor(args.lambd * BETA**2 / ((1-args.lambd)**2))
+
+
+def simulate(args, delivery_log=None, event_trace=None):
+
+    configure_solver(args.solver)
+    configure_search(args.alns_search, args.alns_acceptance)
+    configure_tour_cache(cache_dir=args.tour_cache)
+    # solves for different actors can only overlap with a worker for each
+    configure_solver_dispatch(workers=args.planning_workers if args.async_planning or args.parallel_planning else SOLVER_WORKERS)
 
     if args.show_sim:
+        import pygame
         pygame.init()
         size = (args.width, args.height)
         screen = pygame.display.set_mode(size)
@@ -23,6 +53,7 @@ def simulate(args, delivery_log=None):
         clock = pygame.time.Clock()
         pygame.font.init()
     elif args.record_data:
+        import pygame
         # pygame.init()
         size = (args.width, args.height)
         surface = pygame.Surface(size, pygame.SRCALPHA)
@@ -40,15 +71,7 @@ def simulate(args, delivery_log=None):
     else:
         seed(time())
 
-    if args.total_tasks < args.max_tasks:
-        args.total_tasks = args.max_tasks
-
-    # override initial tasks
-    if args.initial_tasks < 0:
-        if args.service_time:
-            args.initial_tasks = floor(args.lambd * BETA**2 / ((1-args.lambd*args.service_time)**2))
-        else:
-            args.initial_tasks = floor(args.lambd * BETA**2 / ((1-args.lambd)**2))
+    normalize_args(args)
 
     generator_args = GENERATOR_ARGS
     generator_args['seed'] = args.seed
@@ -60,6 +83,7 @@ def simulate(args, delivery_log=None):
     generator_args['data_source'] = args.data_source
     generator_args['sectors'] = args.sectors
     generator_args['centralized'] = args.centralized
+    generator_args['headless'] = not (args.show_sim or args.record_data)
 
     sim = Simulation(
         policy_name=args.policy,
@@ -70,6 +94,11 @@ def simulate(args, delivery_log=None):
             'eta_first': args.eta_first,
             'gamma': args.gamma,
             'sectors': args.sectors,
+            'warm_start': not args.cold_start,
+            'incremental': args.incremental_replan,
+            'replan_threshold': args.replan_threshold,
+            'replan_refresh': args.replan_refresh,
+            'max_solver_time': args.max_solver_time,
         },
         generator_args=generator_args,
         num_actors=args.actors,
@@ -80,7 +109,13 @@ def simulate(args, delivery_log=None):
         max_time=args.max_time,
         record_data=args.record_data,
         centralized=args.centralized,
-        delivery_log=delivery_log
+        delivery_log=delivery_log,
+        event_driven=args.event_driven,
+        event_trace=event_trace,
+        async_planning=args.async_planning,
+        planning_workers=args.planning_workers,
+        planning_latency_scale=args.planning_latency_scale,
+        parallel_planning=args.parallel_planning
     )
 
     if args.seed is not None and args.data_source is None:
@@ -124,6 +159,54 @@ def simulate(args, delivery_log=None):
     return sim
 
 
+RESULTS_HEADER = 'policy,seed,lambda,rho,sectors,cost-exponent,eta,eta-first,sim-time,avg-srv-time,tasks-srvd,max-wait-time,avg-wait-time,wait-sd,total-travel-distance,avg-agent-dist,avg-task-dist,max-agent-dist,max_queue_len\n'
+
+
+def results_name(args, seed=None):
+    """name of the results file for a set of runs -- tagged with the seed if there is only the one
+
+    Args:
+        args (_type_): the run arguments
+        seed (_type_, optional): the seed of a single run. Defaults to None.
+    """
+    seed_str = '' if seed is None else '_' + str(seed) + 's'
+    if args.eta_first:
+        eta_str = str(args.eta) + 'ef_'
+    else:
+        eta_str = str(args.eta) + 'e_'
+
+    return args.prefix + args.policy + '_' + str(args.sectors) + 'sc_' + str(args.cost_exponent) + 'p_' + eta_str + \
+        str(args.lambd) + 'l_' + str(args.service_time) + 't' + seed_str + ".csv"
+
+
+def delivery_log_name(results_str, format):
+    return 'DeliveryLog_' + path.splitext(results_str)[0] + DELIVERY_LOG_FORMATS[format]
+
+
+def telemetry_name(results_str, summary=False):
+    return ('TelemetrySummary_' if summary else 'Telemetry_') + results_str
+
+
+def run_params(args):
+    """the parameters of a run, as recorded with its deliveries
+    """
+    return dict(policy=args.policy, seed=args.seed, lambd=args.lambd, sectors=args.sectors, cost_exponent=args.cost_exponent,
+                eta=args.eta, eta_first=args.eta_first, service_time=args.service_time)
+
+
+def results_row(args, sim):
+    """one line of the results file for a completed run
+    """
+    policy = args.policy.replace('_', ' ')
+    return (
+        str(policy) + "," + str(args.seed) + "," + str(args.lambd) + "," + str(sim.rho) + "," + str(args.sectors) + "," + str(args.cost_exponent) + "," + str(args.eta) + "," + str(args.eta_first) + "," + str(sim.sim_time) + "," + str(sim._avg_served_time) + "," + str(len(sim.serviced_tasks)) + "," +
+        str(sim._max_served_time) + "," + str(sim._avg_served_time / len(sim.serviced_tasks)) + "," + str(sim.calculate_sd()) + "," +
+        str(sim._total_travel_distance) + "," +
+        str(sim._total_travel_distance / len(sim.actor_list)) + "," + str(sim._total_travel_distance / len(sim.serviced_tasks)) + "," +
+        str(sim._max_travel_distance) + "," + str(sim._max_queue_length) + "\n"
+    )
+
+
 def multiple_sims(args):
 
     if not path.isdir(RESULTS_DIR):
@@ -137,50 +220,65 @@ def multiple_sims(args):
         args.prefix = args.prefix + '_'
 
     if args.seed is None:
-        seeds = [21, 6983, 42, 520, 97, 29348, 935567]
-        seed_str = ''
+        seeds = DEFAULT_SEEDS
     else:
         seeds = [args.seed, ]
-        seed_str = '_' + str(args.seed) + 's'
-
-    if args.eta_first:
-        eta_str = str(args.eta) + 'ef_'
-    else:
-        eta_str = str(args.eta) + 'e_'
 
-    results_str = args.prefix + args.policy + '_' + str(args.sectors) + 'sc_' + str(args.cost_exponent) + 'p_' + eta_str + \
-        str(args.lambd) + 'l_' + str(args.service_time) + 't' + seed_str + ".csv"
+    results_str = results_name(args, args.seed)
     results_file_name = path.join(RESULTS_DIR, results_str)
     f = open(results_file_name, 'w')
-    f.write('policy,seed,lambda,rho,sectors,cost-exponent,eta,eta-first,sim-time,avg-srv-time,tasks-srvd,max-wait-time,avg-wait-time,wait-sd,total-travel-distance,avg-agent-dist,avg-task-dist,max-agent-dist,max_queue_len\n')
+    f.write(RESULTS_HEADER)
     f.flush
 
-    delivery_log_str = 'DeliveryLog_' + results_str
-    delivery_log_name = path.join(RESULTS_DIR, delivery_log_str)
-    delivery_log = open(delivery_log_name, 'w')
-    delivery_log.write('id,px,py,t_arrive,t_service,t_initial\n')
-    delivery_log.flush()
+    # each run is written to the delivery log as it completes -- when resuming, the runs already in it are kept
+    delivery_log = DeliveryLog(path.join(RESULTS_DIR, delivery_log_name(results_str, args.delivery_log_format)),
+                               format=args.delivery_log_format, buffer_rows=None, append=args.resume)
 
-    if args.initial_tasks < 0:
-        # estimate the pending queue based on lambda
-        if args.service_time:
-            args.initial_tasks = floor(args.lambd * BETA**2 / ((1-args.lambd*args.service_time)**2))
-        else:
-            args.initial_tasks = floor(args.lambd * BETA**2 / ((1-args.lambd)**2))
+    event_trace = EventTrace(args.event_trace) if args.event_trace is not None else None
+
+    # every solver call of each run, and a summary per solver -- kept (like the delivery log) when resuming
+    telemetry = get_telemetry()
+    telemetry.enabled = args.solver_telemetry
+    if args.solver_telemetry:
+        telemetry_files = []
+        for name, header in ((telemetry_name(results_str), TELEMETRY_HEADER), (telemetry_name(results_str, summary=True), TELEMETRY_SUMMARY_HEADER)):
+            file_name = path.join(RESULTS_DIR, name)
+            append = args.resume and path.exists(file_name)
+            telemetry_files.append(open(file_name, 'a' if append else 'w'))
+            if not append:
+                telemetry_files[-1].write(header)
+
+    store = ResultsStore(path.join(RESULTS_DIR, RESULTS_STORE_FILE))
+    normalize_args(args)
 
     for seed in seeds:
         args.seed = seed
+        key = run_key(args)
+        if args.resume:
+            record = store.get(key)
+            if record is not None:
+                print(f"================= LAMBDA: {args.lambd}, SEED: {seed} -- already complete =================")
+                f.write(record['results'])
+                f.flush()
+                continue
+
         print(f"================= LAMBDA: {args.lambd}, SEED: {seed} =================")
-        sim = simulate(args, delivery_log)
-        policy = args.policy.replace('_', ' ')
-        f.write(
-            str(policy) + "," + str(args.seed) + "," + str(args.lambd) + "," + str(sim.rho) + "," + str(args.sectors) + "," + str(args.cost_exponent) + "," + str(args.eta) + "," + str(args.eta_first) + "," + str(sim.sim_time) + "," + str(sim._avg_served_time) + "," + str(len(sim.serviced_tasks)) + "," +
-            str(sim._max_served_time) + "," + str(sim._avg_served_time / len(sim.serviced_tasks)) + "," + str(sim.calculate_sd()) + "," +
-            str(sim._total_travel_distance) + "," +
-            str(sim._total_travel_distance / len(sim.actor_list)) + "," + str(sim._total_travel_distance / len(sim.serviced_tasks)) + "," +
-            str(sim._max_travel_distance) + "," + str(sim._max_queue_length) + "\n"
-        )
+        if event_trace is not None:
+            event_trace.write(RUN_STARTED, 0, task_id=seed)
+        delivery_log.start_run(**run_params(args))
+        telemetry.take()
+        sim = simulate(args, delivery_log, event_trace)
+        delivery_log.end_run()
+        row = results_row(args, sim)
+        f.write(row)
         f.flush()
+        store.add(key, results=row, delivery_log=delivery_log.file_name)
+
+        if args.solver_telemetry:
+            calls = telemetry.take()
+            for fp, rows in zip(telemetry_files, (telemetry_rows(seed, calls), summary_rows(seed, calls))):
+                fp.write(rows)
+                fp.flush()
 
         if args.actor_stats:
             actor_stats_file = path.join(RESULTS_DIR, args.prefix + 'actor_' + args.policy + '_' +
@@ -197,10 +295,15 @@ def multiple_sims(args):
                 fp.flush()
 
     delivery_log.close()
+    if event_trace is not None:
+        event_trace.close()
+    if args.solver_telemetry:
+        for fp in telemetry_files:
+            fp.close()
     f.close()
 
 
-if __name__ == "__main__":
+def build_argparser():
     argparser = argparse.ArgumentParser(
         description=__doc__)
     argparser.add_argument(
@@ -293,6 +396,10 @@ if __name__ == "__main__":
         default=TICK_TIME,
         type=float,
         help='Length of Simulation Time Step')
+    argparser.add_argument(
+        '--event-driven',
+        action='store_true',
+        help='Skip the clock ahead to the next arrival/service event instead of stepping every tick (headless only)')
     argparser.add_argument(
         '--max-time',
         default=None,
@@ -329,6 +436,76 @@ if __name__ == "__main__":
         '--eta-first',
         action='store_true', default=False,
         help='Force the eta-segment to start at 1')
+    argparser.add_argument(
+        '--solver',
+        default='auto',
+        choices=SOLVERS,
+        help='Solver for the LKH policies -- LKH, the built-in local search (2-opt/Or-opt, no external binary), or auto: '
+             'LKH if it has been built, local search otherwise')
+    argparser.add_argument(
+        '--max-solver-time',
+        default=DEFAULT_POLICY_MAX_SOLVER_TIME,
+        type=float,
+        help='Wall clock limit (s) on each planning call -- the best plan found by then is used')
+    argparser.add_argument(
+        '--async-planning',
+        action='store_true',
+        help='Plan off the simulation thread -- actors carry on with their current path while the solver runs.  Results '
+             'depend on wall clock solve times, so they are not reproducible')
+    argparser.add_argument(
+        '--planning-workers',
+        default=PLANNING_WORKERS,
+        type=int,
+        help='Number of plans that can be in progress at once (async or parallel planning)')
+    argparser.add_argument(
+        '--parallel-planning',
+        action='store_true',
+        help='Solve the plans for all the actors in a tick concurrently (one actor per cluster, e.g., the Montreal data) '
+             '-- the plans are still assigned in actor order, so the results are unchanged')
+    argparser.add_argument(
+        '--planning-latency-scale',
+        default=None,
+        type=float,
+        help='Charge planning time as simulated time (async planning) -- a plan is applied once this many simulated '
+             'seconds per second of planning have passed, with the simulation waiting for the solver if it gets there '
+             'first (0 plans as synchronously).  By default a plan is applied as soon as it is ready, with the simulation '
+             'running at its own pace in the meantime')
+    argparser.add_argument(
+        '--tour-cache',
+        default=None,
+        help='Directory for keeping solved tours on disk, so that repeated runs (e.g., the same seeds) can reuse them')
+    argparser.add_argument(
+        '--cold-start',
+        action='store_true',
+        help="Solve every LKH replan from scratch instead of starting from the actor's current route")
+    argparser.add_argument(
+        '--incremental-replan',
+        action='store_true',
+        help='Continuous TRP policies: insert newly arrived tasks into the current route, replanning in full only when '
+             'that looks worthwhile (see --replan-threshold) or is due (see --replan-refresh)')
+    argparser.add_argument(
+        '--replan-threshold',
+        default=INCREMENTAL_REPLAN_THRESHOLD,
+        type=float,
+        help='Replan in full when a round of local moves would improve the incremental route by more than this fraction')
+    argparser.add_argument(
+        '--replan-refresh',
+        default=INCREMENTAL_REPLAN_REFRESH,
+        type=int,
+        help='Replan in full after this many incremental replans in a row')
+    argparser.add_argument(
+        '--alns-search',
+        default='greedy',
+        choices=SEARCHES,
+        help='Operators of the ALNS policies (tsp, quad_wait_tsp, ...) -- greedy: random removal and greedy insertion only '
+             '(the original search); adaptive: related, worst, route and random removal with greedy and regret insertion, '
+             'picked by adaptive weights')
+    argparser.add_argument(
+        '--alns-acceptance',
+        default='improve',
+        choices=list(ACCEPTANCES.keys()),
+        help='Which candidates the ALNS policies move to -- improvements only (the original search), simulated annealing or '
+             'record-to-record')
     argparser.add_argument(
         '--multipass',
         action='store_true',
@@ -338,10 +515,44 @@ if __name__ == "__main__":
         default=None,
         help='CSV file containing task locations. Durations/Distances are loaded from a companion file, <data-source root>.distances.csv.  If the distance file is unavailable, euclidean distances are used instead')
 
+    argparser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip runs that have already been completed (see results_store.py) and keep their results')
+    argparser.add_argument(
+        '--delivery-log-format',
+        default='csv',
+        choices=list(DELIVERY_LOG_FORMATS.keys()),
+        help='File format of the delivery log (multipass).  npz and parquet also record the run parameters as columns')
+    argparser.add_argument(
+        '--log-level',
+        default='WARNING',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+        help='Logging level -- DEBUG reports every task arrival and service')
+    argparser.add_argument(
+        '--event-trace',
+        default=None,
+        help='Write a binary trace of the simulation events to this file (see event_trace.py)')
+    argparser.add_argument(
+        '--solver-telemetry',
+        action='store_true',
+        help='Record every solver call (time, size, objective before and after, iterations, limit hit) in Telemetry_<results> '
+             'and a summary per solver in TelemetrySummary_<results> (multipass)')
+
+    return argparser
+
+
+if __name__ == "__main__":
+    argparser = build_argparser()
     args = argparser.parse_args()
 
+    logging.basicConfig(level=args.log_level, format='%(message)s')
+
     if args.multipass:
         multiple_sims(args)
 
     else:
-        simulate(args)
+        event_trace = EventTrace(args.event_trace) if args.event_trace is not None else None
+        simulate(args, event_trace=event_trace)
+        if event_trace is not None:
+            event_trace.close()
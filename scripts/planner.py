@@ -0,0 +1,168 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from config import PLANNING_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class _Plan:
+    __slots__ = ('actor', 'request', 'future', 'submit_time', 'submit_clock', 'ready_time', 'tours')
+
+    def __init__(self, actor, request, future, submit_time, submit_clock):
+        self.actor = actor
+        self.request = request
+        self.future = future
+        self.submit_time = submit_time
+        self.submit_clock = submit_clock
+        self.ready_time = None
+        self.tours = None
+
+
+def supports_planning(policy):
+    """
+    Whether a policy (as returned by get_policy()) can be handed to a planner -- i.e., its object splits the policy
+    into prepare(), solve() and assign()
+    """
+    policy_object = getattr(policy, '__self__', None)
+    return all(hasattr(policy_object, name) for name in ('prepare', 'solve', 'assign'))
+
+
+def supports_async(policy):
+    """
+    Whether a policy can be planned asynchronously -- it has to split (see supports_planning()), and its plans have to
+    hold up when assigned in a later tick than the one they were made in
+    """
+    return supports_planning(policy) and getattr(policy.__self__, 'async_planning', True)
+
+
+def plans_together(policy):
+    """
+    Whether a policy plans for several actors at once -- its object has a plan_actors(), which takes the place of
+    the policy and is called once a tick with all of the actors of a cluster
+    """
+    return hasattr(getattr(policy, '__self__', None), 'plan_actors')
+
+
+class AsyncPlanner:
+    """
+    Runs the solver part of a policy off the simulation thread.  Each actor's planning request is prepared on the
+    simulation thread, solved on a worker, and the resulting tour assigned back on the simulation thread once it
+    is ready -- in the meantime the actor carries on with its current path and the clock keeps running.  An
+    actor has at most one plan in progress; with more than one worker, the plans for different actors overlap.
+
+    When latency_scale is None a plan is applied on the first tick after its solve finishes, so how much simulated
+    time passes depends on how fast the simulation runs.  Otherwise the planning time (from the request, so waiting
+    for a worker counts) is charged in simulated time -- latency_scale simulated seconds per second -- and the plan
+    is applied when the clock gets there.  The simulation only waits for a solve once the clock has caught up with
+    the time charged for it so far.  With a scale of 0 each plan is applied in the tick it was started, as with
+    synchronous planning.
+    """
+
+    def __init__(self, policy, workers=PLANNING_WORKERS, latency_scale=None):
+        self.policy = policy.__self__
+        self.latency_scale = latency_scale
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='planner')
+        self._plans = {}
+
+    def _timed_solve(self, request):
+        tours = self.policy.solve(request)
+        return tours, perf_counter()
+
+    def is_planning(self, actor):
+        return actor.id in self._plans
+
+    def plan(self, actor, tasks, field, current_time):
+        """
+        Start planning for the actor, unless it already has a plan in progress or the policy has nothing to do
+        """
+        if actor.id in self._plans:
+            return
+
+        request = self.policy.prepare(actor, tasks, field, current_time)
+        if request is None:
+            return
+
+        submit_clock = perf_counter()
+        self._plans[actor.id] = _Plan(actor, request, self._executor.submit(self._timed_solve, request), current_time, submit_clock)
+
+    def update(self, current_time):
+        """
+        Assign the plans that are ready by the current time, in the order they were started
+        """
+        for actor_id, plan in list(self._plans.items()):
+            if plan.ready_time is None:
+                if not plan.future.done():
+                    # the plan can't be ready before the time spent on it so far has been charged -- until then the
+                    # simulation carries on, and after that it waits for the solver
+                    if self.latency_scale is None or current_time < plan.submit_time + (perf_counter() - plan.submit_clock) * self.latency_scale:
+                        continue
+
+                plan.tours, finish_clock = plan.future.result()
+                latency = finish_clock - plan.submit_clock
+                plan.ready_time = plan.submit_time + (0 if self.latency_scale is None else latency * self.latency_scale)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[%.2f]: Plan for actor %d took %.3fs -- ready at %.2f", current_time, actor_id, latency, plan.ready_time)
+
+            if current_time >= plan.ready_time:
+                del self._plans[actor_id]
+                self.policy.assign(plan.actor, plan.request, plan.tours)
+
+    def close(self):
+        """
+        Drop any plans still in progress
+        """
+        for plan in self._plans.values():
+            plan.future.cancel()
+        self._executor.shutdown(wait=False)
+        self._plans = {}
+
+
+class ParallelPlanner:
+    """
+    Plans for all of the actors in a tick at once.  Every actor's planning request is prepared (in actor order), the
+    solves run concurrently on the workers, and the tours are assigned in actor order once they are all done -- so
+    the outcome is the same as planning for one actor after another.  That only holds when no actor's plan depends
+    on another's, i.e., each actor plans over its own tasks (one actor per cluster).
+    """
+
+    def __init__(self, policy, workers=PLANNING_WORKERS):
+        self.policy = policy.__self__
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='planner')
+        self._futures = []
+
+    def plan(self, actor_tasks, field, current_time):
+        """
+        Plan for each of the actors
+
+        Args:
+            actor_tasks (list): (actor, tasks) pairs -- the tasks available to each actor
+            field (_type_): the field the actors are on (or None)
+            current_time (float): the simulation time
+        """
+        requests = []
+        for actor, tasks in actor_tasks:
+            request = self.policy.prepare(actor, tasks, field, current_time)
+            if request is not None:
+                requests.append((actor, request))
+
+        if len(requests) == 1:
+            # nothing to overlap with
+            actor, request = requests[0]
+            self.policy.assign(actor, request, self.policy.solve(request))
+            return
+
+        self._futures = [self._executor.submit(self.policy.solve, request) for _, request in requests]
+        for (actor, request), future in zip(requests, self._futures):
+            self.policy.assign(actor, request, future.result())
+        self._futures = []
+
+    def close(self):
+        """
+        Drop any solves left over from a tick that didn't finish planning
+        """
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        self._futures = []
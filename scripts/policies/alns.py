@@ -0,0 +1,649 @@
+'''
+Adaptive large neighbourhood search (ALNS) over the tours of several actors, shared by the multi-actor TSP and wait
+policies.  Each iteration takes a few stops out of the incumbent tours (a destroy operator) and puts them back (a
+repair operator); the candidate replaces the incumbent if it is cheaper.  The operators are picked by roulette on
+weights that follow how well each has done recently.  What the tours cost is up to an objective -- distance, the sum of
+the waits, the sum of wait**p or a weighted mix of the mean and the max wait -- which also prices each insertion.
+'''
+from config import ALNS_REMOVALS, ALNS_MAX_REMOVALS, ALNS_MAX_STALL, ALNS_SEGMENT_LENGTH, ALNS_REACTION, ALNS_SCORES
+from config import ALNS_RELATED_RANDOMNESS, ALNS_WORST_RANDOMNESS, ALNS_ANNEALING_START, ALNS_ANNEALING_COOLING, ALNS_RECORD_DEVIATION
+from policies.util import TourState, wait_costs, insertion_costs, removal_gains, tour_arrivals, route_legs, route_arrivals
+from telemetry import get_telemetry
+from abc import ABC, abstractmethod
+from random import randint, shuffle, random
+from time import time
+from numpy import inf
+from math import exp, log
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def initialize_tours(actors):
+    tours = {}
+    for _i in range(len(actors)):
+        tours[_i] = []
+        tours[_i].append(_i)
+
+    return tours
+
+
+def random_task_assignment(tours, num_tasks):
+    num_actors = len(tours)
+
+    for _i in range(num_actors, num_tasks):
+        rnd_actor = randint(0, num_actors - 1)
+        tours[rnd_actor].append(_i)
+    return tours
+
+
+def route_starts(routes):
+    """the index of the first stop of each route, with the stops of all the routes laid out in one array
+    """
+    return np.concatenate(([0, ], np.cumsum([len(route) for route in routes])[:-1]))
+
+
+class Objective(ABC):
+    """the cost of a set of tours -- costs() prices each route, tour_insertion_costs() the increase in a tour's cost
+    for inserting a vertex at each position 1..len(tour).  Stops are related (see relatedness) by how close they are
+    and, for the wait objectives, by how long they have waited.
+    """
+    problem = None
+
+    def __init__(self, distance_matrix, offsets=None):
+        self.distance_matrix = distance_matrix
+        self.offsets = offsets
+        self._distance_scale = max(float(distance_matrix.max()), 1e-12) if distance_matrix.size else 1
+        self._offset_scale = max(float(np.ptp(offsets)), 1e-12) if offsets is not None and len(offsets) else None
+
+    @abstractmethod
+    def costs(self, routes):
+        """the cost of each of the routes
+        """
+
+    @abstractmethod
+    def tour_insertion_costs(self, tour, vertex):
+        """the increase in the tour's cost for inserting the vertex at each position 1..len(tour)
+        """
+
+    def insertion_costs(self, routes, vertex):
+        """the increase in cost for inserting the vertex after each stop of the routes, for all the routes in one
+        array (laid out as the stops, see route_starts)
+        """
+        return np.concatenate([self.tour_insertion_costs(route, vertex) for route in routes])
+
+    def removal_gains(self, routes):
+        """the decrease in cost for taking out each stop of the routes (laid out as the stops, see route_starts) --
+        -inf for the first stop of each route, which can't be taken out
+        """
+        lengths = np.array([len(route) for route in routes])
+        variants = [route[:_i] + route[_i + 1:] for route in routes for _i in range(1, len(route))]
+
+        gains = np.full(lengths.sum(), -inf)
+        if len(variants):
+            removable = np.ones(len(gains), dtype=bool)
+            removable[route_starts(routes)] = False
+            gains[removable] = np.repeat(self.costs(routes), lengths - 1) - self.costs(variants)
+        return gains
+
+    def relatedness(self, vertex, others):
+        """how related the vertex is to each of the others (lower is closer), distances and waits each scaled to [0, 1]
+        """
+        related = self.distance_matrix[vertex, others] / self._distance_scale
+        if self._offset_scale is not None:
+            related = related + np.abs(self.offsets[others] - self.offsets[vertex]) / self._offset_scale
+        return related
+
+    def total(self, tours):
+        return float(self.costs(list(tours.values())).sum())
+
+
+class DistanceObjective(Objective):
+    """the length of the tours
+    """
+    problem = 'mTSP'
+
+    def costs(self, routes):
+        return wait_costs(routes, self.distance_matrix, None, cost_exponent=0)
+
+    def tour_insertion_costs(self, tour, vertex):
+        return insertion_costs(tour, vertex, self.distance_matrix, None, cost_exponent=0)
+
+    def insertion_costs(self, routes, vertex):
+        # a detour between consecutive stops, or the leg out to the vertex after the last stop of a route
+        stops, legs, starts = route_legs(routes, self.distance_matrix)
+        costs = self.distance_matrix[stops, vertex]
+        costs[:-1] += self.distance_matrix[vertex, stops[1:]] - legs[1:]
+        ends = np.append(starts[1:] - 1, len(stops) - 1)
+        costs[ends] = self.distance_matrix[stops[ends], vertex]
+        return costs
+
+    def removal_gains(self, routes):
+        # the leg into the stop, plus the detour from the stop before to the one after
+        stops, legs, starts = route_legs(routes, self.distance_matrix)
+        gains = legs.copy()
+        inner = np.ones(len(stops), dtype=bool)
+        inner[starts] = False
+        inner[np.append(starts[1:] - 1, len(stops) - 1)] = False
+        inner = np.flatnonzero(inner)
+        gains[inner] += legs[inner + 1] - self.distance_matrix[stops[inner - 1], stops[inner + 1]]
+        gains[starts] = -inf
+        return gains
+
+
+class WaitObjective(Objective):
+    """the sum of wait**cost_exponent over the stops (cost_exponent 1 is the total wait, 0 the length of the tours)
+
+    Args:
+        distance_matrix (_type_): travel costs between the nodes
+        offsets (_type_): the wait each node has already had (see wait_offsets)
+        service_time (float, optional): service time at each stop. Defaults to 0.
+        cost_exponent (float, optional): the exponent of the wait cost. Defaults to 1.
+        skip_first (bool, optional): leave the first stop (the actor) out of the cost. Defaults to True.
+    """
+    problem = 'mTRP'
+
+    def __init__(self, distance_matrix, offsets, service_time=0, cost_exponent=1, skip_first=True):
+        super().__init__(distance_matrix, offsets)
+        self.service_time = service_time
+        self.cost_exponent = cost_exponent
+        self.skip_first = skip_first
+
+    def costs(self, routes):
+        return wait_costs(routes, self.distance_matrix, self.offsets, self.service_time, self.cost_exponent, skip_first=self.skip_first)
+
+    def tour_insertion_costs(self, tour, vertex):
+        # the wait of the first stop never changes, so skip_first doesn't matter here
+        return insertion_costs(tour, vertex, self.distance_matrix, self.offsets, self.service_time, self.cost_exponent)
+
+    def removal_gains(self, routes):
+        return np.concatenate([np.append(-inf, removal_gains(route, self.distance_matrix, self.offsets, self.service_time, self.cost_exponent))
+                               if len(route) > 1 else [-inf, ] for route in routes])
+
+
+class WeightedWaitObjective(Objective):
+    """w_avg times the mean wait plus w_max times the max wait, for each tour -- the mean (not the sum) of the waits
+    keeps the two terms on the same scale
+
+    Args:
+        distance_matrix (_type_): travel costs between the nodes
+        offsets (_type_): the wait each node has already had (see wait_offsets)
+        service_time (float, optional): service time at each stop. Defaults to 0.
+        w_avg (float, optional): the weight of the mean wait. Defaults to 0.8.
+        w_max (float, optional): the weight of the max wait. Defaults to 0.2.
+    """
+    problem = 'mTRP'
+
+    def __init__(self, distance_matrix, offsets, service_time=0, w_avg=0.8, w_max=0.2):
+        super().__init__(distance_matrix, offsets)
+        self.service_time = service_time
+        self.w_avg = w_avg
+        self.w_max = w_max
+
+    def costs(self, routes):
+        stops, arrivals, starts = route_arrivals(routes, self.distance_matrix, self.service_time)
+        waits = arrivals + self.offsets[stops]
+
+        # the mean is over the stops after the first -- a route with only the agent has no average
+        counts = np.diff(np.append(starts, len(stops))) - 1
+        avg = np.divide(np.add.reduceat(waits, starts), counts, out=np.zeros(len(starts)), where=counts > 0)
+
+        return self.w_avg * avg + self.w_max * np.maximum.reduceat(waits, starts)
+
+    def tour_insertion_costs(self, tour, vertex):
+        # an insertion delays every later stop by the same amount, so the new sum of the waits follows from the count
+        # of later stops and the new max from the prefix and suffix maxima of the waits
+        distance_matrix = self.distance_matrix
+        tour = np.asarray(tour)
+        n = len(tour)
+        arrivals, legs = tour_arrivals(tour, distance_matrix, self.service_time)
+        waits = arrivals + self.offsets[tour]
+
+        into = distance_matrix[tour, vertex] + self.service_time
+        delays = into[:-1] + distance_matrix[vertex, tour[1:]] + self.service_time - legs
+        vertex_waits = arrivals + into + self.offsets[vertex]
+
+        prev_avg = waits.sum() / (n - 1) if n > 1 else 0
+        avg = (waits.sum() + vertex_waits + np.append(delays * np.arange(n - 1, 0, -1), 0.0)) / n
+
+        later_max = np.append(np.maximum.accumulate(waits[::-1])[::-1][1:] + delays, -inf)
+        max_wait = np.maximum(np.maximum(np.maximum.accumulate(waits), vertex_waits), later_max)
+
+        return self.w_avg * (avg - prev_avg) + self.w_max * (max_wait - waits.max())
+
+
+def removal_count(state, count):
+    """the stops to take out -- fewer than asked for (around half of them) if there aren't that many
+    """
+    total_vertices = 0
+    for _i in range(len(state)):
+        total_vertices += len(state.tours[_i])
+
+    if count > total_vertices - len(state):
+        count = max([1, int((total_vertices - len(state))/2) - 1])
+    return min(count, total_vertices - len(state))
+
+
+def random_removal(state, objective, count):
+    """destroy: take count stops (never an actor's own node) out of the tours at random
+    """
+    deleted_vertices = []
+    count = removal_count(state, count)
+
+    while (len(deleted_vertices) < count):
+        rnd_actor = randint(0, len(state) - 1)
+        if len(state.tours[rnd_actor]) < 2:
+            continue
+
+        rnd_index = randint(1, len(state.tours[rnd_actor]) - 1)
+        deleted_vertices.append(state.remove(rnd_actor, rnd_index))
+    return deleted_vertices
+
+
+def related_removal(state, objective, count):
+    """destroy (Shaw removal): take out a random stop and then stops related to one of those already taken out (see
+    Objective.relatedness), favouring the most related ones by ALNS_RELATED_RANDOMNESS
+    """
+    owners = {vertex: key for key, tour in state.tours.items() for vertex in tour[1:]}
+    remaining = list(owners)
+    count = removal_count(state, count)
+    if not count:
+        return []
+
+    deleted_vertices = [remaining.pop(randint(0, len(remaining) - 1))]
+    while len(deleted_vertices) < count:
+        vertex = deleted_vertices[randint(0, len(deleted_vertices) - 1)]
+        order = np.argsort(objective.relatedness(vertex, remaining), kind='stable')
+        deleted_vertices.append(remaining.pop(int(order[int(random() ** ALNS_RELATED_RANDOMNESS * len(order))])))
+
+    for vertex in deleted_vertices:
+        state.remove(owners[vertex], state.tours[owners[vertex]].index(vertex))
+    return deleted_vertices
+
+
+def worst_removal(state, objective, count):
+    """destroy: take out the stops that save the most (see Objective.removal_gains), one at a time, favouring the
+    costliest by ALNS_WORST_RANDOMNESS
+    """
+    keys = list(state.tours)
+    deleted_vertices = []
+    count = removal_count(state, count)
+
+    while len(deleted_vertices) < count:
+        routes = list(state.tours.values())
+        starts = route_starts(routes)
+        gains = objective.removal_gains(routes)
+        order = np.argsort(-gains, kind='stable')[:np.count_nonzero(gains > -inf)]
+        worst = int(order[int(random() ** ALNS_WORST_RANDOMNESS * len(order))])
+        tour = int(np.searchsorted(starts, worst, side='right')) - 1
+        deleted_vertices.append(state.remove(keys[tour], worst - starts[tour]))
+    return deleted_vertices
+
+
+def route_removal(state, objective, count):
+    """destroy: take out the stops of a random tour -- all of them if there are no more than count, otherwise a random
+    run of count consecutive stops
+    """
+    keys = [key for key, tour in state.tours.items() if len(tour) > 1]
+    count = removal_count(state, count)
+    if not count:
+        return []
+
+    key = keys[randint(0, len(keys) - 1)]
+    n = len(state.tours[key]) - 1
+    if n <= count:
+        return [state.remove(key, n - _i) for _i in range(n)][::-1]
+
+    start = randint(1, n - count + 1)
+    return [state.remove(key, start) for _ in range(count)]
+
+
+def greedy_insertion(state, objective, vertices):
+    """repair: put the vertices back, in random order, each where it adds the least to the objective
+    """
+    keys = list(state.tours)
+    shuffle(vertices)
+    for vertex in vertices:
+        routes = list(state.tours.values())
+        starts = route_starts(routes)
+        # the first of equal costs, so ties go to the earlier tour and then the earlier position
+        best = int(np.argmin(objective.insertion_costs(routes, vertex)))
+        best_tour = int(np.searchsorted(starts, best, side='right')) - 1
+
+        state.insert(keys[best_tour], best - starts[best_tour] + 1, vertex)
+
+
+def regret_insertion(state, objective, vertices, k=2):
+    """repair: put the vertices back one at a time, each time taking the one with the most to lose from not getting its
+    best tour -- the regret, the sum of how much more each of its next k - 1 best tours would cost (ties go to the
+    cheaper insertion) -- and putting it where it adds the least.  Only the insertion costs into the tour that changed
+    are worked out again after each insertion.
+    """
+    keys = list(state.tours)
+    costs = {vertex: [objective.tour_insertion_costs(tour, vertex) for tour in state.tours.values()] for vertex in vertices}
+
+    pending = list(vertices)
+    while len(pending):
+        best = None
+        for vertex in pending:
+            minima = np.array([tour_costs.min() for tour_costs in costs[vertex]])
+            order = np.argsort(minima, kind='stable')
+            regret = float((minima[order[1:k]] - minima[order[0]]).sum())
+            if best is None or regret > best[0] or (regret == best[0] and minima[order[0]] < best[1]):
+                best = (regret, minima[order[0]], vertex, int(order[0]))
+
+        _, _, vertex, tour = best
+        state.insert(keys[tour], int(np.argmin(costs[vertex][tour])) + 1, vertex)
+        pending.remove(vertex)
+        for other in pending:
+            costs[other][tour] = objective.tour_insertion_costs(state.tours[keys[tour]], other)
+
+
+def regret3_insertion(state, objective, vertices):
+    """repair: regret insertion over the three best tours
+    """
+    regret_insertion(state, objective, vertices, k=3)
+
+
+def random_insertion(state, objective, vertices):
+    """repair: put the vertices back, in random order, each at a random place
+    """
+    shuffle(vertices)
+    for vertex in vertices:
+        rnd_tour = randint(0, len(state) - 1)
+        n = len(state.tours[rnd_tour]) - 1
+
+        if n == 0:
+            state.insert(rnd_tour, 1, vertex)
+            continue
+
+        rnd_loc = randint(1, n)
+
+        if rnd_loc == n:
+            state.insert(rnd_tour, n + 1, vertex)
+        else:
+            state.insert(rnd_tour, rnd_loc, vertex)
+
+
+def roulette(weights):
+    """an index picked with probability proportional to its weight (no random draw for a single choice)
+    """
+    if len(weights) == 1:
+        return 0
+    return min(int(np.searchsorted(np.cumsum(weights), random() * weights.sum(), side='right')), len(weights) - 1)
+
+
+class HillClimbing:
+    """accept only candidates cheaper than the incumbent
+    """
+
+    def start(self, cost):
+        pass
+
+    def accept(self, candidate_cost, current_cost, best_cost):
+        return candidate_cost < current_cost
+
+    def step(self):
+        pass
+
+
+class SimulatedAnnealing(HillClimbing):
+    """accept a costlier candidate with probability exp(-increase / temperature).  The temperature starts where a
+    candidate start_increase (a fraction) costlier than the initial tours is accepted half the time, and is multiplied
+    by cooling every iteration.
+    """
+
+    def __init__(self, start_increase=ALNS_ANNEALING_START, cooling=ALNS_ANNEALING_COOLING):
+        self.start_increase = start_increase
+        self.cooling = cooling
+        self.temperature = 0
+
+    def start(self, cost):
+        self.temperature = self.start_increase * cost / log(2)
+
+    def accept(self, candidate_cost, current_cost, best_cost):
+        if candidate_cost < current_cost:
+            return True
+        return self.temperature > 0 and random() < exp((current_cost - candidate_cost) / self.temperature)
+
+    def step(self):
+        self.temperature *= self.cooling
+
+
+class RecordToRecord(HillClimbing):
+    """accept any candidate within deviation (a fraction) of the best cost so far
+    """
+
+    def __init__(self, deviation=ALNS_RECORD_DEVIATION):
+        self.deviation = deviation
+
+    def accept(self, candidate_cost, current_cost, best_cost):
+        return candidate_cost < current_cost or candidate_cost - best_cost < self.deviation * abs(best_cost)
+
+
+class ALNS:
+    """
+    Adaptive large neighbourhood search over a set of tours.  The weights of the destroy and repair operators start
+    equal; every segment_length iterations each operator used in the segment moves its weight reaction of the way
+    towards its mean score, scored (see ALNS_SCORES) by whether its candidates gave a new best, an improvement on the
+    incumbent or were accepted.
+
+    Args:
+        objective (Objective): the cost of the tours
+        destroy_operators (tuple, optional): functions (state, objective, count) -> the vertices taken out. Defaults to
+            random removal.
+        repair_operators (tuple, optional): functions (state, objective, vertices) that put the vertices back. Defaults
+            to greedy insertion.
+        acceptance (optional): which candidates replace the incumbent (see HillClimbing). Defaults to improvements only.
+        removals (int, optional): the stops taken out by each iteration. Defaults to ALNS_REMOVALS.
+        max_removals (int, optional): if given, each iteration takes out a random number of stops from removals up
+            to this. Defaults to None.
+        max_stall (int, optional): stop after this many iterations in a row without a new best. Defaults to
+            ALNS_MAX_STALL.
+        segment_length (int, optional): iterations between weight updates. Defaults to ALNS_SEGMENT_LENGTH.
+        reaction (float, optional): how far each update moves the weights. Defaults to ALNS_REACTION.
+        scores (tuple, optional): the scores for a new best, an improvement and an accepted candidate. Defaults to
+            ALNS_SCORES.
+    """
+
+    def __init__(self, objective, destroy_operators=(random_removal, ), repair_operators=(greedy_insertion, ), acceptance=None,
+                 removals=ALNS_REMOVALS, max_removals=None, max_stall=ALNS_MAX_STALL, segment_length=ALNS_SEGMENT_LENGTH,
+                 reaction=ALNS_REACTION, scores=ALNS_SCORES):
+        self.objective = objective
+        self.destroy_operators = list(destroy_operators)
+        self.repair_operators = list(repair_operators)
+        self.acceptance = acceptance if acceptance is not None else HillClimbing()
+        self.removals = removals
+        self.max_removals = max_removals
+        self.max_stall = max_stall
+        self.segment_length = segment_length
+        self.reaction = reaction
+        self.scores = scores
+
+        self.destroy_weights = np.ones(len(self.destroy_operators))
+        self.repair_weights = np.ones(len(self.repair_operators))
+        self.iterations = 0
+        self.time_expired = False
+
+    def _update_weights(self, weights, scores, uses):
+        used = uses > 0
+        weights[used] = (1 - self.reaction) * weights[used] + self.reaction * scores[used] / uses[used]
+        scores[:] = 0
+        uses[:] = 0
+
+    def _removal_count(self):
+        if self.max_removals is None or self.max_removals <= self.removals:
+            return self.removals
+        return randint(self.removals, self.max_removals)
+
+    def search(self, tours, max_solver_time):
+        """
+        Improve the tours until max_solver_time runs out or max_stall iterations in a row fail to find a new best.  The
+        tours are changed in place (they end up as the last incumbent, which need not be the best).
+
+        Args:
+            tours (dict): the tours of each actor, each starting with the actor's node
+            max_solver_time (float): wall clock limit (s)
+
+        Returns:
+            _type_: the best tours and their cost
+        """
+        objective = self.objective
+        acceptance = self.acceptance
+        best_cost = objective.total(tours)
+        current_cost = best_cost
+        best_tours = {key: list(tour) for key, tour in tours.items()}
+        initial_cost = best_cost
+        logger.debug("initial cost %s", best_cost)
+
+        destroy_scores = np.zeros(len(self.destroy_operators))
+        destroy_uses = np.zeros(len(self.destroy_operators))
+        repair_scores = np.zeros(len(self.repair_operators))
+        repair_uses = np.zeros(len(self.repair_operators))
+        new_best, improved, accepted = self.scores
+
+        s_time = time()
+        iterations_since_last_improvement = 0
+        iter_count = 0
+        self.time_expired = True
+        acceptance.start(best_cost)
+        state = TourState(tours)
+        while time() - s_time < max_solver_time:
+            destroy = roulette(self.destroy_weights)
+            repair = roulette(self.repair_weights)
+            deleted_vertices = self.destroy_operators[destroy](state, objective, self._removal_count())
+            self.repair_operators[repair](state, objective, deleted_vertices)
+            candidate_tour_cost = objective.total(state.tours)
+
+            destroy_uses[destroy] += 1
+            repair_uses[repair] += 1
+            score = None
+            if candidate_tour_cost < best_cost:
+                best_cost = candidate_tour_cost
+                best_tours = {key: list(tour) for key, tour in state.tours.items()}
+                score = new_best
+                iterations_since_last_improvement = 0
+                logger.debug("improved cost %s", best_cost)
+            else:
+                iterations_since_last_improvement += 1
+                if acceptance.accept(candidate_tour_cost, current_cost, best_cost):
+                    score = improved if candidate_tour_cost < current_cost else accepted
+
+            if score is not None:
+                current_cost = candidate_tour_cost
+                state.commit()
+                destroy_scores[destroy] += score
+                repair_scores[repair] += score
+            else:
+                state.undo()
+            acceptance.step()
+
+            if iterations_since_last_improvement > self.max_stall:
+                self.time_expired = False
+                break
+            iter_count += 1
+
+            if not iter_count % self.segment_length:
+                self._update_weights(self.destroy_weights, destroy_scores, destroy_uses)
+                self._update_weights(self.repair_weights, repair_scores, repair_uses)
+
+        self.iterations = iter_count
+        get_telemetry().record('alns', objective.problem, sum(len(tour) for tour in tours.values()), time() - s_time,
+                               objective_before=initial_cost, objective_after=best_cost, iterations=iter_count,
+                               limit_hit=self.time_expired)
+        return best_tours, best_cost
+
+
+# the operators and acceptance of the ALNS policies (see configure_search): 'adaptive' picks from all of the
+# operators, taking out between ALNS_REMOVALS and ALNS_MAX_REMOVALS stops, 'greedy' only has random removal of
+# ALNS_REMOVALS stops and greedy insertion.  The defaults, greedy with improvements only, are the original search.
+SEARCHES = ['adaptive', 'greedy']
+ACCEPTANCES = {
+    'annealing': SimulatedAnnealing,
+    'record': RecordToRecord,
+    'improve': HillClimbing,
+}
+_search = 'greedy'
+_acceptance = 'improve'
+
+
+def configure_search(search, acceptance):
+    """
+    Choose the operators (one of SEARCHES) and acceptance (one of ACCEPTANCES) of the ALNS policies in this process
+    """
+    global _search, _acceptance
+    if search not in SEARCHES:
+        raise ValueError(f'Unknown ALNS search: {search}')
+    if acceptance not in ACCEPTANCES:
+        raise ValueError(f'Unknown ALNS acceptance: {acceptance}')
+    _search = search
+    _acceptance = acceptance
+
+
+def search_engine(objective):
+    """
+    An ALNS engine for the objective, set up as chosen by configure_search
+    """
+    if _search == 'greedy':
+        return ALNS(objective, acceptance=ACCEPTANCES[_acceptance]())
+    return ALNS(objective,
+                destroy_operators=(random_removal, related_removal, worst_removal, route_removal),
+                repair_operators=(greedy_insertion, regret_insertion, regret3_insertion),
+                acceptance=ACCEPTANCES[_acceptance](),
+                max_removals=ALNS_MAX_REMOVALS)
+
+
+class ALNSPolicy:
+    """
+    The simulation's side of the ALNS policies (see get_policy()).  The policies plan for all of the actors at once,
+    so the simulation calls plan_actors() once a tick with the actors of each cluster (see plans_together()) -- each
+    call plans the actors over their tasks: the waiting ones and, unless waiting_only, those already on one of the
+    actors' paths.  new_task_added tells the policy whether any of the waiting tasks has arrived since the last call
+    for the same actors.
+    """
+
+    def __init__(self, plan, args, waiting_only=False):
+        self.plan = plan
+        self.waiting_only = waiting_only
+        self.plan_args = {}
+        self._seen = {}
+
+        for name in ('max_solver_time', 'service_time', 'cost_exponent', 'eta', 'eta_first', 'gamma'):
+            try:
+                self.plan_args[name] = args[name]
+            except KeyError:
+                pass
+
+    def plan_actors(self, actors, tasks, field, current_time=0):
+        """run the ALNS policy for the actors of a cluster together
+
+        Args:
+            actors (list): the actors to plan for
+            tasks (_type_): the tasks arrived
+            field (_type_): the field the actors travel in
+            current_time (float, optional): the simulation time. Defaults to 0.
+        """
+        on_path = set() if self.waiting_only else {task.id for actor in actors for task, _ in actor.path}
+        tasks = [task for task in tasks if task.is_waiting() or (task.is_pending() and task.id in on_path)]
+
+        key = tuple(actor.id for actor in actors)
+        seen = self._seen.get(key, set())
+        self._seen[key] = {task.id for task in tasks}
+        if not len(tasks):
+            return False
+
+        new_task_added = any(task.is_waiting() and task.id not in seen for task in tasks)
+        self.plan(list(actors), tasks, new_task_added=new_task_added, current_time=current_time, field=field, **self.plan_args)
+        return True
+
+    def policy(self, actor, tasks, field, current_time=0):
+        """run the ALNS policy for a single actor
+
+        Args:
+            actor (_type_): the actor to plan for
+            tasks (_type_): the tasks arrived
+            field (_type_): the field the actor travels in
+            current_time (float, optional): the simulation time. Defaults to 0.
+        """
+        return self.plan_actors([actor, ], tasks, field, current_time)
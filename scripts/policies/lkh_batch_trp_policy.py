@@ -2,13 +2,17 @@
 TSP policy that find the optimal multi robot TSP on the unserviced tasks
 '''
 from copy import deepcopy
-from policies.util import get_distance_matrix, assign_tour_to_actor
+from Task import Task
+from policies.util import get_distance_matrix, assign_tour_to_actor, snapshot_tasks, drop_stale, tour_cost
 from time import time
 from numpy import inf, pad
 from lkh_interface import solve_trp
 from os import path
 
-from policies.quad_wait_tsp_policy import policy as our_policy, tour_cost, plan_tours
+from policies.quad_wait_tsp_policy import plan_tours
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Policy:
@@ -61,29 +65,53 @@ class Policy:
 
         return pending_tasks, task_indices
 
-    def policy(self, actor, tasks, field, current_time=0):
-        """tsp policy
+    def prepare(self, actor, tasks, field, current_time=0):
+        """pick out the tasks to plan a tour for -- the first step of the policy, run on the simulation thread
 
         Args:
-            actors (_type_): actors in the environment
+            actor (_type_): the actor to plan for
             tasks (_type_): the tasks arrived
+
+        Returns:
+            dict: the planning request for solve(), or None if there is nothing to plan
         """
 
         if actor.is_busy():
-            return
+            return None
 
         pending_tasks, task_indices = self.__prep_tour(tasks)
         if not len(pending_tasks):
-            return
-
-        tours = solve_trp('DVR TSP', 'Distance between Pending Tasks', actor.pos, pending_tasks,
-                          simulation_time=current_time, mean_service_time=self.service_time, cost_exponent=self.cost_exponent,
-                          scale_factor=10000.0)
+            return None
+
+        return {
+            'start_pos': tuple(actor.pos),
+            'tasks': pending_tasks,
+            'all_tasks': tasks,
+            'snapshot': snapshot_tasks(pending_tasks),
+            'task_indices': task_indices,
+            'current_time': current_time,
+        }
+
+    def solve(self, request):
+        """find the tour -- only reads the request, so it can be run off the simulation thread
+        """
+        tours = solve_trp('DVR TSP', 'Distance between Pending Tasks', request['start_pos'], request['snapshot'],
+                          simulation_time=request['current_time'], mean_service_time=self.service_time, cost_exponent=self.cost_exponent,
+                          scale_factor=10000.0, time_limit=self.max_solver_time)
 
         # tour depot (the actor) is being dropped -- push it back in...
         for tour in tours:
             tour.insert(0, 1)
 
+        return tours
+
+    def assign(self, actor, request, tours):
+        """hand the tour to the actor -- the last step of the policy, run on the simulation thread
+        """
+        pending_tasks = request['tasks']
+        task_indices = request['task_indices']
+        current_time = request['current_time']
+
         if self.check_tour:
             chk_distance_matrix, _ = get_distance_matrix(actor, tasks=pending_tasks)
             chk_distance_matrix = pad(chk_distance_matrix, 1)
@@ -100,20 +128,38 @@ class Policy:
 
             our_tours, our_task_indices, our_cost = plan_tours(
                 actors=[actor,],
-                tasks=tasks,
+                tasks=request['all_tasks'],
                 current_time=current_time,
                 service_time=self.service_time,
                 cost_exponent=1.5,
                 max_solver_time=self.max_solver_time
             )
             first_lkh_id = pending_tasks[task_indices[tours[0][1]]]
-            first_our_id = tasks[our_task_indices[our_tours[0][1]]]
-            print(f"Expected LKH Cost: {lkh_cost} -- Our Cost: {our_cost} -- Same First: {first_lkh_id == first_our_id}")
+            first_our_id = request['all_tasks'][our_task_indices[our_tours[0][1]]]
+            logger.info("Expected LKH Cost: %s -- Our Cost: %s -- Same First: %s", lkh_cost, our_cost, first_lkh_id == first_our_id)
 
             with open(self.fname, "a") as fp:
                 fp.write(f'{lkh_cost},{our_cost},{len(tours[0])}\n')
 
-        assign_tour_to_actor(actor, pending_tasks, tours[0], task_indices, eta=self.eta, eta_first=self.eta_first)
+        tour = drop_stale(tours[0], pending_tasks, task_indices, available=Task.is_waiting)
+        if len(tour) < 2:
+            return
+
+        assign_tour_to_actor(actor, pending_tasks, tour, task_indices, eta=self.eta, eta_first=self.eta_first)
+
+    def policy(self, actor, tasks, field, current_time=0):
+        """tsp policy
+
+        Args:
+            actors (_type_): actors in the environment
+            tasks (_type_): the tasks arrived
+        """
+
+        request = self.prepare(actor, tasks, field, current_time)
+        if request is None:
+            return
+
+        self.assign(actor, request, self.solve(request))
         return False
 
 
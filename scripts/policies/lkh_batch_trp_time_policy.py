@@ -3,9 +3,16 @@ TSP policy that find the optimal multi robot TSP on the unserviced tasks
 '''
 from policies.util import get_distance_matrix, assign_time_tour_to_actor
 from lkh_interface import solve_time_trp
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Policy:
+    # assigning a tour puts the actor back at the position it was planned from -- the plan has to be assigned in the
+    # tick it was made
+    async_planning = False
+
     def __init__(self, args) -> None:
         try:
             self.max_solver_time = args['max_solver_time']
@@ -48,36 +55,73 @@ class Policy:
 
         distances, _ = get_distance_matrix(actor, actor_start_index=actor_start_index, tasks=pending_tasks, field=field)
 
-        return distances, task_indices
+        return pending_tasks, distances, task_indices
 
-    def policy(self, actor, tasks, field, current_time=0):
-        """tsp policy
+    def prepare(self, actor, tasks, field, current_time=0):
+        """pick out the tasks to plan a tour for -- the first step of the policy, run on the simulation thread
 
         Args:
-            actors (_type_): actors in the environment
+            actor (_type_): the actor to plan for
             tasks (_type_): the tasks arrived
+
+        Returns:
+            dict: the planning request for solve(), or None if there is nothing to plan
         """
 
         if actor.is_busy():
-            return
+            return None
 
         path_start_index, actor_pos = actor.get_nearest_location()
-        distances, task_indices = self.__prep_tour(actor, actor_start_index=path_start_index, tasks=tasks, field=field)
-        if not len(tasks):
-            return
-
+        pending_tasks, distances, task_indices = self.__prep_tour(actor, actor_start_index=path_start_index, tasks=tasks, field=field)
+        if not len(pending_tasks):
+            return None
+
+        return {
+            'actor_pos': actor_pos,
+            'path_start_index': path_start_index,
+            'tasks': pending_tasks,
+            'distances': distances,
+            'task_indices': task_indices,
+            'field': field,
+            'current_time': current_time,
+        }
+
+    def solve(self, request):
+        """find the tour -- only reads the request, so it can be run off the simulation thread
+        """
         try:
-            tours = solve_time_trp('DVR TRP', 'Time between Pending Tasks', tasks=tasks, distances=distances,
-                                   simulation_time=current_time, mean_service_time=self.service_time, cost_exponent=self.cost_exponent, scale_factor=100.0)
+            tours = solve_time_trp('DVR TRP', 'Time between Pending Tasks', tasks=request['tasks'], distances=request['distances'],
+                                   simulation_time=request['current_time'], mean_service_time=self.service_time, cost_exponent=self.cost_exponent,
+                                   scale_factor=100.0, time_limit=self.max_solver_time)
         except Exception as e:
-            print(e)
-            print("ERROR!")
+            logger.error("ERROR! %s", e)
+            raise (e)
 
         # tour depot (the actor) is being dropped -- push it back in...
         tours[0].insert(0, 1)
 
-        assign_time_tour_to_actor(actor, actor_pos=actor_pos, actor_start_index=path_start_index, tasks=tasks, distances=distances, field=field, tour=tours[0], task_indices=task_indices,
+        return tours
+
+    def assign(self, actor, request, tours):
+        """hand the tour to the actor -- the last step of the policy, run on the simulation thread
+        """
+        assign_time_tour_to_actor(actor, actor_pos=request['actor_pos'], actor_start_index=request['path_start_index'], tasks=request['tasks'],
+                                  distances=request['distances'], field=request['field'], tour=tours[0], task_indices=request['task_indices'],
                                   eta=self.eta, eta_first=self.eta_first)
+
+    def policy(self, actor, tasks, field, current_time=0):
+        """tsp policy
+
+        Args:
+            actors (_type_): actors in the environment
+            tasks (_type_): the tasks arrived
+        """
+
+        request = self.prepare(actor, tasks, field, current_time)
+        if request is None:
+            return
+
+        self.assign(actor, request, self.solve(request))
         return False
 
 
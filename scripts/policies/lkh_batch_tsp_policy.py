@@ -2,7 +2,8 @@
 TSP policy that find the optimal multi robot TSP on the unserviced tasks
 '''
 from copy import deepcopy
-from policies.util import get_distance_matrix, assign_tour_to_actor
+from Task import Task
+from policies.util import get_distance_matrix, assign_tour_to_actor, snapshot_tasks, drop_stale
 from random import randint, shuffle
 from time import time
 import numpy as np
@@ -89,29 +90,66 @@ class Policy:
             if len(pending_tasks):
                 break
 
-            self.__next_sector()
+            self.__next_sector(actor)
 
         return pending_tasks, task_indices
 
-    def policy(self, actor, tasks, field, current_time=0):
-        """tsp policy
+    def prepare(self, actor, tasks, field, current_time=0):
+        """pick out the tasks to plan a tour for -- the first step of the policy, run on the simulation thread
 
         Args:
-            actors (_type_): actors in the environment
+            actor (_type_): the actor to plan for
             tasks (_type_): the tasks arrived
+
+        Returns:
+            dict: the planning request for solve(), or None if there is nothing to plan
         """
 
         if actor.is_busy():
-            return
+            return None
 
         tasks, task_indices = self.__prep_tour(actor, tasks)
         if not len(tasks):
-            return False
+            return None
+
+        return {
+            'start_pos': tuple(actor.pos),
+            'tasks': tasks,
+            'snapshot': snapshot_tasks(tasks),
+            'task_indices': task_indices,
+        }
+
+    def solve(self, request):
+        """find the tour -- only reads the request, so it can be run off the simulation thread
+        """
+        return solve_tsp('DVR TSP', 'Distance between Pending Tasks', request['start_pos'], request['snapshot'], scale_factor=10000.0,
+                         time_limit=self.max_solver_time)
+
+    def assign(self, actor, request, tours):
+        """hand the tour to the actor -- the last step of the policy, run on the simulation thread
+        """
+        tasks = request['tasks']
+        task_indices = request['task_indices']
+        tour = drop_stale(tours[0], tasks, task_indices, available=Task.is_waiting)
+        if len(tour) < 2:
+            return
+
+        assign_tour_to_actor(actor, tasks, tour, task_indices, eta=self.eta, eta_first=self.eta_first)
+        self.__next_sector(actor)
+
+    def policy(self, actor, tasks, field, current_time=0):
+        """tsp policy
 
-        tours = solve_tsp('DVR TSP', 'Distance between Pending Tasks', actor.pos, tasks, scale_factor=10000.0)
+        Args:
+            actors (_type_): actors in the environment
+            tasks (_type_): the tasks arrived
+        """
+
+        request = self.prepare(actor, tasks, field, current_time)
+        if request is None:
+            return False
 
-        assign_tour_to_actor(actor, tasks, tours[0], task_indices, eta=self.eta, eta_first=self.eta_first)
-        self.__next_sector()
+        self.assign(actor, request, self.solve(request))
 
         return True
 
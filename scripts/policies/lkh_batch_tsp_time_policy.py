@@ -9,6 +9,10 @@ from lkh_interface import solve_time_tsp
 
 
 class Policy:
+    # assigning a tour puts the actor back at the position it was planned from -- the plan has to be assigned in the
+    # tick it was made
+    async_planning = False
+
     def __init__(self, args) -> None:
         try:
             self.max_solver_time = args['max_solver_time']
@@ -96,29 +100,63 @@ class Policy:
 
         return pending_tasks, distances, task_indices
 
-    def policy(self, actor, tasks, field, current_time=0):
-        """tsp policy
+    def prepare(self, actor, tasks, field, current_time=0):
+        """pick out the tasks to plan a tour for -- the first step of the policy, run on the simulation thread
 
         Args:
-            actors (_type_): actors in the environment
+            actor (_type_): the actor to plan for
             tasks (_type_): the tasks arrived
+
+        Returns:
+            dict: the planning request for solve(), or None if there is nothing to plan
         """
 
         if actor.is_busy():
-            return
+            return None
 
         path_start_index, actor_pos = actor.get_nearest_location()
 
-        tasks, distances, task_indices = self.__prep_tour(actor, actor_start_index=path_start_index, tasks=tasks, field=field)
-        if not len(tasks):
-            return False
-
-        tours = solve_time_tsp('DVR TSP', 'Distance between Pending Tasks', distances, scale_factor=100.0)
+        pending_tasks, distances, task_indices = self.__prep_tour(actor, actor_start_index=path_start_index, tasks=tasks, field=field)
+        if not len(pending_tasks):
+            return None
+
+        return {
+            'actor_pos': actor_pos,
+            'path_start_index': path_start_index,
+            'tasks': pending_tasks,
+            'distances': distances,
+            'task_indices': task_indices,
+            'field': field,
+        }
+
+    def solve(self, request):
+        """find the tour -- only reads the request, so it can be run off the simulation thread
+        """
+        return solve_time_tsp('DVR TSP', 'Distance between Pending Tasks', request['distances'], scale_factor=100.0,
+                              time_limit=self.max_solver_time)
 
-        assign_time_tour_to_actor(actor, actor_pos=actor_pos, actor_start_index=path_start_index, tasks=tasks, distances=distances, field=field, tour=tours[0], task_indices=task_indices,
+    def assign(self, actor, request, tours):
+        """hand the tour to the actor -- the last step of the policy, run on the simulation thread
+        """
+        assign_time_tour_to_actor(actor, actor_pos=request['actor_pos'], actor_start_index=request['path_start_index'], tasks=request['tasks'],
+                                  distances=request['distances'], field=request['field'], tour=tours[0], task_indices=request['task_indices'],
                                   eta=self.eta, eta_first=self.eta_first)
         self.__next_sector(actor)
 
+    def policy(self, actor, tasks, field, current_time=0):
+        """tsp policy
+
+        Args:
+            actors (_type_): actors in the environment
+            tasks (_type_): the tasks arrived
+        """
+
+        request = self.prepare(actor, tasks, field, current_time)
+        if request is None:
+            return False
+
+        self.assign(actor, request, self.solve(request))
+
         return True
 
 
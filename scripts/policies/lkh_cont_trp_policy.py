@@ -2,7 +2,8 @@
 TSP policy that find the optimal multi robot TSP on the unserviced tasks
 '''
 from copy import deepcopy
-from policies.util import get_distance_matrix, assign_tour_to_actor
+from config import INCREMENTAL_REPLAN_THRESHOLD, INCREMENTAL_REPLAN_REFRESH
+from policies.util import get_distance_matrix, assign_tour_to_actor, snapshot_tasks, drop_stale, location_distances, incremental_tour
 from time import time
 from lkh_interface import solve_trp
 from os import path
@@ -20,13 +21,46 @@ class Policy:
         except KeyError:
             self.service_time = 0
 
+        try:
+            self.eta = args['eta']
+        except KeyError:
+            self.eta = 1
+
+        try:
+            self.eta_first = args['eta_first']
+        except KeyError:
+            self.eta_first = False
+
         try:
             self.cost_exponent = args['cost_exponent']
         except KeyError:
             self.cost_exponent = 1
 
+        try:
+            self.warm_start = args['warm_start']
+        except KeyError:
+            self.warm_start = True
+
+        try:
+            self.incremental = args['incremental']
+        except KeyError:
+            self.incremental = False
+
+        try:
+            self.replan_threshold = args['replan_threshold']
+        except KeyError:
+            self.replan_threshold = INCREMENTAL_REPLAN_THRESHOLD
+
+        try:
+            self.replan_refresh = args['replan_refresh']
+        except KeyError:
+            self.replan_refresh = INCREMENTAL_REPLAN_REFRESH
+
+        # incremental replans in a row, for each actor
+        self.incremental_replans = {}
+
     @staticmethod
-    def __prep_tour(actor, tasks, field):
+    def __prep_tour(tasks):
         pending_tasks = []
 
         # Node indices start at 1 and the first index is the position of the actor
@@ -49,27 +83,85 @@ class Policy:
 
         return pending_tasks, task_indices, at_least_one_waiting
 
-    def policy(self, actor, tasks, field, current_time=0):
-        """tsp policy
+    def prepare(self, actor, tasks, field, current_time=0):
+        """pick out the tasks to plan a tour for -- the first step of the policy, run on the simulation thread
 
         Args:
-            actors (_type_): actors in the environment
+            actor (_type_): the actor to plan for
             tasks (_type_): the tasks arrived
+
+        Returns:
+            dict: the planning request for solve(), or None if there is nothing to plan
         """
 
         tasks, task_indices, new_task_arrived = self.__prep_tour(tasks)
         if not len(tasks) or not new_task_arrived:
-            return
-
-        tours = solve_trp('DVR TSP', 'Distance between Pending Tasks', actor.pos, tasks,
-                          simulation_time=current_time, mean_service_time=self.service_time, cost_exponent=self.cost_exponent,
-                          scale_factor=10000.0)
+            return None
+
+        route = [task for task, _ in actor.path]
+
+        return {
+            'start_pos': tuple(actor.pos),
+            'tasks': tasks,
+            'snapshot': snapshot_tasks(tasks),
+            'task_indices': task_indices,
+            'current_time': current_time,
+            'route': route,
+            # start the solver from the route the actor is already on
+            'initial_tour': route if self.warm_start else None,
+            # fold the new tasks into the route, unless a full replan is due
+            'incremental': self.incremental and self.incremental_replans.get(actor.id, 0) < self.replan_refresh,
+        }
+
+    def solve(self, request):
+        """find the tour -- only reads the request, so it can be run off the simulation thread
+        """
+        if request['incremental']:
+            snapshot = request['snapshot']
+            tour = incremental_tour(request['route'], snapshot, location_distances(request['start_pos'], snapshot), request['current_time'],
+                                    service_time=self.service_time, cost_exponent=self.cost_exponent, threshold=self.replan_threshold)
+            if tour is not None:
+                return [tour, ]
+            request['incremental'] = False
+
+        tours = solve_trp('DVR TSP', 'Distance between Pending Tasks', request['start_pos'], request['snapshot'],
+                          simulation_time=request['current_time'], mean_service_time=self.service_time, cost_exponent=self.cost_exponent,
+                          scale_factor=10000.0, initial_tour=request['initial_tour'], time_limit=self.max_solver_time)
 
         # tour depot (the actor) is being dropped -- push it back in...
         for tour in tours:
             tour.insert(0, 1)
 
-        assign_tour_to_actor(actor, tasks, tours[0], task_indices, eta=self.eta, eta_first=self.eta_first)
+        return tours
+
+    def assign(self, actor, request, tours):
+        """hand the tour to the actor -- the last step of the policy, run on the simulation thread
+        """
+        tasks = request['tasks']
+        task_indices = request['task_indices']
+
+        self.incremental_replans[actor.id] = self.incremental_replans.get(actor.id, 0) + 1 if request['incremental'] else 0
+
+        # the actor carried on with its old route while this one was planned
+        tour = drop_stale(tours[0], tasks, task_indices)
+        if len(tour) < 2:
+            return
+
+        assign_tour_to_actor(actor, tasks, tour, task_indices, eta=self.eta, eta_first=self.eta_first)
+
+    def policy(self, actor, tasks, field, current_time=0):
+        """tsp policy
+
+        Args:
+            actors (_type_): actors in the environment
+            tasks (_type_): the tasks arrived
+        """
+
+        request = self.prepare(actor, tasks, field, current_time)
+        if request is None:
+            return
+
+        self.assign(actor, request, self.solve(request))
         return False
 
 
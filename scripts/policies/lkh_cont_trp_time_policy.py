@@ -2,11 +2,19 @@
 TSP policy that find the optimal multi robot TSP on the unserviced tasks
 '''
 from copy import deepcopy
-from policies.util import get_distance_matrix, assign_time_tour_to_actor
+from config import INCREMENTAL_REPLAN_THRESHOLD, INCREMENTAL_REPLAN_REFRESH
+from policies.util import get_distance_matrix, assign_time_tour_to_actor, incremental_tour
 from lkh_interface import solve_time_trp
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Policy:
+    # assigning a tour puts the actor back at the position it was planned from -- the plan has to be assigned in the
+    # tick it was made
+    async_planning = False
+
     def __init__(self, args) -> None:
         try:
             self.max_solver_time = args['max_solver_time']
@@ -23,6 +31,29 @@ class Policy:
         except KeyError:
             self.cost_exponent = 1
 
+        try:
+            self.warm_start = args['warm_start']
+        except KeyError:
+            self.warm_start = True
+
+        try:
+            self.incremental = args['incremental']
+        except KeyError:
+            self.incremental = False
+
+        try:
+            self.replan_threshold = args['replan_threshold']
+        except KeyError:
+            self.replan_threshold = INCREMENTAL_REPLAN_THRESHOLD
+
+        try:
+            self.replan_refresh = args['replan_refresh']
+        except KeyError:
+            self.replan_refresh = INCREMENTAL_REPLAN_REFRESH
+
+        # incremental replans in a row, for each actor
+        self.incremental_replans = {}
+
     @staticmethod
     def __prep_tour(tasks):
         pending_tasks = []
@@ -47,33 +78,84 @@ class Policy:
 
         return pending_tasks, task_indices, at_least_one_waiting
 
-    def policy(self, actor, tasks, field, current_time=0):
-        """tsp policy
+    def prepare(self, actor, tasks, field, current_time=0):
+        """pick out the tasks to plan a tour for -- the first step of the policy, run on the simulation thread
 
         Args:
-            actors (_type_): actors in the environment
+            actor (_type_): the actor to plan for
             tasks (_type_): the tasks arrived
+
+        Returns:
+            dict: the planning request for solve(), or None if there is nothing to plan
         """
 
-        tasks, task_indices, new_task_arrived = self.__prep_tour(tasks=tasks)
-        if not len(tasks) or not new_task_arrived:
-            return False
+        pending_tasks, task_indices, new_task_arrived = self.__prep_tour(tasks=tasks)
+        if not len(pending_tasks) or not new_task_arrived:
+            return None
 
         path_start_index, actor_pos = actor.get_nearest_location()
-        distances, _ = get_distance_matrix(actor, actor_start_index=path_start_index, tasks=tasks, field=field)
+        distances, _ = get_distance_matrix(actor, actor_start_index=path_start_index, tasks=pending_tasks, field=field)
+
+        route = [task for task, _ in actor.path]
+
+        return {
+            'actor_pos': actor_pos,
+            'path_start_index': path_start_index,
+            'tasks': pending_tasks,
+            'distances': distances,
+            'task_indices': task_indices,
+            'field': field,
+            'current_time': current_time,
+            'route': route,
+            # start the solver from the route the actor is already on
+            'initial_tour': route if self.warm_start else None,
+            # fold the new tasks into the route, unless a full replan is due
+            'incremental': self.incremental and self.incremental_replans.get(actor.id, 0) < self.replan_refresh,
+        }
+
+    def solve(self, request):
+        """find the tour -- only reads the request, so it can be run off the simulation thread
+        """
+        if request['incremental']:
+            tour = incremental_tour(request['route'], request['tasks'], request['distances'], request['current_time'],
+                                    service_time=self.service_time, cost_exponent=self.cost_exponent, threshold=self.replan_threshold)
+            if tour is not None:
+                return [tour, ]
+            request['incremental'] = False
 
         try:
-            tours = solve_time_trp('DVR TRP', 'Time between Pending Tasks', tasks=tasks, distances=distances,
-                                   simulation_time=current_time, mean_service_time=self.service_time, cost_exponent=self.cost_exponent, scale_factor=100.0)
+            tours = solve_time_trp('DVR TRP', 'Time between Pending Tasks', tasks=request['tasks'], distances=request['distances'],
+                                   simulation_time=request['current_time'], mean_service_time=self.service_time, cost_exponent=self.cost_exponent,
+                                   scale_factor=100.0, initial_tour=request['initial_tour'], time_limit=self.max_solver_time)
         except Exception as e:
-            print("ERROR!", e)
+            logger.error("ERROR! %s", e)
             raise (e)
 
         # tour depot (the actor) is being dropped -- push it back in...
         tours[0].insert(0, 1)
 
-        assign_time_tour_to_actor(actor, actor_pos=actor_pos, actor_start_index=path_start_index,
-                                  tasks=tasks, distances=distances, field=field, tour=tours[0], task_indices=task_indices)
+        return tours
+
+    def assign(self, actor, request, tours):
+        """hand the tour to the actor -- the last step of the policy, run on the simulation thread
+        """
+        self.incremental_replans[actor.id] = self.incremental_replans.get(actor.id, 0) + 1 if request['incremental'] else 0
+
+        assign_time_tour_to_actor(actor, actor_pos=request['actor_pos'], actor_start_index=request['path_start_index'], tasks=request['tasks'],
+                                  distances=request['distances'], field=request['field'], tour=tours[0], task_indices=request['task_indices'])
+
+    def policy(self, actor, tasks, field, current_time=0):
+        """tsp policy
+
+        Args:
+            actors (_type_): actors in the environment
+            tasks (_type_): the tasks arrived
+        """
+
+        request = self.prepare(actor, tasks, field, current_time)
+        if request is not None:
+            self.assign(actor, request, self.solve(request))
+
         return False
 
 
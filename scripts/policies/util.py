@@ -1,7 +1,14 @@
-from math import sqrt
-from Task import Task, ServiceState
+from math import sqrt, comb
+from itertools import chain
+from Task import Task, TaskStore, ServiceState
+from local_search import insert_latency, improve_latency
+from telemetry import get_telemetry
+from time import perf_counter
 from random import randint
 import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def euc_distance(task1, task2):
@@ -10,59 +17,340 @@ def euc_distance(task1, task2):
     )
 
 
+def task_locations(tasks):
+    """gather the locations of the tasks as an (n, 2) array -- straight from the TaskStore if they share one
+    """
+    if not len(tasks):
+        return np.zeros([0, 2])
+    store = tasks[0].store
+    if any(task.store is not store for task in tasks):
+        return np.array([task.location for task in tasks], dtype=np.float64)
+    rows = [task.row for task in tasks]
+    return np.column_stack((store.x[rows], store.y[rows]))
+
+
+def snapshot_tasks(tasks):
+    """detached copies of the tasks (in their current state) -- for planning off the simulation thread, where the
+    originals may be serviced in the meantime
+    """
+    if not len(tasks):
+        return []
+    store = tasks[0].store
+    if all(task.store is store for task in tasks):
+        return store.subset([task.row for task in tasks]).tasks()
+
+    snapshot = TaskStore(capacity=len(tasks))
+    for task in tasks:
+        row = snapshot.add(id=task.id, location=task.location, time=task.time, initial_wait=task.initial_wait,
+                           cluster_id=task.cluster_id, index=task.index, service_time=task.service_time)
+        snapshot.state[row] = task.service_state.value
+    return snapshot.tasks()
+
+
+def drop_stale(tour, tasks, task_indices, available=Task.is_pending):
+    """remove the stops for tasks that are no longer available since the tour was planned -- serviced, or (with
+    available=Task.is_waiting) taken by another actor.  The first stop, the actor, always stays.
+    """
+    return tour[:1] + [index for index in tour[1:] if available(tasks[task_indices[index]])]
+
+
+def location_distances(start_pos, tasks):
+    """euclidean distances between a start position (row/column 0) and the tasks
+    """
+    locations = np.vstack((np.array(start_pos, dtype=np.float64).reshape(1, 2), task_locations(tasks)))
+    delta = locations[:, np.newaxis, :] - locations[np.newaxis, :, :]
+    return np.sqrt((delta ** 2).sum(axis=2))
+
+
+def incremental_tour(route, tasks, distances, current_time, service_time=0, cost_exponent=1, threshold=0):
+    """fold the tasks that aren't on the actor's route yet into it, each where it adds the least to the latency
+    cost, rather than planning the tour again from scratch.  A round of local moves on the result estimates what a
+    full replan would gain -- when that is more than the threshold (as a fraction of the cost), it's time for one.
+
+    Args:
+        route (list): the tasks of the actor's current route, in order (others, e.g., the depot, are ignored)
+        tasks (list): the pending tasks
+        distances (_type_): travel costs between the actor (row/column 0) and the tasks
+        current_time (float): the simulation time
+        service_time (float, optional): service time at each task. Defaults to 0.
+        cost_exponent (float, optional): the exponent of the latency cost. Defaults to 1.
+        threshold (float, optional): the largest estimated improvement to accept. Defaults to 0.
+
+    Returns:
+        list: the tour (node ids, as from the solver -- task n is node n+2, with the actor as node 1), or None if the
+              tasks should be replanned in full
+    """
+    start_time = perf_counter()
+    rows = {task.id: n + 1 for n, task in enumerate(tasks)}
+    path = [0, ] + [rows.pop(task.id) for task in route if task.id in rows]
+    if len(path) == 1:
+        # nothing to build on
+        return None
+
+    service_times = np.array([0, ] + [service_time, ] * len(tasks), dtype=np.float64)
+    waits = np.array([0, ] + [current_time - task.time + task.initial_wait for task in tasks], dtype=np.float64)
+
+    path, cost = insert_latency(path, list(rows.values()), distances, service_times, waits, exponent=cost_exponent)
+    path, improved_cost = improve_latency(path, distances, service_times, waits, exponent=cost_exponent, passes=1)
+    replan = cost - improved_cost > threshold * cost
+    get_telemetry().record('incremental', 'TRP', len(path), perf_counter() - start_time, objective_before=cost,
+                           objective_after=improved_cost, iterations=1, limit_hit=replan)
+    if replan:
+        return None
+
+    return [node + 1 for node in path]
+
+
 def get_distance_matrix(actor, tasks, field=None, actor_start_index=None):
 
+    pending_tasks = [task for task in tasks if task.is_pending()]
+    task_indices = [-1] + [task.id for task in pending_tasks]
+
     if field is None or field.is_euclidean():
-        task_locations = []
-        task_indices = []
-        task_locations.append(
-            actor.pos
-        )
-        task_indices.append(-1)
-
-        for task in tasks:
-            if task.is_pending():
-                task_locations.append(task.location)
-                task_indices.append(task.id)
-
-        distance_matrix = np.zeros([len(task_locations), len(task_locations)])
-        for _i in range(len(task_locations)):
-            for _j in range(_i, len(task_locations)):
-                dist = euc_distance(task_locations[_i], task_locations[_j])
-                distance_matrix[_i, _j] = dist
-                distance_matrix[_j, _i] = dist
+        distance_matrix = location_distances(actor.pos, pending_tasks)
 
     else:
 
-        pending_tasks = []
-        for task in tasks:
-            if task.is_pending():
-                pending_tasks.append(task)
-
-        distance_matrix = np.zeros([len(pending_tasks)+1, len(pending_tasks)+1])
-        task_indices = []
-        actor_idx = 0
-
         if actor_start_index is None:
             actor_start_index = actor.cluster_id
 
-        task_indices.append(-1)
-        for task_idx, task in enumerate(pending_tasks):
-            task_idx += 1
-            distance_matrix[actor_idx, task_idx] = field.distances[actor_start_index, task.index]
-            distance_matrix[task_idx, actor_idx] = field.distances[task.index, actor_start_index]
+        indices = [actor_start_index] + [task.index for task in pending_tasks]
+        distance_matrix = field.distances[np.ix_(indices, indices)].astype(np.float64)
+        # the actor doesn't travel to itself
+        distance_matrix[0, 0] = 0
+
+    return distance_matrix, task_indices
+
+
+def get_actors_distance_matrix(actors, tasks, field=None):
+    """distances between several actors and the pending tasks, laid out for the ALNS tours -- node i is actor i, and
+    the tasks follow.  task_indices maps each node to its position in tasks (-1 for the actors).
+    """
+    pending = [index for index, task in enumerate(tasks) if task.is_pending()]
+    task_indices = [-1] * len(actors) + pending
+
+    if field is None or field.is_euclidean():
+        starts = np.array([actor.pos for actor in actors], dtype=np.float64).reshape(-1, 2)
+        locations = np.vstack((starts, task_locations([tasks[index] for index in pending])))
+        delta = locations[:, np.newaxis, :] - locations[np.newaxis, :, :]
+        distance_matrix = np.sqrt((delta ** 2).sum(axis=2))
 
-        # now complete the rest of the tasks
-        for src_idx, src_task in enumerate(pending_tasks):
-            task_indices.append(task.id)
-            src_idx += 1
-            for dst_idx, dst_task in enumerate(pending_tasks):
-                dst_idx += 1
-                distance_matrix[src_idx, dst_idx] = field.distances[src_task.index, dst_task.index]
+    else:
+        indices = [actor.cluster_id for actor in actors] + [tasks[index].index for index in pending]
+        distance_matrix = field.distances[np.ix_(indices, indices)].astype(np.float64)
+        # the actors don't travel to each other, or to themselves
+        distance_matrix[:len(actors), :len(actors)] = 0
 
     return distance_matrix, task_indices
 
 
+class TourState:
+    """the tours of an ALNS search (a dict of lists, one per actor, each starting with the actor's own node), changed
+    in place by the destroy and repair steps.  Each change goes in an undo log, so a rejected candidate is rolled back
+    to the incumbent instead of the incumbent being copied for every candidate.
+    """
+
+    def __init__(self, tours):
+        self.tours = tours
+        self._log = []
+
+    def __len__(self):
+        return len(self.tours)
+
+    def remove(self, actor, index):
+        vertex = self.tours[actor].pop(index)
+        self._log.append((actor, index, vertex))
+        return vertex
+
+    def insert(self, actor, index, vertex):
+        # as list.insert, an index past the end appends
+        index = min(index, len(self.tours[actor]))
+        self.tours[actor].insert(index, vertex)
+        self._log.append((actor, index, None))
+
+    def commit(self):
+        """keep the changes made since the last commit
+        """
+        self._log.clear()
+
+    def undo(self):
+        """roll back the changes made since the last commit
+        """
+        while len(self._log):
+            actor, index, vertex = self._log.pop()
+            if vertex is None:
+                self.tours[actor].pop(index)
+            else:
+                self.tours[actor].insert(index, vertex)
+
+
+def wait_offsets(tasks, task_indices, current_time):
+    """the wait each node of the distance matrix has already had -- a node's wait on a tour is its arrival time plus
+    its offset
+    """
+    return np.array([current_time - tasks[task_index].time for task_index in task_indices], dtype=np.float64)
+
+
+def tour_arrivals(tour, distance_matrix, service_time=0):
+    """arrival times (travel plus service) at each stop of a tour, from its first stop
+    """
+    legs = distance_matrix[tour[:-1], tour[1:]] + service_time
+    return np.concatenate(([0.0, ], np.cumsum(legs))), legs
+
+
+def route_legs(routes, distance_matrix, service_time=0):
+    """the legs (travel plus service) of several routes at once -- the stops of all the routes in one array, the leg
+    into each stop (none into the first stop of a route), and the index of each route's first stop
+    """
+    lengths = np.fromiter((len(route) for route in routes), dtype=np.int64, count=len(routes))
+    stops = np.fromiter(chain.from_iterable(routes), dtype=np.int64, count=lengths.sum())
+    starts = np.concatenate(([0, ], np.cumsum(lengths)[:-1]))
+
+    legs = np.empty(len(stops))
+    legs[1:] = distance_matrix[stops[:-1], stops[1:]] + service_time
+    legs[starts] = 0
+    return stops, legs, starts
+
+
+def route_arrivals(routes, distance_matrix, service_time=0):
+    """arrival times at the stops of several routes at once (see route_legs), from the first stop of each route
+    """
+    stops, legs, starts = route_legs(routes, distance_matrix, service_time)
+    arrivals = np.cumsum(legs)
+    arrivals -= np.repeat(arrivals[starts], np.diff(np.append(starts, len(stops))))
+    return stops, arrivals, starts
+
+
+def wait_costs(routes, distance_matrix, offsets, service_time=0, cost_exponent=1, skip_first=True):
+    """the wait cost of each route -- the sum of wait**cost_exponent over its stops (after the first, with
+    skip_first), or its length (travel and service) if cost_exponent is 0 -- evaluated for all the routes in one go
+
+    Args:
+        routes (list): the routes, each starting with the actor's node
+        distance_matrix (_type_): travel costs between the nodes
+        offsets (_type_): the wait each node has already had (see wait_offsets)
+        service_time (float, optional): service time at each stop. Defaults to 0.
+        cost_exponent (float, optional): the exponent of the wait cost. Defaults to 1.
+        skip_first (bool, optional): leave the first stop (the actor) out of the cost. Defaults to True.
+
+    Returns:
+        _type_: the cost of each route
+    """
+    if not cost_exponent:
+        _, legs, starts = route_legs(routes, distance_matrix, service_time)
+        return np.add.reduceat(legs, starts)
+
+    stops, arrivals, starts = route_arrivals(routes, distance_matrix, service_time)
+    terms = (arrivals + offsets[stops]) ** cost_exponent
+    if skip_first:
+        terms[starts] = 0
+    return np.add.reduceat(terms, starts)
+
+
+def tour_cost(tour, distance_matrix, tasks, task_indices, current_time, service_time, cost_exponent):
+    """calculate the total wait time of the tasks given the tour
+
+    Args:
+        tour (_type_): the sequence of the tasks
+        distance_matrix (_type_): distance matrix
+        tasks (_type_): the list of the tasks
+        task_indices (_type_): the indices of the tasks in the original task list
+        current_time (_type_): the current simulation time
+
+    Returns:
+        _type_: returns the cost of the tour
+    """
+    offsets = wait_offsets(tasks, task_indices, current_time)
+    return float(wait_costs([tour, ], distance_matrix, offsets, service_time, cost_exponent)[0])
+
+
+def insertion_costs(tour, vertex, distance_matrix, offsets, service_time=0, cost_exponent=1):
+    """the increase in the wait cost of a tour (sum of wait**cost_exponent over the stops after the first, or the
+    tour length if cost_exponent is 0) for inserting the vertex at each position 1..len(tour), scored without building
+    the candidate tours.  An insertion delays every later stop by the same amount, so with suffix sums of the powers
+    of the waits each position costs O(p) for an integer exponent p (the binomial expansion of (wait + delay)**p);
+    other exponents evaluate the delayed suffixes directly, as one array operation.
+
+    Args:
+        tour (list): the stops, starting with the actor
+        vertex (int): the node to insert
+        distance_matrix (_type_): travel costs between the nodes
+        offsets (_type_): the wait each node has already had (see wait_offsets)
+        service_time (float, optional): service time at each stop. Defaults to 0.
+        cost_exponent (float, optional): the exponent of the wait cost. Defaults to 1.
+
+    Returns:
+        _type_: the increase in cost for inserting at positions 1..len(tour)
+    """
+    tour = np.asarray(tour)
+    arrivals, legs = tour_arrivals(tour, distance_matrix, service_time)
+
+    into = distance_matrix[tour, vertex] + service_time
+    # the delay to the stops after each position -- nothing follows an insertion at the end
+    delays = into[:-1] + distance_matrix[vertex, tour[1:]] + service_time - legs
+
+    if not cost_exponent:
+        return np.append(delays, into[-1])
+
+    vertex_cost = (arrivals + into + offsets[vertex]) ** cost_exponent
+    waits = arrivals[1:] + offsets[tour[1:]]
+
+    if cost_exponent == int(cost_exponent):
+        # suffix sums of waits**k, k < p -- the delayed suffix changes by sum_k C(p, k) delay**(p-k) S_k
+        p = int(cost_exponent)
+        delayed = np.zeros(len(delays))
+        for k in range(p):
+            suffix = np.cumsum((waits ** k)[::-1])[::-1]
+            delayed += comb(p, k) * delays ** (p - k) * suffix
+    else:
+        # only the stops from each position on are delayed -- as in removal_gains, mask before taking the power
+        after = np.arange(len(waits))[np.newaxis, :] >= np.arange(len(delays))[:, np.newaxis]
+        delayed = np.where(after, np.clip(waits[np.newaxis, :] + delays[:, np.newaxis], 0, None), waits) ** cost_exponent
+        delayed = (delayed - waits ** cost_exponent).sum(axis=1)
+
+    return vertex_cost + np.append(delayed, 0.0)
+
+
+def removal_gains(tour, distance_matrix, offsets, service_time=0, cost_exponent=1):
+    """the decrease in the wait cost of a tour (as insertion_costs) for taking out the stop at each position
+    1..len(tour)-1 -- the stops after it are brought forward by the same amount, so the same suffix sums apply
+
+    Args:
+        tour (list): the stops, starting with the actor
+        distance_matrix (_type_): travel costs between the nodes
+        offsets (_type_): the wait each node has already had (see wait_offsets)
+        service_time (float, optional): service time at each stop. Defaults to 0.
+        cost_exponent (float, optional): the exponent of the wait cost. Defaults to 1.
+
+    Returns:
+        _type_: the decrease in cost for taking out the stop at positions 1..len(tour)-1
+    """
+    tour = np.asarray(tour)
+    arrivals, legs = tour_arrivals(tour, distance_matrix, service_time)
+
+    # how far the stops after each position are brought forward -- nothing follows the last stop
+    advances = legs[:-1] + legs[1:] - (distance_matrix[tour[:-2], tour[2:]] + service_time)
+
+    if not cost_exponent:
+        return np.append(advances, legs[-1])
+
+    waits = arrivals[1:] + offsets[tour[1:]]
+
+    if cost_exponent == int(cost_exponent):
+        p = int(cost_exponent)
+        advanced = np.zeros(len(advances))
+        for k in range(p):
+            suffix = np.cumsum((waits ** k)[::-1])[::-1]
+            advanced -= comb(p, k) * (-advances) ** (p - k) * suffix[1:]
+    else:
+        # only the stops after each position move; masking before the power keeps the others off negative bases
+        after = np.arange(len(waits))[np.newaxis, :] > np.arange(len(advances))[:, np.newaxis]
+        advanced = np.where(after, np.clip(waits[np.newaxis, :] - advances[:, np.newaxis], 0, None), waits) ** cost_exponent
+        advanced = (waits ** cost_exponent - advanced).sum(axis=1)
+
+    return waits ** cost_exponent + np.append(advanced, 0.0)
+
+
 def assign_tour_to_actor(actor, tasks, tour, task_indices, eta=1, eta_first=False):
     actor.path = []
     actor.complete_path = []
@@ -80,14 +368,14 @@ def assign_tour_to_actor(actor, tasks, tour, task_indices, eta=1, eta_first=Fals
 
     start_task = tasks[task_indices[tour[tour_start]]]
     end_task = tasks[task_indices[tour[tour_end-1]]]
-    if actor.distance_to(start_task.location) > actor.distance_to(end_task.location):
+    if actor.distance_to(actor.pos, start_task.location) > actor.distance_to(actor.pos, end_task.location):
         tmp = tour_start
         tour_start = tour_end - 1
         tour_end = tmp - 1
         tour_step = -1
-        print(f"reversing tour: {tour_start} -> {tour_end} -- {tour_start - tour_end} tasks")
+        logger.debug("reversing tour: %d -> %d -- %d tasks", tour_start, tour_end, tour_start - tour_end)
 
-    print(f"assigning a tour of {tour_len} stops starting at {tour_start}/{len(tour)}")
+    logger.debug("assigning a tour of %d stops starting at %d/%d", tour_len, tour_start, len(tour))
 
     for _i in range(tour_start, tour_end, tour_step):
         index = tour[_i]
@@ -98,12 +386,41 @@ def assign_tour_to_actor(actor, tasks, tour, task_indices, eta=1, eta_first=Fals
     actor.path.append((Task(-1, actor.get_depot(), -1), None))
 
     # store the complete path as well for visualization purposes
+    if actor.screen is None:
+        return
+
     for index in tour[1:]:
         task_index = task_indices[index]
         actor.complete_path.append(tasks[task_index])
     actor.complete_path.append(Task(-1, actor.get_depot(), -1))
 
 
+def assign_tours_to_actors(actors, tasks, tours, task_indices, eta=1, eta_first=False):
+    """hand each actor its tour (tours is a list in the order of the actors, or a dict keyed by actor position, as
+    from the ALNS search).  The tasks on the tours are first taken off the actors' current paths and go back to
+    waiting -- so none stays assigned to an actor that won't service it (beyond the eta part of a tour, or on the
+    path of an actor whose tasks were handed to another).  Actors left without any stops keep what remains of their
+    current path.
+    """
+    if isinstance(tours, dict):
+        tours = [tours[index] for index in range(len(actors))]
+
+    planned = {tasks[task_indices[index]].id for tour in tours for index in tour[1:]}
+    for actor in actors:
+        path = []
+        for task, travel_time in actor.path:
+            if task.id in planned:
+                task.service_state = ServiceState.WAITING
+            else:
+                path.append((task, travel_time))
+        actor.path = path
+
+    for actor, tour in zip(actors, tours):
+        if len(tour) < 2:
+            continue
+        assign_tour_to_actor(actor, tasks, tour, task_indices, eta=eta, eta_first=eta_first)
+
+
 def assign_time_tour_to_actor(actor, actor_pos, actor_start_index, tasks, distances, field, tour, task_indices, eta=1, eta_first=False):
     # reset the actor's path
     actor.path = []
@@ -122,9 +439,9 @@ def assign_time_tour_to_actor(actor, actor_pos, actor_start_index, tasks, distan
     if distances[0, tour_start] > distances[0, tour_end-1]:
         tour_start, tour_end = tour_end - 1, tour_start - 1
         tour_step = -1
-        print(f"reversing tour: {tour_start} -> {tour_end} -- {tour_start - tour_end} tasks")
+        logger.debug("reversing tour: %d -> %d -- %d tasks", tour_start, tour_end, tour_start - tour_end)
 
-    print(f"assigning a tour of {tour_len} stops starting at {tour_start}/{len(tour)}")
+    logger.debug("assigning a tour of %d stops starting at %d/%d", tour_len, tour_start, len(tour))
 
     # reset the actor state
     actor.pos = actor_pos
@@ -167,6 +484,9 @@ def assign_time_tour_to_actor(actor, actor_pos, actor_start_index, tasks, distan
 
     # store the complete path as well for visualization purposes
     actor.complete_path = []
+    if actor.screen is None:
+        return
+
     if tour_step > 0:
         tour_start = 1
         tour_end = len(tour)
@@ -0,0 +1,88 @@
+import fcntl
+import hashlib
+import json
+import os
+
+# run arguments that determine the outcome of a run -- together they identify it in the store
+RUN_KEY_ARGS = [
+    'prefix', 'policy', 'generator', 'data_source', 'seed', 'lambd', 'service_time', 'eta', 'eta_first', 'gamma', 'sectors',
+    'cost_exponent', 'max_tasks', 'total_tasks', 'max_time', 'initial_tasks', 'max_initial_wait', 'actors', 'centralized',
+    'tick_time', 'event_driven', 'cold_start', 'max_solver_time', 'solver',
+    'async_planning', 'planning_latency_scale', 'incremental_replan', 'replan_threshold', 'replan_refresh',
+    'alns_search', 'alns_acceptance',
+]
+
+
+def run_key(args):
+    """
+    The configuration of a run, as a dict of the arguments that affect its result
+    """
+    return {name: getattr(args, name, None) for name in RUN_KEY_ARGS}
+
+
+def key_id(key):
+    """
+    A short, stable identifier for a run configuration
+    """
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class ResultsStore:
+    """
+    Append-only record of completed runs, one JSON line per run, keyed by the run configuration.  Appends are
+    made under an exclusive lock and synced to disk, so several processes can share a store and a sweep that is
+    interrupted keeps every run it finished.  When a configuration is run again the newer record wins.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._records = {}
+        self._offset = 0
+
+    def _refresh(self):
+        # pick up any records appended (by us or anyone else) since the last read
+        if not os.path.exists(self.file_name):
+            return
+
+        with open(self.file_name, 'r') as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                fp.seek(self._offset)
+                for line in fp:
+                    if not line.endswith('\n'):
+                        break
+                    self._offset += len(line.encode())
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._records[record['id']] = record
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """
+        The stored record for a run configuration, or None if it hasn't been completed
+        """
+        self._refresh()
+        return self._records.get(key_id(key))
+
+    def add(self, key, **values):
+        """
+        Record a completed run
+        """
+        record = {'id': key_id(key), 'key': key}
+        record.update(values)
+        line = json.dumps(record) + '\n'
+
+        with open(self.file_name, 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(line)
+                fp.flush()
+                os.fsync(fp.fileno())
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+        self._records[record['id']] = record
+        return record
@@ -1,28 +1,37 @@
 from copy import deepcopy
 
-from matplotlib.pyplot import show
-from actor import Actor
+from actor import Actor, Fleet, PathProfile, tick_fleet
 from config import *
 from random import random, expovariate, seed
 from Task import Task, ServiceState
-import pygame
 from importlib import import_module
-from math import sqrt, exp
+from math import sqrt, exp, ceil
 import numpy as np
 
 from Field import Field, Sector
-import colorsys
+from event_trace import TASK_ARRIVED, SERVICE_DONE
+from planner import AsyncPlanner, ParallelPlanner, plans_together, supports_async, supports_planning
+import logging
+
+logger = logging.getLogger(__name__)
+
+# drawing only -- imported on demand (see Simulation._init_graphics) so headless runs never load them
+pygame = None
+colorsys = None
 
 
 class Simulation:
     def __init__(self, policy_name, policy_args=None, generator_name='uniform', generator_args=None, num_actors=1, pois_lambda=0.01, screen=None, service_time=SERVICE_TIME,
                  speed=ACTOR_SPEED, margin=SCREEN_MARGIN, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT,
-                 max_time=MAX_SIMULATION_TIME, max_tasks=MAX_SERVICED_TASKS, record_data=False, centralized=False, delivery_log=None):
+                 max_time=MAX_SIMULATION_TIME, max_tasks=MAX_SERVICED_TASKS, record_data=False, centralized=False, delivery_log=None,
+                 event_driven=False, event_trace=None, async_planning=False, planning_workers=PLANNING_WORKERS, planning_latency_scale=None,
+                 parallel_planning=False):
         self.actor_speed = speed
         self.pois_lambda = pois_lambda
         self.screen = screen
         self.record_data = record_data
         if screen is not None or record_data:
+            self._init_graphics()
             self.sim_time_text = pygame.font.SysFont('dejavuserif', 15)
             self.elapsed_time_text = pygame.font.SysFont('dejavuserif', 10)
             self.status_font = pygame.font.SysFont('roboto', STATUS_FONT_SIZE)
@@ -37,6 +46,10 @@ class Simulation:
         self.max_tasks = max_tasks
 
         self.delivery_log = delivery_log
+        self.event_trace = event_trace
+
+        # skip the clock over ticks where nothing but travel happens (headless only)
+        self.event_driven = event_driven and screen is None
 
         # load the draw method
         self.load_generator(generator_name=generator_name, generator_args=generator_args)
@@ -52,18 +65,54 @@ class Simulation:
             self.num_actors = self.field.count
 
         # art objects
-        self.actor_image = pygame.image.load('assets/car.svg')
-        self.actor_image = pygame.transform.scale(self.actor_image, (ACTOR_IMAGE_SIZE, ACTOR_IMAGE_SIZE))
+        if screen is not None:
+            self.actor_image = pygame.image.load('assets/car.svg')
+            self.actor_image = pygame.transform.scale(self.actor_image, (ACTOR_IMAGE_SIZE, ACTOR_IMAGE_SIZE))
 
         # load the policy
         self.load_policy(policy_name=policy_name, policy_args=policy_args)
 
+        # plan off the simulation thread, if the policy allows it
+        self.async_planning = async_planning
+        if async_planning and not supports_async(self._policy):
+            logger.warning("The %s policy can't plan asynchronously -- planning synchronously instead", policy_name)
+            self.async_planning = False
+        self.planning_workers = planning_workers
+        self.planning_latency_scale = planning_latency_scale
+        self._planner = None
+        if self.async_planning and self.event_driven:
+            # the plans in progress are events that the skip can't see
+            logger.warning("Event-driven mode is not available with asynchronous planning -- stepping every tick")
+            self.event_driven = False
+
+        # plan for all the actors in a tick at once -- only when each actor has its own tasks
+        self.parallel_planning = parallel_planning and not self.async_planning
+        if self.parallel_planning and (self.field is None or not supports_planning(self._policy)):
+            logger.warning("Parallel planning needs one actor per cluster and a %s policy that splits -- planning one actor at a time instead",
+                           policy_name)
+            self.parallel_planning = False
+        self._parallel_planner = None
+
         # preload all the the tasks
         self.reset()
 
+    @staticmethod
+    def _init_graphics():
+        global pygame, colorsys
+        import pygame
+        import colorsys
+
     def reset(self, task_list=None):
 
+        self._stop_planning()
+        if self.async_planning:
+            self._planner = AsyncPlanner(self._policy, workers=self.planning_workers, latency_scale=self.planning_latency_scale)
+        if self.parallel_planning:
+            self._parallel_planner = ParallelPlanner(self._policy, workers=self.planning_workers)
+
         self.actor_list = []
+        self.fleet = Fleet(capacity=self.num_actors)
+        self.batch_kinematics = self.generator.is_euclidean() and self.num_actors >= BATCH_KINEMATICS_MIN_ACTORS
         for i in range(self.num_actors):
             if self.field is None:
                 pos = [0.5, 0.5]
@@ -83,8 +132,10 @@ class Simulation:
                 speed=self.actor_speed,
                 euclidean=self.generator.is_euclidean(),
                 screen=self.screen,
-                path_fn=self.get_detailed_path,
-                location_fn=self.get_nearest_location
+                path_fn=self.get_path_profile,
+                location_fn=self.get_nearest_location,
+                fleet=self.fleet,
+                event_trace=self.event_trace
             ))
 
         self.serviced_tasks = []
@@ -107,6 +158,10 @@ class Simulation:
             self._draw_all_tasks()
         else:
             self.task_list = task_list
+            self.next_task = 0
+
+        # arrived, unserviced tasks indexed by cluster (and then by task id, in order of arrival)
+        self._pending_tasks = {}
 
         self.rho = round(self.service_time * self.pois_lambda, 2)
 
@@ -124,12 +179,28 @@ class Simulation:
         gen_mod = import_module('.'+self.generator_name, package='generators')
         generator_fn = gen_mod.get_generator_fn()
         self.generator = generator_fn(**self.generator_args)
+        self._path_profiles = {}
 
     def get_detailed_path(self, start_index, end_index):
         if self.generator is None:
             return None
         return self.generator.get_detailed_path(start_index=start_index, end_index=end_index)
 
+    def get_path_profile(self, start_index, end_index):
+        """
+        Distance profile of the detailed path between two locations -- built once per leg and shared by all the actors
+        """
+        key = (start_index, end_index)
+        try:
+            return self._path_profiles[key]
+        except KeyError:
+            pass
+
+        path = self.get_detailed_path(start_index=start_index, end_index=end_index)
+        profile = PathProfile(path) if path is not None else None
+        self._path_profiles[key] = profile
+        return profile
+
     def get_nearest_location(self, cluster_id, location):
         return self.generator.get_nearest_location(cluster_id, *location)
 
@@ -157,11 +228,10 @@ class Simulation:
             return 0.0
 
         mean = self._avg_served_time / len(self.serviced_tasks)
-        variance = 0
-        for task_index in self.serviced_tasks:
-            variance += (self.task_list[task_index].wait_time() - mean) ** 2
+        store = self.task_list[0].store
+        wait_times = store.wait_times(store.serviced_mask())
 
-        return variance / (len(self.serviced_tasks))
+        return float(np.sum((wait_times - mean) ** 2)) / len(self.serviced_tasks)
 
     def calculate_sd(self):
         """
@@ -170,6 +240,34 @@ class Simulation:
         """
         return sqrt(self.calculate_variance())
 
+    def _cluster_key(self, cluster_id):
+        # without a field every actor is free to take every task
+        return cluster_id if self.field is not None else None
+
+    def _add_pending_task(self, task):
+        self._pending_tasks.setdefault(self._cluster_key(task.cluster_id), {})[task.id] = task
+
+    def _remove_pending_task(self, task):
+        del self._pending_tasks[self._cluster_key(task.cluster_id)][task.id]
+
+    def _cluster_actors(self):
+        """
+        The actors grouped by the cluster they take their tasks from, in actor order
+        """
+        cluster_actors = {}
+        for actor in self.actor_list:
+            cluster_actors.setdefault(self._cluster_key(actor.cluster_id), []).append(actor)
+        return cluster_actors
+
+    def _get_cluster_tasks(self, actor):
+        """
+        The pending tasks (waiting or assigned) available to the actor, in order of arrival
+        """
+        cluster_tasks = self._pending_tasks.get(self._cluster_key(actor.cluster_id))
+        if not cluster_tasks:
+            return []
+        return [task for task in cluster_tasks.values() if task.is_pending()]
+
     def _draw_all_tasks(self):
         """
         Draw all of the tasks for the simulation according to the defined max time or max serviced tasks
@@ -402,7 +500,7 @@ class Simulation:
                 "curr max time: " + str(self._curr_max_time), False, (255, 255, 255))
             self.screen.blit(current_max_service_time_text, (self._screen_width/2.0, 40))
         except Exception as e:
-            print("Error in showing simulation info", e)
+            logger.error("Error in showing simulation info: %s", e)
             pass
 
     def _show_actor_pos(self, actor_index):
@@ -527,6 +625,14 @@ class Simulation:
 
         plt.show(block=True)
 
+    def _stop_planning(self):
+        if self._planner is not None:
+            self._planner.close()
+            self._planner = None
+        if self._parallel_planner is not None:
+            self._parallel_planner.close()
+            self._parallel_planner = None
+
     ##################################################################################
     # Simulator step functions
     ##################################################################################
@@ -538,7 +644,14 @@ class Simulation:
             actor_index (_type_): the index of the actor
         """
         rval = self.actor_list[actor_index].tick(round(self.sim_time, 2), tick_time)
+        self._record_service(rval)
 
+    def _record_service(self, rval):
+        """book keeping for a task the actor has finished servicing
+
+        Args:
+            rval (_type_): the task returned by the actor's tick, if any
+        """
         if rval == None:
             # TODO: Removing this for now -- skipping the time means the clock gets out of sync
             #       when comparing multiple runs
@@ -559,7 +672,11 @@ class Simulation:
         #  set the task to be serviced
         self.task_list[rval.id].service_state = ServiceState.SERVICED
         self.task_list[rval.id].time_serviced = self.sim_time
-        print("[{:.2f}]: Service done at location {}".format(self.sim_time, rval.location))
+        self._remove_pending_task(self.task_list[rval.id])
+        if self.event_trace is not None:
+            self.event_trace.write(SERVICE_DONE, self.sim_time, task_id=rval.id, location=rval.location)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[%.2f]: Service done at location %s", self.sim_time, rval.location)
         self.serviced_tasks.append(rval.id)
 
         # record stats
@@ -570,8 +687,53 @@ class Simulation:
 
         # track update
         if self.delivery_log is not None:
-            self.delivery_log.write(self.task_list[rval.id].to_string()+'\n')
-            self.delivery_log.flush()
+            self.delivery_log.record(self.task_list[rval.id])
+
+    def _actor_states(self):
+        return [(actor.servicing, actor.current_goal, len(actor.path)) for actor in self.actor_list]
+
+    def _skip_quiet_ticks(self, tick_time, max_simulation_time):
+        """
+        Event-driven fast path: jump the clock over the run of upcoming ticks in which no task arrives and no actor
+        arrives at a goal or completes a service.  Policies only react to changes in the task or actor state, so
+        those ticks would leave everything but the actor positions untouched and can be skipped in one step.
+
+        The events themselves are still processed by a regular tick, so the serviced tasks and the order of
+        service are the same as in tick mode.  Two differences remain:
+            - the clock is advanced by multiplication rather than repeated addition, and
+            - a euclidean actor's position is rounded once per jump rather than once per tick,
+        so an arrival can land one tick (tick_time) away from where tick mode puts it.  Wait times and the
+        delivery log agree with tick mode to within tick_time per leg of a tour.
+        """
+        if self.next_task < len(self.task_list):
+            quiet = ceil((self.task_list[self.next_task].time - self.sim_time) / tick_time) - 2
+        else:
+            quiet = None
+
+        current_time = round(self.sim_time, 2)
+        for actor in self.actor_list:
+            actor_quiet = actor.quiet_ticks(current_time, tick_time)
+            if actor_quiet is not None and (quiet is None or actor_quiet < quiet):
+                quiet = actor_quiet
+
+        if max_simulation_time is not None:
+            time_quiet = int((max_simulation_time - self.sim_time) / tick_time) - 1
+            if quiet is None or time_quiet < quiet:
+                quiet = time_quiet
+
+        if quiet is None or quiet <= 0:
+            return
+
+        self.sim_time += quiet * tick_time
+        self.ticks += quiet
+
+        current_time = round(self.sim_time, 2)
+        self._total_travel_distance = 0
+        for actor in self.actor_list:
+            actor.advance(current_time, tick_time, quiet)
+            self._total_travel_distance += actor.travel_dist
+            if actor.travel_dist > self._max_travel_distance:
+                self._max_travel_distance = actor.travel_dist
 
     def tick(self, tick_time, max_simulation_time, max_tasks):
         """[summary]
@@ -583,45 +745,66 @@ class Simulation:
 
         if max_simulation_time is not None:
             if self.sim_time > max_simulation_time:
+                self._stop_planning()
                 return -1
         else:
             if len(self.serviced_tasks) >= max_tasks:
+                self._stop_planning()
                 return -1
 
         # update the current pending task count
         while self.next_task < len(self.task_list) and self.sim_time >= self.task_list[self.next_task].time:
             if self.next_task > len(self.task_list) - 1:
                 break
-            print("[{:.2f}]: New task arrived at location {}".format(round(self.sim_time, 2), self.task_list[self.next_task].location))
+            if self.event_trace is not None:
+                task = self.task_list[self.next_task]
+                self.event_trace.write(TASK_ARRIVED, self.sim_time, task_id=task.id, location=task.location)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[%.2f]: New task arrived at location %s", self.sim_time, self.task_list[self.next_task].location)
+            self._add_pending_task(self.task_list[self.next_task])
             self.next_task += 1
 
+        if self.event_driven:
+            actor_states = self._actor_states()
+
         # TODO: The selection of the next policy, and the target of the Actor(s) should really be in the policy, not here in
         #       the simulation code.
-        for actor in self.actor_list:
-
-            # # TODO: HACK for DC Batch -- shortcut for everything else -- will break things if continous planning is required -- should
-            # #       make this an auto-detect option
-            # if actor.is_busy():
-            #     continue
+        if self._parallel_planner is not None:
+            actor_tasks = [(actor, self._get_cluster_tasks(actor)) for actor in self.actor_list]
+            self._parallel_planner.plan([(actor, tasks) for actor, tasks in actor_tasks if len(tasks)], field=self.field, current_time=self.sim_time)
+        elif plans_together(self._policy):
+            # the policy plans for all of the actors sharing a cluster at once
+            for cluster_actors in self._cluster_actors().values():
+                cluster_tasks = self._get_cluster_tasks(cluster_actors[0])
+                if len(cluster_tasks):
+                    self._policy.__self__.plan_actors(actors=cluster_actors, tasks=cluster_tasks, field=self.field, current_time=self.sim_time)
+        else:
+            for actor in self.actor_list:
 
-            cluster_tasks = []
-            for task in self.task_list:
-                if self.sim_time < task.time:
-                    break
+                # # TODO: HACK for DC Batch -- shortcut for everything else -- will break things if continous planning is required -- should
+                # #       make this an auto-detect option
+                # if actor.is_busy():
+                #     continue
 
-                if not task.is_pending():
-                    continue
+                cluster_tasks = self._get_cluster_tasks(actor)
+                if len(cluster_tasks):
+                    # print("[{:.2f}]: Currently {} tasks pending for cluster {}".format(round(self.sim_time, 2), len(cluster_tasks), actor.cluster_id))
+                    if self._planner is not None:
+                        self._planner.plan(actor=actor, tasks=cluster_tasks, field=self.field, current_time=self.sim_time)
+                    else:
+                        self._policy(actor=actor, tasks=cluster_tasks, field=self.field, current_time=self.sim_time)
 
-                if self.field is None or actor.cluster_id == task.cluster_id:
-                    cluster_tasks.append(task)
+        if self._planner is not None:
+            self._planner.update(self.sim_time)
 
-            if len(cluster_tasks):
-                # print("[{:.2f}]: Currently {} tasks pending for cluster {}".format(round(self.sim_time, 2), len(cluster_tasks), actor.cluster_id))
-                self._policy(actor=actor, tasks=cluster_tasks, field=self.field, current_time=self.sim_time)
+        if self.batch_kinematics:
+            for rval in tick_fleet(self.fleet, self.actor_list, round(self.sim_time, 2), tick_time):
+                self._record_service(rval)
 
         self._total_travel_distance = 0
         for actor_index in range(len(self.actor_list)):
-            self._tick_each_actor(actor_index, tick_time)
+            if not self.batch_kinematics:
+                self._tick_each_actor(actor_index, tick_time)
             self._total_travel_distance += self.actor_list[actor_index].travel_dist
             if self.actor_list[actor_index].travel_dist > self._max_travel_distance:
                 self._max_travel_distance = self.actor_list[actor_index].travel_dist
@@ -630,6 +813,11 @@ class Simulation:
             if len(actor.path) > self._max_queue_length:
                 self._max_queue_length = len(actor.path)
 
+        if self.event_driven:
+            # anything that changed this tick gets a regular tick to react before skipping ahead
+            if all(a[0] is b[0] and a[1] is b[1] and a[2] == b[2] for a, b in zip(actor_states, self._actor_states())):
+                self._skip_quiet_ticks(tick_time, max_simulation_time)
+
         if self.screen is not None:
             #  draw the limits of the environment
             self.screen.fill(SCREEN_BACKGROUND_COLOUR)
@@ -0,0 +1,124 @@
+'''
+Compare the solvers available to the LKH policies -- LKH and the built-in local search -- on random problems: the
+cost of the tour each one finds, and how long it takes, side by side.  Costs are measured in the units of the
+problem (the unit square, travel at unit speed) -- tour length for the TSP, and the latency objective of the TRP
+policies for the TRP.
+
+    python solver_compare.py --tasks 10 50 100 200 --instances 5 --service-time 0.01 --cost-exponent 1.5
+'''
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from config import *
+from Task import TaskStore
+from lkh_interface import configure_solver, solve_tsp, solve_trp
+from local_search import latency_costs, tour_length
+from policies.util import task_locations
+
+COMPARED_SOLVERS = ['lkh', 'local']
+
+# problem coordinates are scaled up to integers for LKH, as the policies do
+SCALE_FACTOR = 10000.0
+
+
+def random_tasks(rng, n, simulation_time):
+    """
+    n waiting tasks, uniformly placed in the unit square, that arrived at random times before simulation_time
+    """
+    store = TaskStore(capacity=n)
+    for id in range(n):
+        store.add(id=id, location=rng.random(2), time=rng.uniform(0, simulation_time))
+    return store.tasks()
+
+
+def route_cost(problem, start_pos, tasks, route, args):
+    locations = np.vstack((np.array(start_pos, dtype=np.float64).reshape(1, 2), task_locations(tasks)))
+    costs = np.sqrt(((locations[:, np.newaxis, :] - locations[np.newaxis, :, :]) ** 2).sum(axis=2))
+
+    if problem == 'tsp':
+        tour = [node - 1 for node in route]
+        assert sorted(tour) == list(range(len(locations)))
+        return tour_length(tour, costs)
+
+    path = [0, ] + [node - 1 for node in route]
+    assert sorted(path) == list(range(len(locations)))
+    service_times = np.array([0, ] + [args.service_time, ] * len(tasks), dtype=np.float64)
+    waits = np.array([0, ] + [args.simulation_time - task.time + task.initial_wait for task in tasks], dtype=np.float64)
+    return latency_costs(np.array(path), costs, service_times, waits, exponent=args.cost_exponent)[0]
+
+
+def solve(problem, start_pos, tasks, args):
+    if problem == 'tsp':
+        return solve_tsp('CMP TSP', 'Solver comparison', start_pos, tasks, scale_factor=SCALE_FACTOR, time_limit=args.max_solver_time)
+    return solve_trp('CMP TRP', 'Solver comparison', start_pos, tasks, simulation_time=args.simulation_time,
+                     mean_service_time=args.service_time, cost_exponent=args.cost_exponent, scale_factor=SCALE_FACTOR,
+                     time_limit=args.max_solver_time)
+
+
+def compare(args):
+    start_pos = (0.5, 0.5)
+
+    print(f"{'problem':>8} {'tasks':>6} " + ' '.join(f"{solver + ' cost':>12} {solver + ' time':>10}" for solver in COMPARED_SOLVERS) +
+          f" {'cost ratio':>11}")
+    for problem in args.problems:
+        for n in args.tasks:
+            costs = {solver: [] for solver in COMPARED_SOLVERS}
+            times = {solver: [] for solver in COMPARED_SOLVERS}
+            for instance in range(args.instances):
+                tasks = random_tasks(np.random.default_rng([args.seed, n, instance]), n, args.simulation_time)
+                for solver in COMPARED_SOLVERS:
+                    configure_solver(solver)
+                    start = perf_counter()
+                    routes = solve(problem, start_pos, tasks, args)
+                    times[solver].append(perf_counter() - start)
+                    costs[solver].append(route_cost(problem, start_pos, tasks, routes[0], args))
+
+            ratio = np.mean(np.array(costs['local']) / np.array(costs['lkh']))
+            print(f"{problem:>8} {n:>6} " +
+                  ' '.join(f"{np.mean(costs[solver]):>12.4f} {np.mean(times[solver]):>9.3f}s" for solver in COMPARED_SOLVERS) +
+                  f" {ratio:>11.4f}")
+
+    configure_solver('auto')
+
+
+def build_argparser():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument(
+        '--problems',
+        nargs='+', default=['tsp', 'trp'], choices=['tsp', 'trp'],
+        help='Kinds of problem to compare on')
+    argparser.add_argument(
+        '--tasks',
+        nargs='+', type=int, default=[10, 50, 100, 200],
+        help='Numbers of tasks in the problems')
+    argparser.add_argument(
+        '--instances',
+        default=5, type=int,
+        help='Random problems of each size (the results are averaged)')
+    argparser.add_argument(
+        '--seed',
+        default=42, type=int,
+        help='Random seed')
+    argparser.add_argument(
+        '--service-time',
+        default=0, type=float,
+        help='Service time at each task (TRP)')
+    argparser.add_argument(
+        '--cost-exponent',
+        default=1, type=float,
+        help='Exponent of the latency cost (TRP)')
+    argparser.add_argument(
+        '--simulation-time',
+        default=10, type=float,
+        help='Time at which the problems are solved -- the tasks arrived at random times before it (TRP)')
+    argparser.add_argument(
+        '--max-solver-time',
+        default=DEFAULT_POLICY_MAX_SOLVER_TIME, type=float,
+        help='Wall clock limit (s) on each solve')
+    return argparser
+
+
+if __name__ == "__main__":
+    compare(build_argparser().parse_args())
@@ -0,0 +1,213 @@
+import atexit
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SOLVER_WORKERS, SOLVER_SCRATCH_DIR, SOLVER_TIMEOUT_GRACE
+
+logger = logging.getLogger(__name__)
+
+
+class SolverError(Exception):
+    pass
+
+
+class SolverTimeout(SolverError):
+    pass
+
+
+def read_tour(file_name):
+    """
+    The nodes of the (first) tour in a TSPLIB tour file
+    """
+    tour = []
+    with open(file_name) as fp:
+        in_tour = False
+        for line in fp:
+            if in_tour:
+                node = int(line)
+                if node == -1:
+                    break
+                tour.append(node)
+            elif line.startswith('TOUR_SECTION'):
+                in_tour = True
+    return tour
+
+
+def split_routes(tour, dimension, depots=()):
+    """
+    Break a tour into routes at the depots -- LKH-3 adds dummy nodes (> dimension) to mark the extra depot visits
+    """
+    routes = []
+    route = []
+    for node in tour:
+        if node in depots or node > dimension:
+            if len(route) > 0:
+                routes.append(route)
+            route = []
+        else:
+            route.append(node)
+    routes.append(route)
+    return routes
+
+
+class SolverDispatcher:
+    """
+    Concurrent dispatch of LKH runs: each solve is a run of the LKH binary (a subprocess -- LKH reads one problem per
+    run, so there are no long-lived solver processes), started from one of a fixed set of dispatch threads so that up
+    to workers problems are solved at once.  Each thread owns a scratch directory (on a RAM backed file system where
+    there is one) with fixed problem/parameter/tour file names, so a solve is just writing the problem text, running
+    LKH and reading back the tour -- no temporary files to create or problem objects to parse and serialize.
+
+    solve() is synchronous; submit() returns a future so that several problems can be solved at once.
+    """
+
+    def __init__(self, solver, workers=SOLVER_WORKERS, scratch_dir=SOLVER_SCRATCH_DIR):
+        if shutil.which(solver) is None:
+            raise SolverError(f'{solver} not found.')
+        self.solver = solver
+
+        if scratch_dir is None or not os.access(scratch_dir, os.W_OK):
+            scratch_dir = None
+        self._scratch_root = tempfile.mkdtemp(prefix='lkh_dispatch_', dir=scratch_dir)
+
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lkh')
+
+    def _scratch(self):
+        # each dispatch thread has its own directory
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = tempfile.mkdtemp(dir=self._scratch_root)
+            self._local.scratch = scratch
+        return scratch
+
+    def _run(self, problem, dimension, depots, initial_tour, params):
+        scratch = self._scratch()
+        problem_file = os.path.join(scratch, 'problem')
+        par_file = os.path.join(scratch, 'par')
+        tour_file = os.path.join(scratch, 'tour')
+        initial_tour_file = os.path.join(scratch, 'initial_tour')
+
+        with open(problem_file, 'w') as fp:
+            fp.write(problem)
+            fp.write('\n')
+
+        if initial_tour is not None:
+            with open(initial_tour_file, 'w') as fp:
+                fp.write('TOUR_SECTION\n')
+                fp.write(''.join(f'{node}\n' for node in initial_tour))
+                fp.write('-1\nEOF\n')
+
+        with open(par_file, 'w') as fp:
+            fp.write('SPECIAL\n')
+            for k, v in params.items():
+                fp.write(f'{k.upper()} = {v}\n')
+            fp.write(f'PROBLEM_FILE = {problem_file}\n')
+            fp.write(f'TOUR_FILE = {tour_file}\n')
+            if initial_tour is not None:
+                fp.write(f'INITIAL_TOUR_FILE = {initial_tour_file}\n')
+
+        if os.path.exists(tour_file):
+            os.remove(tour_file)
+
+        # LKH checks its time limit between trials -- if it overruns that (e.g., still building the candidate
+        # sets of a large problem) it is stopped
+        time_limit = params.get('time_limit')
+        timeout = None if time_limit is None else time_limit + SOLVER_TIMEOUT_GRACE
+
+        timed_out = False
+        try:
+            # stdin=DEVNULL for preventing a "Press any key" pause at the end of execution
+            subprocess.run([self.solver, par_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                           check=True, timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            raise SolverError(e.output.decode())
+        except subprocess.TimeoutExpired:
+            timed_out = True
+
+        if not os.path.isfile(tour_file) or os.stat(tour_file).st_size == 0:
+            if timed_out:
+                raise SolverTimeout(f"LKH did not find a tour within {timeout}s")
+            raise SolverError(f"{tour_file} does not appear to contain any tours. LKH probably did not find solution.")
+
+        tour = read_tour(tour_file)
+        if timed_out:
+            # LKH writes out its best tour at the end of each run -- use that, as long as it wasn't cut off mid-write
+            if len(tour) < dimension:
+                raise SolverTimeout(f"LKH did not find a tour within {timeout}s")
+            logger.warning("LKH stopped after %ss -- using the best tour so far", timeout)
+
+        return split_routes(tour, dimension, depots)
+
+    def submit(self, problem, dimension, depots=(), initial_tour=None, **params):
+        """
+        Queue a problem (TSPLIB text) for the next free dispatch thread
+
+        Args:
+            problem (str): the problem in TSPLIB format
+            dimension (int): the number of nodes in the problem
+            depots (tuple, optional): the depot nodes. Defaults to ().
+            initial_tour (list, optional): a complete tour (node ids) for LKH to start from. Defaults to None.
+            params: LKH parameters (e.g., max_trials=1000).  A time_limit (s) is also enforced on the solver
+                    process, with a grace period.
+
+        Returns:
+            Future: resolves to the list of routes
+        """
+        return self._executor.submit(self._run, problem, dimension, depots, initial_tour, params)
+
+    def solve(self, problem, dimension, depots=(), initial_tour=None, **params):
+        return self.submit(problem, dimension, depots, initial_tour, **params).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        shutil.rmtree(self._scratch_root, ignore_errors=True)
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+_workers = SOLVER_WORKERS
+
+
+def get_solver_dispatcher(solver):
+    """
+    The shared dispatcher for a solver binary -- created on first use and shut down at exit
+    """
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(solver)
+        if dispatcher is None:
+            dispatcher = SolverDispatcher(solver, workers=_workers)
+            _dispatchers[solver] = dispatcher
+        return dispatcher
+
+
+def configure_solver_dispatch(workers=SOLVER_WORKERS):
+    """
+    Set how many solver runs the shared dispatchers start at once -- any existing dispatchers are shut down and
+    replaced on next use
+    """
+    global _workers
+    with _dispatchers_lock:
+        if workers == _workers:
+            return
+        _workers = workers
+        dispatchers = list(_dispatchers.values())
+        _dispatchers.clear()
+    for dispatcher in dispatchers:
+        dispatcher.close()
+
+
+# a forked child can't use its parent's dispatch threads -- it starts its own dispatchers
+os.register_at_fork(after_in_child=_dispatchers.clear)
+
+
+@atexit.register
+def _close_dispatchers():
+    for dispatcher in _dispatchers.values():
+        dispatcher.close()
+    _dispatchers.clear()
@@ -0,0 +1,246 @@
+'''
+Run a grid of simulations (policy x lambda x seed x eta x sectors x cost exponent) on a pool of worker processes.
+
+Any other main.py argument applies to every run, e.g.,
+
+    python sweep.py --policy lkh_batch_tsp lkh_batch_trp --lambd 0.5 0.6 0.7 0.8 0.9 --eta 1 0.2 --max-tasks 3000 --total-tasks 3500
+
+Each run writes its own results and delivery log into a scratch directory; once all are done they are merged into
+the same files (names and layout) that main.py --multipass produces for each configuration.  Completed runs are
+recorded in the results store, along with the delivery log that holds their deliveries, so with --resume an
+interrupted sweep only runs what is missing and adds those runs to the logs that are already there.
+'''
+import argparse
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import copy
+from itertools import product
+from os import path
+
+from config import *
+from delivery_log import DeliveryLog, DELIVERY_LOG_FORMATS, merge_delivery_logs
+from main import build_argparser, simulate, normalize_args, results_name, delivery_log_name, telemetry_name, run_params, results_row, RESULTS_HEADER
+from results_store import ResultsStore, run_key, key_id
+from telemetry import get_telemetry, telemetry_rows, summary_rows, TELEMETRY_HEADER, TELEMETRY_SUMMARY_HEADER
+
+logger = logging.getLogger(__name__)
+
+# main.py arguments that can take a list of values in a sweep
+GRID_ARGS = ['policy', 'lambd', 'seed', 'eta', 'sectors', 'cost_exponent']
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count()
+
+
+def build_grid_argparser():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter, allow_abbrev=False)
+    argparser.add_argument(
+        '-p', '--policy',
+        nargs='+',
+        help='Policies to run')
+    argparser.add_argument(
+        '-l', '--lambd',
+        nargs='+', type=float,
+        help='Task arrival rates')
+    argparser.add_argument(
+        '-s', '--seed',
+        nargs='+', type=int,
+        help='Random seeds (default: the multipass seeds)')
+    argparser.add_argument(
+        '--eta',
+        nargs='+', type=float,
+        help='Proportions of the policy to execute (batch) (0,1]')
+    argparser.add_argument(
+        '--sectors',
+        nargs='+', type=int,
+        help='Numbers of sectors')
+    argparser.add_argument(
+        '-c', '--cost-exponent',
+        nargs='+', type=float,
+        help='Powers of the cost function')
+    argparser.add_argument(
+        '--workers',
+        default=None,
+        type=int,
+        help='Number of worker processes (default: one per available core)')
+    argparser.add_argument(
+        '--keep-jobs',
+        action='store_true',
+        help='Keep the per-run results after merging')
+    return argparser
+
+
+def build_jobs(grid_args, base_args):
+    """
+    Expand the grid into the arguments for each run -- unswept values come from the base arguments
+    """
+    values = []
+    for name in GRID_ARGS:
+        grid_values = getattr(grid_args, name)
+        if grid_values is None:
+            if name == 'seed' and base_args.seed is None:
+                grid_values = DEFAULT_SEEDS
+            else:
+                grid_values = [getattr(base_args, name), ]
+        values.append(grid_values)
+
+    jobs = []
+    for point in product(*values):
+        args = copy(base_args)
+        for name, value in zip(GRID_ARGS, point):
+            setattr(args, name, value)
+        normalize_args(args)
+        jobs.append(args)
+    return jobs
+
+
+def job_delivery_log_name(args, job_dir):
+    # named for the run configuration so that a resumed sweep can find it again
+    return path.join(job_dir, 'delivery_' + key_id(run_key(args)) + DELIVERY_LOG_FORMATS[args.delivery_log_format])
+
+
+def run_job(args, job_dir):
+    """
+    A single simulation run, with its deliveries written to the job directory
+
+    Returns:
+        tuple: the results row, the name of the delivery log and the solver calls made (None without --solver-telemetry)
+    """
+    delivery_file_name = job_delivery_log_name(args, job_dir)
+
+    telemetry = get_telemetry()
+    telemetry.enabled = args.solver_telemetry
+    telemetry.take()
+
+    delivery_log = DeliveryLog(delivery_file_name, format=args.delivery_log_format)
+    delivery_log.start_run(**run_params(args))
+    sim = simulate(args, delivery_log)
+    delivery_log.close()
+
+    return results_row(args, sim), delivery_file_name, telemetry.take() if args.solver_telemetry else None
+
+
+def merge_results(groups, jobs, outputs, store, delivery_log_format, solver_telemetry=False):
+    """
+    Combine the per-run output of each configuration into its results file and delivery log (and solver telemetry,
+    for the runs made in this sweep -- resumed runs have none).  Runs already merged into the configuration's delivery
+    log, by an earlier sweep or by main.py, stay in it and the others are added after them; the store records then
+    point to the merged log, so the per-run logs can go.
+    """
+    for results_str, indices in groups.items():
+        indices = [index for index in indices if index in outputs]
+        if not len(indices):
+            continue
+
+        with open(path.join(RESULTS_DIR, results_str), 'w') as f:
+            f.write(RESULTS_HEADER)
+            for index in indices:
+                f.write(outputs[index][0])
+
+        log_name = path.join(RESULTS_DIR, delivery_log_name(results_str, delivery_log_format))
+        # a per-run log that is gone was removed after being merged (records made before they pointed to the merged
+        # log), as were the runs of records without one
+        merged = [index for index in indices if outputs[index][1] is None or outputs[index][1] == log_name or
+                  not path.exists(outputs[index][1])]
+        to_merge = [index for index in indices if index not in merged]
+        if len(merged) and not path.exists(log_name):
+            logger.warning("Delivery log %s of %d completed runs is missing", log_name, len(merged))
+
+        if len(to_merge):
+            merge_delivery_logs([outputs[index][1] for index in to_merge], log_name, format=delivery_log_format,
+                                append=len(merged) > 0)
+            for index in to_merge:
+                store.add(run_key(jobs[index]), results=outputs[index][0], delivery_log=log_name)
+
+        if solver_telemetry:
+            with open(path.join(RESULTS_DIR, telemetry_name(results_str)), 'w') as f, \
+                    open(path.join(RESULTS_DIR, telemetry_name(results_str, summary=True)), 'w') as summary:
+                f.write(TELEMETRY_HEADER)
+                summary.write(TELEMETRY_SUMMARY_HEADER)
+                for index in indices:
+                    if outputs[index][2] is not None:
+                        f.write(telemetry_rows(jobs[index].seed, outputs[index][2]))
+                        summary.write(summary_rows(jobs[index].seed, outputs[index][2]))
+
+
+def sweep(grid_args, base_args):
+
+    if not path.isdir(RESULTS_DIR):
+        os.mkdir(RESULTS_DIR)
+
+    if len(base_args.prefix) != 0 and base_args.prefix[-1] != '_':
+        base_args.prefix = base_args.prefix + '_'
+
+    if base_args.actor_stats or base_args.event_trace is not None:
+        logger.warning("Actor stats and event traces are not recorded in a sweep")
+        base_args.actor_stats = False
+        base_args.event_trace = None
+
+    jobs = build_jobs(grid_args, base_args)
+
+    # runs are grouped into files the same way multiple_sims() does it -- one per configuration over all the seeds
+    single_seed = grid_args.seed is not None and len(grid_args.seed) == 1 or grid_args.seed is None and base_args.seed is not None
+    groups = {}
+    for index, args in enumerate(jobs):
+        results_str = results_name(args, args.seed if single_seed else None)
+        groups.setdefault(results_str, []).append(index)
+
+    job_dir = path.join(RESULTS_DIR, base_args.prefix + 'sweep_jobs')
+    os.makedirs(job_dir, exist_ok=True)
+
+    workers = grid_args.workers if grid_args.workers is not None else available_cores()
+
+    store = ResultsStore(path.join(RESULTS_DIR, RESULTS_STORE_FILE))
+
+    outputs = {}
+    pending = []
+    for index, args in enumerate(jobs):
+        if base_args.resume:
+            record = store.get(run_key(args))
+            if record is not None:
+                outputs[index] = (record['results'], record.get('delivery_log'), None)
+                continue
+        pending.append(index)
+
+    if len(outputs):
+        print(f"Skipping {len(outputs)} completed simulations")
+    print(f"Running {len(pending)} simulations on {workers} workers")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, jobs[index], job_dir): index for index in pending}
+        for future in as_completed(futures):
+            index = futures[future]
+            args = jobs[index]
+            try:
+                outputs[index] = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error("Run failed: %s, lambda %s, seed %s -- %s", args.policy, args.lambd, args.seed, e)
+                continue
+            store.add(run_key(args), results=outputs[index][0], delivery_log=outputs[index][1])
+            print(f"[{len(outputs)}/{len(jobs)}] done: {args.policy}, lambda {args.lambd}, seed {args.seed}, eta {args.eta}, "
+                  f"sectors {args.sectors}, p {args.cost_exponent}")
+
+    merge_results(groups, jobs, outputs, store, base_args.delivery_log_format, solver_telemetry=base_args.solver_telemetry)
+
+    if not grid_args.keep_jobs and not failed:
+        shutil.rmtree(job_dir)
+
+    return failed
+
+
+if __name__ == "__main__":
+    grid_args, remaining = build_grid_argparser().parse_known_args()
+    base_args = build_argparser().parse_args(remaining)
+
+    logging.basicConfig(level=base_args.log_level, format='%(message)s')
+
+    if sweep(grid_args, base_args):
+        raise SystemExit(1)
@@ -0,0 +1,99 @@
+'''
+Solver telemetry -- a record of every call to a solver (LKH, the built-in local search, incremental replanning, the
+ALNS loops of the older policies): how long it took, how many nodes it saw, the objective before and after, the
+iterations it made and whether it ran into its limit.  Collection is off unless enabled (see --solver-telemetry in
+main.py); the records of each run are written next to its results, both call by call and summed up per solver.
+'''
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+TELEMETRY_HEADER = 'seed,solver,problem,nodes,wall-time,objective-before,objective-after,iterations,limit-hit\n'
+TELEMETRY_SUMMARY_HEADER = 'seed,solver,problem,calls,total-time,mean-time,max-time,mean-nodes,max-nodes,mean-iterations,limit-hits,mean-improvement\n'
+
+SolverCall = namedtuple('SolverCall', ['solver', 'problem', 'nodes', 'wall_time', 'objective_before', 'objective_after', 'iterations', 'limit_hit'])
+
+
+def _field(value):
+    return '' if value is None else str(value)
+
+
+class Telemetry:
+    """
+    The solver calls made since the records were last taken.  Calls can come from any thread (e.g., asynchronous or
+    parallel planning).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._calls = []
+        self._lock = threading.Lock()
+
+    def record(self, solver, problem, nodes, wall_time, objective_before=None, objective_after=None, iterations=None, limit_hit=False):
+        """
+        Add a solver call (if telemetry is enabled)
+
+        Args:
+            solver (str): what solved the problem, e.g., lkh, lkh-cache, local, alns
+            problem (str): the kind of problem, e.g., TSP, ATSP, TRP
+            nodes (int): the size of the problem
+            wall_time (float): how long the call took (s)
+            objective_before (float, optional): the cost of the starting tour, if there was one. Defaults to None.
+            objective_after (float, optional): the cost of the tour found. Defaults to None.
+            iterations (int, optional): the iterations made, where the solver counts them. Defaults to None.
+            limit_hit (bool, optional): whether the solver stopped at its time (or iteration) limit. Defaults to False.
+        """
+        if not self.enabled:
+            return
+        call = SolverCall(solver, problem, nodes, wall_time, objective_before, objective_after, iterations, bool(limit_hit))
+        with self._lock:
+            self._calls.append(call)
+
+    def take(self):
+        """
+        The calls recorded so far -- the records are cleared
+        """
+        with self._lock:
+            calls, self._calls = self._calls, []
+        return calls
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    """
+    The telemetry shared by all the solver calls in this process
+    """
+    return _telemetry
+
+
+def telemetry_rows(seed, calls):
+    """
+    CSV rows (see TELEMETRY_HEADER) for the calls made in a run
+    """
+    return ''.join(f"{seed},{call.solver},{call.problem},{call.nodes},{call.wall_time:.6f},{_field(call.objective_before)},"
+                   f"{_field(call.objective_after)},{_field(call.iterations)},{int(call.limit_hit)}\n" for call in calls)
+
+
+def summary_rows(seed, calls):
+    """
+    CSV rows (see TELEMETRY_SUMMARY_HEADER) summing up the calls made in a run, for each solver and kind of problem.
+    The improvement is the fraction of the starting cost saved, over the calls that had a starting tour.
+    """
+    groups = {}
+    for call in calls:
+        groups.setdefault((call.solver, call.problem), []).append(call)
+
+    rows = []
+    for (solver, problem), group in sorted(groups.items()):
+        times = np.array([call.wall_time for call in group])
+        nodes = np.array([call.nodes for call in group])
+        iterations = [call.iterations for call in group if call.iterations is not None]
+        improvements = [(call.objective_before - call.objective_after) / call.objective_before for call in group
+                        if call.objective_before and call.objective_after is not None]
+        rows.append(f"{seed},{solver},{problem},{len(group)},{times.sum():.6f},{times.mean():.6f},{times.max():.6f},"
+                    f"{nodes.mean():.2f},{nodes.max()},{_field(np.mean(iterations) if len(iterations) else None)},"
+                    f"{sum(call.limit_hit for call in group)},{_field(np.mean(improvements) if len(improvements) else None)}\n")
+    return ''.join(rows)
@@ -0,0 +1,49 @@
+import sys
+from os import path
+
+import pytest
+
+# the scripts import each other as top-level modules (from config import ..., from policies.util import ...)
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+
+class Deliveries:
+    """stands in for the DeliveryLog -- keeps when each task was serviced
+    """
+
+    def __init__(self):
+        self.serviced = []
+
+    def record(self, task):
+        self.serviced.append((task.id, task.time_serviced))
+
+
+@pytest.fixture
+def run():
+    """a whole simulation, run headless through main.simulate() with the built-in local search standing in for LKH --
+    returns the simulation and the (task id, service time) of each delivery
+    """
+    from main import build_argparser, simulate
+
+    def run(*argv, event_trace=None):
+        args = build_argparser().parse_args(['--solver', 'local', '--seed', '3', '--lambd', '1', '--max-tasks', '40',
+                                             '--total-tasks', '50', '--max-solver-time', '0.02'] + list(argv))
+        deliveries = Deliveries()
+        sim = simulate(args, deliveries, event_trace)
+        return sim, deliveries.serviced
+
+    return run
+
+
+@pytest.fixture
+def telemetry():
+    """the solver telemetry, collected for the test only
+    """
+    from telemetry import get_telemetry
+
+    telemetry = get_telemetry()
+    telemetry.take()
+    telemetry.enabled = True
+    yield telemetry
+    telemetry.enabled = False
+    telemetry.take()
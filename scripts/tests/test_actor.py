@@ -0,0 +1,57 @@
+'''
+The actor's kinematic state lives in its fleet slot, and its position along a detailed path comes from the path's profile
+'''
+from math import atan2, hypot
+
+import pytest
+
+from actor import Actor, Fleet, PathProfile
+
+
+def test_pos_is_read_only():
+    actor = Actor(pos=[0.25, 0.75])
+    assert actor.pos == (0.25, 0.75)
+    with pytest.raises(TypeError):
+        actor.pos[0] = 0.5
+
+    # moving the actor is an assignment
+    actor.pos = [0.5, 0.5]
+    assert actor.pos == (0.5, 0.5)
+
+
+def test_speed_is_kept_in_the_fleet():
+    fleet = Fleet()
+    actors = [Actor(id=_i, pos=[0, 0], speed=1.0 + _i, fleet=fleet) for _i in range(3)]
+    assert [actor.speed for actor in actors] == [1.0, 2.0, 3.0]
+
+    actors[1].speed = 5.0
+    assert fleet.speed[actors[1].slot] == 5.0
+    fleet.speed[actors[2].slot] = 0.5
+    assert actors[2].speed == 0.5
+
+
+def walk(points, distance):
+    # step along the path one segment at a time, as the actor used to
+    for start, end in zip(points[:-1], points[1:]):
+        length = hypot(end[0] - start[0], end[1] - start[1])
+        if distance < length:
+            ratio = distance / length
+            pos = [round(start[0] + (end[0] - start[0]) * ratio, 5), round(start[1] + (end[1] - start[1]) * ratio, 5)]
+            return pos, atan2(end[1] - start[1], end[0] - start[0])
+        distance -= length
+    return None
+
+
+def test_path_profile_locates_like_a_walk():
+    points = [(0, 0), (0.3, 0), (0.3, 0.4), (0.3, 0.4), (0.1, 0.9)]
+    profile = PathProfile(points)
+    assert profile.total_distance == pytest.approx(0.3 + 0.4 + hypot(0.2, 0.5))
+
+    for _i in range(100):
+        distance = profile.total_distance * _i / 100
+        pos, heading = profile.locate(distance)
+        expected_pos, expected_heading = walk(points, distance)
+        assert pos == pytest.approx(expected_pos, abs=1e-5)
+        assert heading == pytest.approx(expected_heading)
+
+    assert profile.locate(profile.total_distance + 0.01) is None
@@ -0,0 +1,120 @@
+'''
+The ALNS objectives price insertions and removals without building the candidate tours -- check them against
+building the candidates and pricing them in full, and the routes themselves against pricing them one stop at a time
+'''
+import numpy as np
+import pytest
+
+from policies.alns import Objective, DistanceObjective, WaitObjective
+from policies.util import insertion_costs, removal_gains, wait_costs
+
+
+def random_problem(nodes, seed):
+    rng = np.random.default_rng(seed)
+    locations = rng.random((nodes, 2))
+    distance_matrix = np.sqrt(((locations[:, np.newaxis, :] - locations[np.newaxis, :, :]) ** 2).sum(axis=2))
+    offsets = rng.random(nodes) * 0.5
+    return distance_matrix, offsets
+
+
+def brute_insertion_costs(objective, routes, vertex):
+    costs = []
+    for route in routes:
+        base = objective.costs([route, ])[0]
+        for _i in range(len(route)):
+            costs.append(objective.costs([route[:_i + 1] + [vertex, ] + route[_i + 1:], ])[0] - base)
+    return np.array(costs)
+
+
+EXPONENTS = [1, 2, 3, 1.5, 2.5, 0.5]
+
+
+def loop_wait_cost(route, distance_matrix, offsets, service_time, cost_exponent, skip_first):
+    # one stop at a time, as the policies used to price their tours
+    cost = 0
+    arrival = 0
+    for _i in range(len(route)):
+        if _i:
+            arrival += distance_matrix[route[_i - 1], route[_i]] + service_time
+        if not cost_exponent:
+            continue
+        if _i or not skip_first:
+            cost += (arrival + offsets[route[_i]]) ** cost_exponent
+    return arrival if not cost_exponent else cost
+
+
+@pytest.mark.parametrize('cost_exponent', [0, ] + EXPONENTS)
+@pytest.mark.parametrize('skip_first', [True, False])
+@pytest.mark.parametrize('seed', range(5))
+def test_wait_costs(cost_exponent, skip_first, seed):
+    distance_matrix, offsets = random_problem(12, seed)
+    routes = [[0, 4, 9, 6], [1, ], [2, 3, 10, 5, 8, 7, 11]]
+
+    costs = wait_costs(routes, distance_matrix, offsets, 0.3, cost_exponent, skip_first=skip_first)
+    expected = [loop_wait_cost(route, distance_matrix, offsets, 0.3, cost_exponent, skip_first) for route in routes]
+    assert np.allclose(costs, expected)
+
+
+@pytest.mark.parametrize('cost_exponent', [0, ] + EXPONENTS)
+@pytest.mark.parametrize('seed', range(5))
+def test_tour_insertion_costs(cost_exponent, seed):
+    distance_matrix, offsets = random_problem(9, seed)
+    tour = [0, 3, 5, 1, 7, 2, 6, 4]
+    costs = insertion_costs(tour, 8, distance_matrix, offsets, service_time=0.3, cost_exponent=cost_exponent)
+
+    base = wait_costs([tour, ], distance_matrix, offsets, 0.3, cost_exponent)[0]
+    expected = [wait_costs([tour[:_i] + [8, ] + tour[_i:], ], distance_matrix, offsets, 0.3, cost_exponent)[0] - base
+                for _i in range(1, len(tour) + 1)]
+    assert not np.isnan(costs).any()
+    assert np.allclose(costs, expected)
+
+
+@pytest.mark.parametrize('cost_exponent', [0, ] + EXPONENTS)
+@pytest.mark.parametrize('seed', range(5))
+def test_tour_removal_gains(cost_exponent, seed):
+    distance_matrix, offsets = random_problem(8, seed)
+    tour = [0, 3, 5, 1, 7, 2, 6, 4]
+    gains = removal_gains(tour, distance_matrix, offsets, service_time=0.3, cost_exponent=cost_exponent)
+
+    base = wait_costs([tour, ], distance_matrix, offsets, 0.3, cost_exponent)[0]
+    expected = [base - wait_costs([tour[:_i] + tour[_i + 1:], ], distance_matrix, offsets, 0.3, cost_exponent)[0]
+                for _i in range(1, len(tour))]
+    assert not np.isnan(gains).any()
+    assert np.allclose(gains, expected)
+
+
+def objectives(distance_matrix, offsets):
+    yield DistanceObjective(distance_matrix)
+    for cost_exponent in EXPONENTS:
+        for skip_first in (True, False):
+            yield WaitObjective(distance_matrix, offsets, 0.3, cost_exponent, skip_first=skip_first)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_objective_insertion_costs(seed):
+    distance_matrix, offsets = random_problem(12, seed)
+    routes = [[0, 4, 9, 6], [1, ], [2, 3, 10, 5, 8, 7]]
+
+    for objective in objectives(distance_matrix, offsets):
+        assert np.allclose(objective.insertion_costs(routes, 11), brute_insertion_costs(objective, routes, 11))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_objective_removal_gains(seed):
+    distance_matrix, offsets = random_problem(12, seed)
+    routes = [[0, 4, 9, 6], [1, ], [2, 3, 10, 5, 8, 7]]
+
+    for objective in objectives(distance_matrix, offsets):
+        # the base class takes every stop out in turn and prices what is left
+        assert np.allclose(objective.removal_gains(routes), Objective.removal_gains(objective, routes))
+
+
+def test_objective_must_price_insertions():
+    # an objective that only prices whole routes is caught when made, not at the first insertion of a search
+    class Incomplete(Objective):
+        def costs(self, routes):
+            return wait_costs(routes, self.distance_matrix, None, cost_exponent=0)
+
+    distance_matrix, offsets = random_problem(4, 0)
+    with pytest.raises(TypeError):
+        Incomplete(distance_matrix)
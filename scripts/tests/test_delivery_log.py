@@ -0,0 +1,74 @@
+'''
+Delivery logs -- every format holds the same deliveries, and appending to a log never loses the runs already in it
+'''
+import numpy as np
+import pytest
+
+from delivery_log import DELIVERY_LOG_FORMATS, DeliveryLog, merge_delivery_logs, read_delivery_log
+from Task import Task
+
+
+@pytest.fixture(params=list(DELIVERY_LOG_FORMATS))
+def format(request):
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    return request.param
+
+
+def deliveries(first, count):
+    tasks = []
+    for id in range(first, first + count):
+        task = Task(id, (id / 100, 1 - id / 100), time=id, initial_wait=0.5)
+        task.time_serviced = id + 2.5
+        tasks.append(task)
+    return tasks
+
+
+def write_run(file_name, format, seed, tasks, append=False):
+    log = DeliveryLog(file_name, format=format, append=append)
+    log.start_run(seed=seed)
+    for task in tasks:
+        log.record(task)
+    log.end_run()
+    log.close()
+
+
+def test_formats_hold_the_deliveries(tmp_path, format):
+    file_name = str(tmp_path / f'log.{format}')
+    write_run(file_name, format, 1, deliveries(0, 5))
+
+    frame = read_delivery_log(file_name)
+    assert list(frame['id']) == list(range(5))
+    assert np.allclose(frame['t_service'] - frame['t_arrive'], 2.5)
+    assert np.allclose(frame['t_initial'], 0.5)
+
+
+def test_append_keeps_earlier_runs(tmp_path, format):
+    file_name = str(tmp_path / f'log.{format}')
+    write_run(file_name, format, 1, deliveries(0, 5))
+
+    log = DeliveryLog(file_name, format=format, append=True)
+    log.start_run(seed=2)
+    for task in deliveries(5, 3):
+        log.record(task)
+    log.end_run()
+    if format != 'csv':
+        # a run that dies before the log is closed leaves the log as it was
+        assert list(read_delivery_log(file_name)['id']) == list(range(5))
+    log.close()
+
+    assert list(read_delivery_log(file_name)['id']) == list(range(8))
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f'log.{format}']
+
+
+def test_merge_appends(tmp_path, format):
+    parts = [str(tmp_path / f'part{_i}.{format}') for _i in range(3)]
+    for _i, part in enumerate(parts):
+        write_run(part, format, _i, deliveries(_i * 4, 4))
+
+    merged = str(tmp_path / f'merged.{format}')
+    merge_delivery_logs(parts[:2], merged, format=format)
+    merge_delivery_logs(parts[2:], merged, format=format, append=True)
+
+    assert list(read_delivery_log(merged)['id']) == list(range(12))
+    assert not list(tmp_path.glob('*.tmp'))
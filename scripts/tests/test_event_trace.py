@@ -0,0 +1,38 @@
+'''
+The binary event trace holds every arrival and service of a run, in order
+'''
+import numpy as np
+
+from event_trace import EventTrace, read_event_trace, RUN_STARTED, TASK_ARRIVED, ACTOR_ARRIVED, SERVICE_DONE
+
+
+def test_trace_round_trip(tmp_path):
+    file_name = str(tmp_path / 'trace.bin')
+    trace = EventTrace(file_name)
+    trace.write(RUN_STARTED, 0, task_id=7)
+    trace.write(TASK_ARRIVED, 1.5, task_id=3, location=(0.25, 0.75))
+    trace.write(SERVICE_DONE, 2.25, actor_id=1, task_id=3, location=(0.25, 0.75))
+    trace.close()
+
+    records = read_event_trace(file_name)
+    assert list(records['event']) == [RUN_STARTED, TASK_ARRIVED, SERVICE_DONE]
+    assert list(records['task']) == [7, 3, 3]
+    assert list(records['actor']) == [-1, -1, 1]
+    assert np.allclose(records['time'], [0, 1.5, 2.25])
+    assert np.allclose(records['x'][1:], 0.25) and np.allclose(records['y'][1:], 0.75)
+
+
+def test_run_trace(run, tmp_path):
+    file_name = str(tmp_path / 'trace.bin')
+    trace = EventTrace(file_name)
+    sim, serviced = run('--policy', 'lkh_batch_tsp', event_trace=trace)
+    trace.close()
+
+    records = read_event_trace(file_name)
+    arrived = records[records['event'] == TASK_ARRIVED]
+    done = records[records['event'] == SERVICE_DONE]
+    assert list(arrived['task']) == [task.id for task in sim.task_list[:sim.next_task]]
+    assert list(done['task']) == [id for id, _ in serviced]
+    assert np.allclose(done['time'], [time for _, time in serviced])
+    assert (records['event'] == ACTOR_ARRIVED).sum() >= len(serviced)
+    assert np.all(np.diff(records['time']) > -1e-9)
@@ -0,0 +1,123 @@
+'''
+Building the solver calls -- warm starts from the previous tour and the search effort for each problem -- checked with
+the built-in local search standing in for LKH
+'''
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+import lkh_interface
+from lkh_interface import insertion_tour, warm_start_tour, solve_tsp
+from local_search import tour_length
+from telemetry import get_telemetry
+from Task import TaskStore
+
+
+def random_tasks(count, seed, first_id=100):
+    rng = np.random.default_rng(seed)
+    store = TaskStore()
+    for id in range(first_id, first_id + count):
+        store.add(id=id, location=tuple(rng.random(2)), time=0)
+    return store.tasks()
+
+
+def costs_of(start_pos, tasks):
+    coords = np.array([start_pos, ] + [task.location for task in tasks])
+    return np.sqrt(((coords[:, np.newaxis, :] - coords[np.newaxis, :, :]) ** 2).sum(axis=2))
+
+
+@pytest.fixture
+def local_solver():
+    lkh_interface.configure_solver('local')
+    yield
+    lkh_interface.configure_solver('auto')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_insertion_tour(seed):
+    costs = costs_of((0.5, 0.5), random_tasks(5, seed))
+    tour = insertion_tour(costs, (0, 3))
+    assert tour[:1] == [0, ] and sorted(tour) == list(range(6))
+
+    # each node went in where it was cheapest at the time, so a tiny problem is close to the best tour
+    best = min(tour_length([0, ] + list(rest), costs) for rest in permutations(range(1, 6)))
+    assert tour_length(tour, costs) <= 1.5 * best
+
+
+def test_warm_start_keeps_the_previous_order():
+    tasks = random_tasks(6, 0)
+    previous = [tasks[4], tasks[1], tasks[5], tasks[2]]
+
+    # one of the previous tasks has been serviced, and two have arrived since
+    problem = [task for task in tasks if task is not tasks[5]]
+    tour, inserted = warm_start_tour(problem, previous, costs_of((0.5, 0.5), problem))
+
+    assert inserted == 2
+    assert tour[0] == 1 and sorted(tour) == list(range(1, len(problem) + 2))
+    nodes = {task.id: node for node, task in enumerate(problem, start=2)}
+    kept = [node for node in tour if node in (nodes[tasks[4].id], nodes[tasks[1].id], nodes[tasks[2].id])]
+    assert kept == [nodes[tasks[4].id], nodes[tasks[1].id], nodes[tasks[2].id]]
+
+
+def test_warm_started_solve(local_solver):
+    tasks = random_tasks(12, 1)
+    telemetry = get_telemetry()
+    telemetry.enabled = True
+    telemetry.take()
+    try:
+        (first, ) = solve_tsp('test', 'cold', (0.5, 0.5), tasks, scale_factor=1000.0)
+        previous = [tasks[node - 2] for node in first if node > 1]
+        (second, ) = solve_tsp('test', 'warm', (0.5, 0.5), tasks + random_tasks(2, 2, first_id=200), scale_factor=1000.0,
+                               initial_tour=previous)
+        cold, warm = telemetry.take()
+    finally:
+        telemetry.enabled = False
+
+    assert sorted(second) == list(range(1, 16))
+    # only the warm start has a tour to start from, and the search doesn't make it worse
+    assert cold.objective_before is None
+    assert warm.objective_after <= warm.objective_before
+
+
+def test_effort_grows_with_the_problem():
+    small = lkh_interface.solver_effort(4, max_trials=10000, runs=5)
+    large = lkh_interface.solver_effort(60, max_trials=10000, runs=5)
+    assert small == {'max_trials': lkh_interface.SOLVER_MIN_TRIALS, 'runs': 1}
+    assert large['max_trials'] > small['max_trials'] and large['runs'] > small['runs']
+
+
+def test_effort_is_capped():
+    effort = lkh_interface.solver_effort(100000, max_trials=10000, runs=5, time_limit=2.5)
+    assert effort == {'max_trials': 10000, 'runs': 5, 'time_limit': 2.5}
+
+
+class RecordingDispatcher:
+    """takes the place of the LKH dispatcher, keeping the parameters of each solve
+    """
+
+    def __init__(self):
+        self.solves = []
+
+    def solve(self, problem, dimension, depots=(), initial_tour=None, **params):
+        self.solves.append((initial_tour is not None, params))
+        return [list(range(1, dimension + 1)), ]
+
+
+def test_warm_start_effort(monkeypatch):
+    # a warm start with few new nodes makes a single, shorter run -- with most of the nodes new it starts over
+    dispatcher = RecordingDispatcher()
+    monkeypatch.setattr(lkh_interface, '_use_local_search', lambda: False)
+    monkeypatch.setattr(lkh_interface, 'get_solver_dispatcher', lambda solver: dispatcher)
+
+    tasks = random_tasks(40, 3)
+    costs = costs_of((0.5, 0.5), tasks)
+    for previous in (tasks[:38], tasks[:10], None):
+        lkh_interface._solve(f'problem {len(dispatcher.solves)}', 41, max_trials=10000, runs=5, tasks=tasks, initial_tour=previous,
+                             distances=costs)
+
+    (warm, few), (cold, many), (none, scratch) = dispatcher.solves
+    assert warm and few['runs'] == lkh_interface.WARM_START_RUNS
+    assert few['max_trials'] == lkh_interface.WARM_START_MIN_TRIALS + 2 * lkh_interface.WARM_START_TRIALS_PER_NODE
+    assert not cold and not none
+    assert many == scratch == lkh_interface.solver_effort(41, 10000, 5)
@@ -0,0 +1,132 @@
+'''
+The built-in tour search returns valid tours, solves the small problems exactly, and never does worse than the tour
+it starts from
+'''
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from config import LOCAL_SEARCH_EXACT_NODES
+from local_search import (nearest_neighbour_tour, tour_length, latency_costs, insert_latency, improve_latency, solve_tsp,
+                          solve_trp)
+
+
+def random_costs(n, seed, symmetric=True):
+    rng = np.random.default_rng(seed)
+    if not symmetric:
+        return rng.random((n, n)) * (1 - np.eye(n))
+    points = rng.random((n, 2))
+    return np.sqrt(((points[:, np.newaxis, :] - points[np.newaxis, :, :]) ** 2).sum(axis=2))
+
+
+def random_waits(n, seed):
+    rng = np.random.default_rng(seed + 1000)
+    return rng.random(n) * 0.1, rng.random(n)
+
+
+def loop_latency_cost(path, costs, service_times, waits, exponent=1):
+    total = 0
+    served = 0
+    for prev, node in zip(path[:-1], path[1:]):
+        served += costs[prev, node] + service_times[node]
+        total += (served + waits[node]) ** exponent
+    return total
+
+
+def is_tour(tour, n):
+    return tour[0] == 0 and sorted(tour) == list(range(n))
+
+
+def test_tour_length():
+    # the unit square, around and then across
+    points = np.array([(0, 0), (1, 0), (1, 1), (0, 1)])
+    costs = np.sqrt(((points[:, np.newaxis, :] - points[np.newaxis, :, :]) ** 2).sum(axis=2))
+    assert tour_length([0, 1, 2, 3], costs) == pytest.approx(4)
+    assert tour_length([0, 2, 1, 3], costs) == pytest.approx(2 + 2 * np.sqrt(2))
+
+
+@pytest.mark.parametrize('exponent', [1, 2])
+@pytest.mark.parametrize('seed', range(3))
+def test_latency_costs(seed, exponent):
+    n = 7
+    costs = random_costs(n, seed)
+    service_times, waits = random_waits(n, seed)
+    rng = np.random.default_rng(seed)
+    paths = np.array([[0] + list(rng.permutation(np.arange(1, n))) for _ in range(4)])
+
+    expected = [loop_latency_cost(path, costs, service_times, waits, exponent) for path in paths]
+    assert latency_costs(paths, costs, service_times, waits, exponent) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('symmetric', [True, False])
+@pytest.mark.parametrize('seed', range(3))
+def test_small_tsp_is_exact(seed, symmetric):
+    n = LOCAL_SEARCH_EXACT_NODES
+    costs = random_costs(n, seed, symmetric)
+    best = min(tour_length((0, ) + rest, costs) for rest in permutations(range(1, n)))
+
+    tour = solve_tsp(costs)
+    assert is_tour(tour, n)
+    assert tour_length(tour, costs) == pytest.approx(best)
+
+
+@pytest.mark.parametrize('symmetric', [True, False])
+@pytest.mark.parametrize('seed', range(3))
+def test_tsp_improves_on_its_start(seed, symmetric):
+    n = 40
+    costs = random_costs(n, seed, symmetric)
+
+    tour = solve_tsp(costs)
+    assert is_tour(tour, n)
+    assert tour_length(tour, costs) <= tour_length(nearest_neighbour_tour(costs), costs) + 1e-9
+
+    # ... or from a given tour
+    start = [0] + list(np.random.default_rng(seed).permutation(np.arange(1, n)))
+    tour = solve_tsp(costs, tour=start)
+    assert is_tour(tour, n)
+    assert tour_length(tour, costs) < tour_length(start, costs)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_small_trp_is_exact(seed):
+    n = LOCAL_SEARCH_EXACT_NODES
+    costs = random_costs(n, seed)
+    service_times, waits = random_waits(n, seed)
+    best = min(loop_latency_cost((0, ) + rest, costs, service_times, waits) for rest in permutations(range(1, n)))
+
+    path = solve_trp(costs, service_times, waits)
+    assert is_tour(path, n)
+    assert loop_latency_cost(path, costs, service_times, waits) == pytest.approx(best)
+
+
+@pytest.mark.parametrize('exponent', [1, 2])
+@pytest.mark.parametrize('seed', range(3))
+def test_trp_improves_on_its_start(seed, exponent):
+    n = 40
+    costs = random_costs(n, seed)
+    service_times, waits = random_waits(n, seed)
+
+    def cost(path):
+        return loop_latency_cost(path, costs, service_times, waits, exponent)
+
+    path = solve_trp(costs, service_times, waits, exponent)
+    assert is_tour(path, n)
+    assert cost(path) <= cost(nearest_neighbour_tour(costs)) + 1e-9
+
+    start = [0] + list(np.random.default_rng(seed).permutation(np.arange(1, n)))
+    path, path_cost = improve_latency(start, costs, service_times, waits, exponent)
+    assert is_tour(path, n)
+    assert path_cost == pytest.approx(cost(path))
+    assert path_cost < cost(start)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_insert_latency(seed):
+    n = 12
+    costs = random_costs(n, seed)
+    service_times, waits = random_waits(n, seed)
+
+    path, path_cost = insert_latency([0, 1, 2], range(3, n), costs, service_times, waits)
+    assert is_tour(path, n)
+    assert path_cost == pytest.approx(loop_latency_cost(path, costs, service_times, waits))
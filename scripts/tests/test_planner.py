@@ -0,0 +1,54 @@
+'''
+Solving the actors' plans concurrently hands each actor the same tour as planning for one actor after another
+'''
+import numpy as np
+import pytest
+
+import lkh_interface
+from actor import Actor
+from planner import ParallelPlanner, supports_planning
+from policies.lkh_batch_tsp_policy import get_policy
+from Task import TaskStore
+
+
+@pytest.fixture
+def local_solver():
+    lkh_interface.configure_solver('local')
+    yield
+    lkh_interface.configure_solver('auto')
+
+
+def actors_with_tasks(seed, count=3):
+    # one actor per cluster -- each with its own tasks, as on a map
+    rng = np.random.default_rng(seed)
+    store = TaskStore()
+    actors = [Actor(id=i + 1, pos=tuple(rng.random(2)), cluster_id=i) for i in range(count)]
+    for i in range(count):
+        for j in range(8):
+            store.add(id=100 * (i + 1) + j, location=tuple(rng.random(2)), time=0, cluster_id=i)
+    tasks = store.tasks()
+    return [(actor, tasks[8 * i:8 * (i + 1)]) for i, actor in enumerate(actors)]
+
+
+def paths(actor_tasks):
+    return [[task.id for task, _ in actor.path] for actor, _ in actor_tasks]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_parallel_planning_matches_sequential(local_solver, seed):
+    policy = get_policy({'max_solver_time': 0.02})
+    assert supports_planning(policy)
+
+    sequential = actors_with_tasks(seed)
+    for actor, tasks in sequential:
+        policy(actor, tasks, None, 0)
+
+    parallel = actors_with_tasks(seed)
+    planner = ParallelPlanner(policy, workers=3)
+    try:
+        planner.plan(parallel, field=None, current_time=0)
+    finally:
+        planner.close()
+
+    assert all(len(path) for path in paths(parallel))
+    assert paths(parallel) == paths(sequential)
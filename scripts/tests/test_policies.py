@@ -0,0 +1,69 @@
+'''
+Every policy module imports, and the policies the simulation can load hand it a policy function that runs
+'''
+from glob import glob
+from importlib import import_module
+from os import path
+
+import pytest
+
+ALNS_POLICIES = ['tsp', 'batch_tsp', 'batch_tsp_alpha', 'batch_wait_tsp', 'quad_wait_tsp', 'hybrid', 'weighted_tsp', 'mod_tsp']
+
+# the policies the README describes, and the ALNS policies
+POLICIES = ['lkh_batch_tsp', 'lkh_batch_trp', 'lkh_cont_trp'] + ALNS_POLICIES
+
+POLICY_MODULES = sorted(path.basename(name)[:-3] for name in glob(path.join(path.dirname(path.dirname(__file__)), 'policies', '*_policy.py')))
+
+
+def test_modules_found():
+    assert {policy + '_policy' for policy in POLICIES} <= set(POLICY_MODULES)
+
+
+@pytest.mark.parametrize('module', POLICY_MODULES)
+def test_policy_module_imports(module):
+    import_module('policies.' + module)
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+def test_get_policy(policy):
+    module = import_module('policies.' + policy + '_policy')
+    assert callable(module.get_policy({'max_solver_time': 1}))
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+def test_policy_runs(run, policy):
+    sim, serviced = run('--policy', policy)
+    assert len(serviced) == 40
+    assert len({id for id, _ in serviced}) == 40
+
+
+@pytest.mark.parametrize('policy', ALNS_POLICIES)
+def test_alns_policy_shares_tasks(run, policy):
+    # the actors sharing the tasks are planned for together, so they all get some of them
+    sim, serviced = run('--policy', policy, '--actors', '3', '--max-solver-time', '0.002')
+    assert len({id for id, _ in serviced}) == 40
+    assert all(actor.travel_dist > 0 for actor in sim.actor_list)
+
+
+def test_eta_leaves_no_task_behind(run):
+    # with eta < 1 each actor only takes on part of its tour -- the rest has to stay up for the next plan, rather than
+    # being left assigned to an actor that isn't going to service it
+    sim, serviced = run('--policy', 'tsp', '--eta', '0.5', '--max-time', '60')
+
+    on_path = {task.id for actor in sim.actor_list for task, _ in actor.path}
+    arrived = sim.task_list[:sim.next_task]
+    assert len(serviced) > 0
+    assert all(task.is_waiting() or task.id in on_path for task in arrived if task.is_pending())
+
+
+@pytest.mark.parametrize('refresh', [1, 100])
+def test_incremental_replan_runs(run, telemetry, refresh):
+    sim, serviced = run('--policy', 'lkh_cont_trp', '--incremental-replan', '--replan-refresh', str(refresh))
+    assert len(serviced) == 40
+    assert len({id for id, _ in serviced}) == 40
+
+    # the new tasks were folded into the routes -- with a full replan after every incremental one, when those are due
+    solvers = [call.solver for call in telemetry.take()]
+    assert 'incremental' in solvers
+    if refresh == 1:
+        assert 'local' in solvers
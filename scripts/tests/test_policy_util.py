@@ -0,0 +1,99 @@
+'''
+The policies' shared helpers: folding new tasks into an actor's route, and rolling back the changes to the ALNS tours
+'''
+from copy import deepcopy
+from random import Random
+
+import numpy as np
+import pytest
+
+from local_search import latency_costs
+from policies.util import incremental_tour, location_distances, TourState
+from Task import TaskStore
+
+
+def random_tasks(count, seed, first_id=100):
+    rng = np.random.default_rng(seed)
+    store = TaskStore()
+    for id in range(first_id, first_id + count):
+        store.add(id=id, location=tuple(rng.random(2)), time=rng.random())
+    return store.tasks()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_tour_covers_the_tasks(seed):
+    tasks = random_tasks(10, seed)
+    route = tasks[6::-2]
+    distances = location_distances((0.5, 0.5), tasks)
+
+    tour = incremental_tour(route, tasks, distances, current_time=2, threshold=np.inf)
+
+    # the actor first, then every task once
+    assert tour[0] == 1
+    assert sorted(tour) == list(range(1, len(tasks) + 2))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_tour_asks_for_a_replan(seed):
+    tasks = random_tasks(10, seed)
+    distances = location_distances((0.5, 0.5), tasks)
+
+    # with nothing to build on, and when any improvement is too much
+    assert incremental_tour([], tasks, distances, current_time=2) is None
+    assert incremental_tour(tasks[:3], tasks, distances, current_time=2, threshold=-1) is None
+
+
+def test_incremental_tour_on_the_best_route():
+    # tasks along a line, all waiting as long -- the route in order along the line can't be improved on
+    store = TaskStore()
+    for id in range(5):
+        store.add(id=id, location=(0.1 * (id + 1), 0.5), time=0)
+    tasks = store.tasks()
+    distances = location_distances((0, 0.5), tasks)
+
+    tour = incremental_tour(tasks[:3], tasks, distances, current_time=1)
+    assert tour == [1, 2, 3, 4, 5, 6]
+
+    path = np.array(tour) - 1
+    waits = np.array([0, ] + [1, ] * len(tasks), dtype=np.float64)
+    assert latency_costs(path, distances, np.zeros(len(tasks) + 1), waits)[0] == pytest.approx(5 + 1.5)
+
+
+def random_changes(state, rng, count):
+    # destroy and repair steps -- a vertex taken from one tour and put into another (or the same) one
+    for _ in range(count):
+        source = rng.choice([actor for actor, tour in state.tours.items() if len(tour) > 1])
+        vertex = state.remove(source, rng.randrange(1, len(state.tours[source])))
+        target = rng.choice(list(state.tours))
+        state.insert(target, rng.randrange(1, len(state.tours[target]) + 2), vertex)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_tour_state_undo(seed):
+    rng = Random(seed)
+    state = TourState({1: [0, 3, 4, 5], 2: [1, 6, 7], 3: [2, 8]})
+    incumbent = deepcopy(state.tours)
+
+    # a rejected candidate is rolled back to the incumbent
+    random_changes(state, rng, 10)
+    state.undo()
+    assert state.tours == incumbent
+
+    # an accepted one is kept, and becomes what the next rejection rolls back to
+    random_changes(state, rng, 10)
+    accepted = deepcopy(state.tours)
+    state.commit()
+    random_changes(state, rng, 10)
+    state.undo()
+    assert state.tours == accepted
+    assert sorted(sum(state.tours.values(), [])) == list(range(9))
+
+
+def test_tour_state_insert_past_the_end():
+    state = TourState({1: [0, 2], 2: [1]})
+    state.insert(2, 5, state.remove(1, 1))
+    assert state.tours == {1: [0], 2: [1, 2]}
+
+    state.undo()
+    assert state.tours == {1: [0, 2], 2: [1]}
+    assert len(state) == 2
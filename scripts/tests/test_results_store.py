@@ -0,0 +1,88 @@
+'''
+The results store and resuming a sweep from it
+'''
+import argparse
+import json
+from os import path
+
+from results_store import ResultsStore, run_key, key_id
+from main import build_argparser
+import sweep
+
+
+def args_for(**values):
+    args = argparse.Namespace(**{name: None for name in run_key(argparse.Namespace())})
+    for name, value in values.items():
+        setattr(args, name, value)
+    return args
+
+
+def test_key_id_is_stable():
+    key = run_key(args_for(policy='tsp', seed=1, lambd=0.5))
+    assert key_id(key) == key_id(dict(reversed(list(key.items()))))
+    assert key_id(key) != key_id(run_key(args_for(policy='tsp', seed=2, lambd=0.5)))
+
+
+def test_records_are_shared_and_newest_wins(tmp_path):
+    file_name = str(tmp_path / 'store.jsonl')
+    writer = ResultsStore(file_name)
+    reader = ResultsStore(file_name)
+    key = run_key(args_for(policy='tsp', seed=1))
+
+    assert reader.get(key) is None
+    writer.add(key, results='first\n')
+    assert reader.get(key)['results'] == 'first\n'
+    writer.add(key, results='second\n')
+    assert reader.get(key)['results'] == 'second\n'
+
+
+def test_partial_lines_are_skipped(tmp_path):
+    file_name = str(tmp_path / 'store.jsonl')
+    key = run_key(args_for(policy='tsp', seed=1))
+    ResultsStore(file_name).add(key, results='row\n')
+    with open(file_name, 'a') as fp:
+        # an interrupted append
+        fp.write(json.dumps({'id': 'x', 'results': 'partial'})[:10])
+
+    assert ResultsStore(file_name).get(key)['results'] == 'row\n'
+
+
+def run_sweep(*argv):
+    grid_args, remaining = sweep.build_grid_argparser().parse_known_args(
+        ['--policy', 'lkh_batch_tsp', '--lambd', '0.5', '--workers', '1'] + list(argv))
+    base_args = build_argparser().parse_args(['--solver', 'local', '--max-tasks', '10', '--total-tasks', '15',
+                                              '--max-solver-time', '0.02'] + remaining)
+    assert sweep.sweep(grid_args, base_args) == 0
+
+
+def delivery_rows(results_dir):
+    (log_name, ) = [name for name in results_dir.iterdir() if name.name.startswith('DeliveryLog_')]
+    with open(log_name) as fp:
+        return len(fp.readlines()) - 1
+
+
+def test_sweep_resumes_from_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results_dir = tmp_path / 'results'
+
+    run_sweep('--seed', '1', '2')
+    assert delivery_rows(results_dir) == 20
+    # the per-run logs are gone, the records point to the merged log
+    assert not path.exists(results_dir / 'sweep_jobs')
+
+    # the runs are made in worker processes -- tell what was run from what gets added to the store
+    store_name = results_dir / 'results_store.jsonl'
+    with open(store_name) as fp:
+        before = len(fp.readlines())
+
+    run_sweep('--seed', '1', '2', '3', '--resume')
+    assert delivery_rows(results_dir) == 30
+
+    with open(store_name) as fp:
+        records = [json.loads(line) for line in fp][before:]
+    # the new run, recorded once it finished and again once merged -- nothing for seeds 1 and 2
+    assert {record['key']['seed'] for record in records} == {3, }
+
+    (results_name, ) = [name for name in results_dir.iterdir() if name.name.startswith('lkh_batch_tsp')]
+    with open(results_name) as fp:
+        assert len(fp.readlines()) == 4
@@ -0,0 +1,64 @@
+'''
+Whole simulations -- event-driven mode against stepping every tick, asynchronous planning against planning in place,
+and headless runs
+'''
+import os
+import subprocess
+import sys
+from os import path
+
+import pytest
+
+
+@pytest.mark.parametrize('actors', [1, 3])
+def test_event_driven_matches_ticks(run, actors):
+    _, ticked = run('--policy', 'lkh_batch_tsp', '--actors', str(actors))
+    _, skipped = run('--policy', 'lkh_batch_tsp', '--actors', str(actors), '--event-driven')
+
+    # the same deliveries, in the same order -- positions are rounded once per skip rather than once per tick, so
+    # the service times can drift by a tick or so per leg
+    assert [id for id, _ in skipped] == [id for id, _ in ticked]
+    assert max(abs(a - b) for (_, a), (_, b) in zip(skipped, ticked)) < 0.05
+
+
+def test_async_without_latency_matches_sync(run):
+    # with a latency scale of 0 every plan is applied in the tick it was started, as if it were solved in place
+    _, synchronous = run('--policy', 'lkh_batch_tsp')
+    _, asynchronous = run('--policy', 'lkh_batch_tsp', '--async-planning', '--planning-latency-scale', '0')
+
+    assert asynchronous == synchronous
+
+
+def test_async_latency_is_charged(run):
+    # solve times are charged in simulated time, so the deliveries come later than when planning synchronously
+    _, synchronous = run('--policy', 'lkh_batch_tsp')
+    _, asynchronous = run('--policy', 'lkh_batch_tsp', '--async-planning', '--planning-latency-scale', '1000')
+
+    assert sum(time for _, time in asynchronous) > sum(time for _, time in synchronous)
+
+
+@pytest.mark.parametrize('actors', [1, 3])
+def test_pending_index_matches_task_list(run, actors):
+    # the pending index holds exactly the arrived, unserviced tasks, in order of arrival
+    sim, _ = run('--policy', 'lkh_batch_tsp', '--actors', str(actors), '--lambd', '10', '--max-time', '5')
+
+    arrived = sim.task_list[:sim.next_task]
+    assert any(task.is_pending() for task in arrived)
+    for actor in sim.actor_list:
+        assert [task.id for task in sim._get_cluster_tasks(actor)] == [task.id for task in arrived if task.is_pending()]
+
+
+HEADLESS_RUN = """
+import sys
+from main import build_argparser, simulate
+from conftest import Deliveries
+simulate(build_argparser().parse_args(['--policy', 'lkh_batch_tsp', '--solver', 'local', '--max-tasks', '10', '--total-tasks', '20']), Deliveries())
+print('pygame' in sys.modules)
+"""
+
+
+def test_headless_run_never_loads_pygame():
+    tests = path.dirname(path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', HEADLESS_RUN], cwd=path.dirname(tests), capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=tests), check=True)
+    assert result.stdout.splitlines()[-1] == 'False'
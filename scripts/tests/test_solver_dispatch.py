@@ -0,0 +1,69 @@
+'''
+Reading LKH's tours back, and dispatching LKH runs (where the LKH binary has been built)
+'''
+from os import path
+
+import pytest
+
+from solver_dispatch import SolverDispatcher, SolverError, read_tour, split_routes
+
+LKH = path.join(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))), 'thirdParty', 'lkh', 'LKH-3.0.7', 'LKH')
+
+SQUARE = '\n'.join([
+    'NAME: square',
+    'TYPE: TSP',
+    'DIMENSION: 5',
+    'EDGE_WEIGHT_TYPE: EUC_2D',
+    'NODE_COORD_SECTION',
+    '1 0 0',
+    '2 100 0',
+    '3 100 100',
+    '4 0 100',
+    '5 50 -30',
+    'EOF',
+])
+
+
+def test_read_tour(tmp_path):
+    file_name = tmp_path / 'tour'
+    file_name.write_text('NAME : tour\nTYPE : TOUR\nDIMENSION : 4\nTOUR_SECTION\n1\n3\n2\n4\n-1\nEOF\n')
+    assert read_tour(str(file_name)) == [1, 3, 2, 4]
+
+
+def test_split_routes():
+    # LKH-3 marks the extra depot visits with dummy nodes past the dimension
+    assert split_routes([1, 4, 2, 7, 3, 5, 8, 6], dimension=6, depots=(1, )) == [[4, 2], [3, 5], [6]]
+    assert split_routes([1, 2, 3], dimension=3) == [[1, 2, 3]]
+
+
+def test_missing_solver():
+    with pytest.raises(SolverError):
+        SolverDispatcher('no-such-solver')
+
+
+def test_failed_run():
+    dispatcher = SolverDispatcher('false')
+    try:
+        with pytest.raises(SolverError):
+            dispatcher.solve(SQUARE, 5, runs=1)
+    finally:
+        dispatcher.close()
+
+
+def same_cycle(tour, expected):
+    start = tour.index(expected[0])
+    rotated = tour[start:] + tour[:start]
+    return rotated == expected or rotated[:1] + rotated[:0:-1] == expected
+
+
+@pytest.mark.skipif(not path.exists(LKH), reason='LKH has not been built')
+def test_concurrent_solves():
+    dispatcher = SolverDispatcher(LKH, workers=2)
+    try:
+        futures = [dispatcher.submit(SQUARE, 5, runs=1, max_trials=10, seed=seed) for seed in range(1, 5)]
+        for future in futures:
+            (tour, ) = future.result()
+            assert same_cycle(tour, [1, 5, 2, 3, 4])
+    finally:
+        dispatcher.close()
+    assert not path.exists(dispatcher._scratch_root)
@@ -0,0 +1,54 @@
+'''
+The sweep grid, and sweeps against running each configuration with main.py --multipass
+'''
+from main import build_argparser, multiple_sims
+from config import DEFAULT_SEEDS
+import sweep
+
+BASE = ['--solver', 'local', '--max-tasks', '10', '--total-tasks', '15', '--max-solver-time', '0.02']
+
+
+def parse(*argv):
+    grid_args, remaining = sweep.build_grid_argparser().parse_known_args(list(argv))
+    return grid_args, build_argparser().parse_args(BASE + remaining)
+
+
+def test_grid():
+    grid_args, base_args = parse('--policy', 'lkh_batch_tsp', 'lkh_batch_trp', '--lambd', '0.5', '0.7', '--seed', '1', '2', '3',
+                                 '--eta', '0.5')
+    jobs = sweep.build_jobs(grid_args, base_args)
+
+    assert len(jobs) == 2 * 2 * 3
+    assert {(args.policy, args.lambd, args.seed) for args in jobs} == \
+        {(policy, lambd, seed) for policy in ('lkh_batch_tsp', 'lkh_batch_trp') for lambd in (0.5, 0.7) for seed in (1, 2, 3)}
+    # the unswept values are those of main.py
+    assert all(args.eta == 0.5 and args.sectors == base_args.sectors and args.max_tasks == 10 for args in jobs)
+
+
+def test_grid_seeds_default_to_the_multipass_seeds():
+    jobs = sweep.build_jobs(*parse('--policy', 'lkh_batch_tsp'))
+    assert [args.seed for args in jobs] == DEFAULT_SEEDS
+
+
+def results(directory):
+    files = {}
+    for name in (directory / 'results').iterdir():
+        if name.is_file() and name.name != 'results_store.jsonl':
+            files[name.name] = name.read_text()
+    return files
+
+
+def test_sweep_matches_multipass(tmp_path, monkeypatch):
+    for directory in ('sweep', 'multipass'):
+        (tmp_path / directory).mkdir()
+
+    monkeypatch.chdir(tmp_path / 'sweep')
+    assert sweep.sweep(*parse('--policy', 'lkh_batch_tsp', '--lambd', '0.5', '0.7', '--seed', '4', '--workers', '2')) == 0
+
+    monkeypatch.chdir(tmp_path / 'multipass')
+    for lambd in ('0.5', '0.7'):
+        multiple_sims(build_argparser().parse_args(BASE + ['--policy', 'lkh_batch_tsp', '--lambd', lambd, '--seed', '4']))
+
+    swept = results(tmp_path / 'sweep')
+    assert len(swept) == 4
+    assert swept == results(tmp_path / 'multipass')
@@ -0,0 +1,77 @@
+'''
+Tasks are views onto the rows of a TaskStore -- they read and write the store, and the store answers whole-set queries
+'''
+import pickle
+
+import numpy as np
+import pytest
+
+from Task import Task, TaskStore, ServiceState
+
+
+def store_of(count):
+    store = TaskStore(capacity=2)
+    for id in range(count):
+        store.add(id=id, location=(id / 10, 1 - id / 10), time=float(id), initial_wait=0.5, cluster_id=id % 3)
+    return store
+
+
+def test_store_grows():
+    store = store_of(9)
+    assert len(store) == 9
+    assert [task.id for task in store.tasks()] == list(range(9))
+    assert store.task(7).location == pytest.approx((0.7, 0.3))
+
+
+def test_task_writes_through():
+    store = store_of(4)
+    task = store.task(2)
+    task.service_state = ServiceState.SERVICED
+    task.time_serviced = 5.0
+
+    assert store.state[2] == ServiceState.SERVICED.value
+    assert store.task(2).wait_time() == 5.0 - 2.0 + 0.5
+    assert not task.is_pending()
+
+
+def test_masks():
+    store = store_of(9)
+    store.task(0).service_state = ServiceState.ASSIGNED
+    store.task(3).service_state = ServiceState.SERVICED
+    store.task(6).service_state = ServiceState.IN_SERVICE
+
+    assert list(np.flatnonzero(store.pending_mask(cluster_id=0))) == [0]
+    assert list(np.flatnonzero(store.waiting_mask(cluster_id=1, before=4))) == [1, 4]
+    assert list(np.flatnonzero(store.serviced_mask())) == [3]
+
+
+def test_subset_is_a_copy():
+    store = store_of(5)
+    subset = store.subset([4, 1])
+    assert [task.id for task in subset.tasks()] == [4, 1]
+
+    subset.task(0).service_state = ServiceState.SERVICED
+    assert store.task(4).is_waiting()
+
+
+def test_tasks_without_a_store():
+    task = Task(7, (0.25, 0.75), 3.0, cluster_id=None)
+    assert task.cluster_id is None
+    assert task.index is None
+    assert task.is_waiting()
+
+
+def test_pickled_tasks_share_their_store():
+    store = store_of(3)
+    tasks = pickle.loads(pickle.dumps(store.tasks()))
+    tasks[0].service_state = ServiceState.SERVICED
+    assert tasks[1].store is tasks[0].store
+    assert tasks[0].store.state[0] == ServiceState.SERVICED.value
+
+
+def test_tasks_pickled_before_the_store_load():
+    task = Task.__new__(Task)
+    task.__setstate__({'id': 4, 'location': (0.5, 0.5), 'time': 2.0, 'service_state': ServiceState.SERVICED, 'time_serviced': 3.0})
+    assert task.id == 4
+    assert task.service_state == ServiceState.SERVICED
+    assert task.wait_time() == 1.0
@@ -0,0 +1,92 @@
+'''
+The solver telemetry: what is recorded, how it is written out, and the files of a --solver-telemetry run
+'''
+from threading import Thread
+
+import pytest
+
+from main import build_argparser, multiple_sims
+from telemetry import Telemetry, SolverCall, telemetry_rows, summary_rows, TELEMETRY_HEADER, TELEMETRY_SUMMARY_HEADER
+
+
+def test_nothing_recorded_unless_enabled():
+    telemetry = Telemetry()
+    telemetry.record('local', 'TSP', 10, 0.5)
+    assert telemetry.take() == []
+
+    telemetry.enabled = True
+    telemetry.record('local', 'TSP', 10, 0.5, objective_before=2.0, objective_after=1.5, iterations=3, limit_hit=1)
+    assert telemetry.take() == [SolverCall('local', 'TSP', 10, 0.5, 2.0, 1.5, 3, True)]
+    # taken once only
+    assert telemetry.take() == []
+
+
+def test_record_from_threads():
+    telemetry = Telemetry()
+    telemetry.enabled = True
+
+    def record(thread):
+        for call in range(200):
+            telemetry.record('lkh', 'TSP', thread, call)
+
+    threads = [Thread(target=record, args=(thread, )) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    calls = telemetry.take()
+    assert sorted((call.nodes, call.wall_time) for call in calls) == [(thread, call) for thread in range(4) for call in range(200)]
+
+
+def test_telemetry_rows():
+    calls = [SolverCall('lkh', 'TSP', 12, 0.25, 4.0, 3.0, None, False), SolverCall('alns', 'TSP', 5, 0.125, None, 2.0, 50, True)]
+    rows = telemetry_rows(7, calls).splitlines()
+
+    assert rows == ['7,lkh,TSP,12,0.250000,4.0,3.0,,0', '7,alns,TSP,5,0.125000,,2.0,50,1']
+    assert all(len(row.split(',')) == len(TELEMETRY_HEADER.split(',')) for row in rows)
+
+
+def test_summary_rows():
+    calls = [
+        SolverCall('local', 'TRP', 10, 0.5, 4.0, 3.0, None, False),
+        SolverCall('alns', 'TSP', 5, 0.25, None, 2.0, 10, True),
+        SolverCall('local', 'TRP', 20, 1.5, 10.0, 5.0, None, True),
+        SolverCall('alns', 'TSP', 7, 0.75, None, 1.0, 30, False),
+    ]
+    rows = [row.split(',') for row in summary_rows(3, calls).splitlines()]
+    assert all(len(row) == len(TELEMETRY_SUMMARY_HEADER.split(',')) for row in rows)
+
+    # sorted by solver, then problem
+    alns, local = rows
+    assert alns[:4] == ['3', 'alns', 'TSP', '2']
+    assert [float(value) for value in alns[4:7]] == [1.0, 0.5, 0.75]
+    assert [float(value) for value in alns[7:10]] == [6.0, 7, 20.0]
+    assert alns[10:] == ['1', '']
+
+    assert local[:4] == ['3', 'local', 'TRP', '2']
+    assert [float(value) for value in local[4:9]] == [2.0, 1.0, 1.5, 15.0, 20]
+    assert local[9:11] == ['', '1']
+    # the mean of a quarter and a half saved
+    assert float(local[11]) == pytest.approx(0.375)
+
+
+def test_solver_telemetry_run(tmp_path, monkeypatch, telemetry):
+    monkeypatch.chdir(tmp_path)
+    multiple_sims(build_argparser().parse_args(['--solver', 'local', '--max-tasks', '10', '--total-tasks', '15', '--max-solver-time', '0.02',
+                                                '--policy', 'lkh_batch_tsp', '--seed', '4', '--solver-telemetry']))
+
+    results_dir = tmp_path / 'results'
+    (calls_name, ) = results_dir.glob('Telemetry_*')
+    (summary_name, ) = results_dir.glob('TelemetrySummary_*')
+    with open(calls_name) as fp:
+        header, *calls = fp.readlines()
+    with open(summary_name) as fp:
+        summary_header, *summary = fp.readlines()
+
+    assert header == TELEMETRY_HEADER
+    assert summary_header == TELEMETRY_SUMMARY_HEADER
+    assert len(calls)
+    assert all(call.startswith('4,') for call in calls + summary)
+    # every call is in the summary
+    assert sum(int(row.split(',')[3]) for row in summary) == len(calls)
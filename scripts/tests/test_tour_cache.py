@@ -0,0 +1,43 @@
+'''
+The tour cache -- keyed on the problem instance, bounded in memory and shared through its directory
+'''
+from tour_cache import TourCache, problem_key
+
+PROBLEM = 'NAME: a\nCOMMENT: first\nTYPE: TSP\nDIMENSION: 3\nEDGE_WEIGHT_TYPE: EUC_2D\nNODE_COORD_SECTION\n1 0 0\n2 1 0\n3 0 1\nEOF'
+
+
+def test_key_ignores_names_and_comments():
+    renamed = PROBLEM.replace('NAME: a', 'NAME: b').replace('COMMENT: first', 'COMMENT: second')
+    assert problem_key(renamed, runs=1) == problem_key(PROBLEM, runs=1)
+
+
+def test_key_covers_the_problem_and_parameters():
+    moved = PROBLEM.replace('3 0 1', '3 1 1')
+    assert problem_key(moved, runs=1) != problem_key(PROBLEM, runs=1)
+    assert problem_key(PROBLEM, runs=2) != problem_key(PROBLEM, runs=1)
+    assert problem_key(PROBLEM, initial_tour=[1, 3, 2]) != problem_key(PROBLEM, initial_tour=None)
+
+
+def test_cached_routes_are_copies():
+    cache = TourCache()
+    cache.put('key', [[1, 2, 3]])
+    routes = cache.get('key')
+    routes[0].append(4)
+    assert cache.get('key') == [[1, 2, 3]]
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_least_recently_used_go_first():
+    cache = TourCache(max_entries=2)
+    cache.put('a', [[1]])
+    cache.put('b', [[2]])
+    cache.get('a')
+    cache.put('c', [[3]])
+    assert cache.get('b') is None
+    assert cache.get('a') == [[1]] and cache.get('c') == [[3]]
+
+
+def test_cache_directory_is_shared(tmp_path):
+    TourCache(cache_dir=str(tmp_path)).put('key', [[1, 3, 2]])
+    assert TourCache(cache_dir=str(tmp_path)).get('key') == [[1, 3, 2]]
+    assert not list(tmp_path.glob('*.tmp'))
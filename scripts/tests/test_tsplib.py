@@ -0,0 +1,38 @@
+'''
+The vectorized TSPLIB writer holds the same numbers as formatting them one at a time
+'''
+import numpy as np
+import pytest
+
+from tsplib import int_rows, node_rows, problem_text
+
+
+def parse(text):
+    return [[int(value) for value in line.split()] for line in text.splitlines()]
+
+
+@pytest.mark.parametrize('high', [1, 10, 1000, 2**31 + 5])
+def test_int_rows(high):
+    values = np.random.default_rng(high).integers(0, high, size=(7, 5))
+    values[0, 0] = 0
+    text = int_rows(values)
+    assert text.endswith('\n')
+    assert parse(text) == values.tolist()
+
+
+def test_int_rows_negative_and_empty():
+    assert parse(int_rows([[-3, 12], [0, -1]])) == [[-3, 12], [0, -1]]
+    assert int_rows(np.zeros((2, 0))) == '\n\n'
+
+
+def test_node_rows():
+    assert parse(node_rows([[5, 6], [70, 8]])) == [[1, 5, 6], [2, 70, 8]]
+    assert parse(node_rows([3, 4], first=2)) == [[2, 3], [3, 4]]
+
+
+def test_problem_text():
+    text = problem_text(headers=[('NAME', 'p'), ('DIMENSION', 2)], sections=[('NODE_COORD_SECTION', node_rows([[0, 0], [3, 4]]))])
+    lines = text.splitlines()
+    assert lines[:3] == ['NAME: p', 'DIMENSION: 2', 'NODE_COORD_SECTION:']
+    assert parse('\n'.join(lines[3:5])) == [[1, 0, 0], [2, 3, 4]]
+    assert lines[-1] == 'EOF'
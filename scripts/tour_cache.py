@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from config import TOUR_CACHE_SIZE
+
+
+def problem_key(problem, **params):
+    """
+    Content hash of a problem instance -- the TSPLIB text (less its NAME and COMMENT, which don't change the
+    solution) together with everything else handed to the solver
+
+    Args:
+        problem (str): the problem in TSPLIB format
+        params: the solver parameters, depots, initial tour, ...
+
+    Returns:
+        str: the key
+    """
+    digest = hashlib.sha1()
+    for line in problem.splitlines():
+        if not line.startswith(('NAME', 'COMMENT')):
+            digest.update(line.encode())
+            digest.update(b'\n')
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class TourCache:
+    """
+    Solved tours, keyed on the problem instance.  The most recently used tours are held in memory; with a cache
+    directory they are also kept on disk (one small file each, written atomically) so that they carry over to
+    other runs and processes -- e.g., sweeps that repeat the same seeds.
+    """
+
+    def __init__(self, max_entries=TOUR_CACHE_SIZE, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._tours = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _file_name(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key):
+        """
+        The cached routes for a problem (a fresh copy), or None
+        """
+        with self._lock:
+            routes = self._tours.get(key)
+            if routes is not None:
+                self._tours.move_to_end(key)
+
+        if routes is None and self.cache_dir is not None:
+            try:
+                with open(self._file_name(key)) as fp:
+                    routes = json.load(fp)
+            except (OSError, ValueError):
+                pass
+            else:
+                self._remember(key, routes)
+
+        if routes is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [list(route) for route in routes]
+
+    def _remember(self, key, routes):
+        with self._lock:
+            self._tours[key] = routes
+            self._tours.move_to_end(key)
+            while len(self._tours) > self.max_entries:
+                self._tours.popitem(last=False)
+
+    def put(self, key, routes):
+        """
+        Add the solved routes for a problem
+        """
+        routes = [list(route) for route in routes]
+        self._remember(key, routes)
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(routes, fp)
+            os.replace(tmp_name, self._file_name(key))
+
+    def clear(self):
+        with self._lock:
+            self._tours.clear()
+
+
+_tour_cache = TourCache()
+
+
+def get_tour_cache():
+    """
+    The tour cache shared by all the solver calls in this process
+    """
+    return _tour_cache
+
+
+def configure_tour_cache(max_entries=None, cache_dir=None):
+    """
+    Resize the shared tour cache and/or set its on-disk directory (None keeps it in memory only)
+    """
+    if max_entries is not None:
+        _tour_cache.max_entries = max_entries
+    _tour_cache.cache_dir = cache_dir
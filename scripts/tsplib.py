@@ -0,0 +1,84 @@
+'''
+Fast TSPLIB text for LKH problems.  The number sections (coordinates, demands, distance matrices) are formatted
+in one go with numpy -- each row of integers becomes a run of fixed width, space padded fields -- instead of
+converting and concatenating the numbers one at a time.
+'''
+import numpy as np
+
+_SPACE = ord(' ')
+_NEWLINE = ord('\n')
+_ZERO = ord('0')
+
+
+def int_rows(values):
+    """
+    Text for a 2-D array of integers, one line per row
+
+    Args:
+        values (_type_): (rows, columns) array of integers
+
+    Returns:
+        str: the rows, as whitespace separated numbers, each line ending in a newline
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    if not values.size:
+        return '\n' * values.shape[0]
+    if values.min() < 0:
+        return ''.join(' '.join(map(str, row)) + '\n' for row in values.tolist())
+
+    max_value = int(values.max())
+    width = len(str(max_value))
+    if max_value < 2**31:
+        values = values.astype(np.int32)
+
+    # peel off the digits, last first -- once a value is used up, the rest of its field is padding
+    rows, columns = values.shape
+    fields = np.full((rows, columns, width + 1), _SPACE, dtype=np.uint8)
+    for k in range(width, 0, -1):
+        quotient = values // 10
+        digit = (values - quotient * 10 + _ZERO).astype(np.uint8)
+        if k < width:
+            digit[values == 0] = _SPACE
+        fields[:, :, k] = digit
+        values = quotient
+
+    text = np.empty((rows, columns * (width + 1) + 1), dtype=np.uint8)
+    text[:, :-1] = fields.reshape(rows, -1)
+    text[:, -1] = _NEWLINE
+    return text.tobytes().decode('ascii')
+
+
+def node_rows(values, first=1):
+    """
+    Text for a node section -- each row of values prefixed with its node id
+
+    Args:
+        values (_type_): (nodes, columns) (or (nodes, )) array of integers
+        first (int, optional): the id of the first node. Defaults to 1.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    ids = np.arange(first, first + values.shape[0], dtype=np.int64)
+    return int_rows(np.column_stack((ids, values)))
+
+
+def problem_text(headers, sections):
+    """
+    Assemble a problem from its header entries and data sections
+
+    Args:
+        headers (list): (keyword, value) pairs
+        sections (list): (keyword, text) pairs -- the text of each section as produced by int_rows()/node_rows()
+
+    Returns:
+        str: the problem in TSPLIB format
+    """
+    parts = [f'{keyword}: {value}\n' for keyword, value in headers]
+    for keyword, text in sections:
+        parts.append(f'{keyword}:\n')
+        parts.append(text)
+    parts.append('EOF\n')
+    return ''.join(parts)
@@ -10,6 +10,7 @@ import numpy as np
 from distinctipy import distinctipy
 from os import listdir
 from os.path import isfile, join
+from delivery_log import read_delivery_log
 
 mpl.use('pdf')
 # import scienceplots
@@ -152,7 +153,7 @@ def plot_comparison(files, mode='baselines'):
     for f in files:
         if HEADER_STR in f and HEADER_SUBSTR in f:
             # if 'DeliveryLog' in f and 'icra_v6_lkh_batch_trp' in f:       # ICRA/OLD data
-            df = pd.read_csv(f)
+            df = read_delivery_log(f)
             try:
                 df['cost-exponent'] = df['cost_exponent']
             except KeyError: